@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+线程数与批大小自动调优
+对指定任务和模型搜索 intra-op 线程数、inter-op 线程数和批大小的组合，
+把吞吐量 (或延迟) 最好的配置保存到本机调优配置中。之后 create_pipeline
+加载同一模型时自动应用线程设置，并把调优批大小作为pipeline的默认批大小
+
+inter-op 线程数在每个进程中只能设置一次，因此每个 inter-op 取值在独立子进程中测试
+
+示例:
+    # 对本地随机小模型调优 (离线)
+    python benchmarks/autotune.py --task qa
+    # 对任务脚本使用的正式模型调优，--model 须与脚本调用 create_pipeline 时的名称一致，
+    # --sample_file 提供有代表性的真实输入 (JSONL)
+    python benchmarks/autotune.py --task translation --model Helsinki-NLP/opus-mt-zh-en --sample_file samples.jsonl
+
+样本文件每行一个JSON对象: qa 为 {"question", "context"}，asr 为 {"audio": 音频路径 (相对于样本文件)}，
+其他任务为 {"text"}
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from bench_utils import latency_summary, time_call
+from tiny_models import TINY_MODELS, ensure_tiny_model
+from run_benchmarks import DEFAULT_MODEL_DIR, run_pipe
+
+
+def default_thread_counts():
+    """默认搜索的线程数: 1, 2, 4, ... 直到CPU核数"""
+    cpus = os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    counts.append(cpus)
+    return counts
+
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def load_samples(sample_file, name):
+    """读取样本文件，返回pipeline输入列表"""
+    base_dir = os.path.dirname(os.path.abspath(sample_file))
+    samples = []
+    with open(sample_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if name == "qa":
+                samples.append({"question": record["question"], "context": record["context"]})
+            elif name == "asr":
+                from utils.audio_utils import TARGET_SAMPLING_RATE, load_audio
+                audio = load_audio(os.path.join(base_dir, record["audio"]))
+                samples.append({"raw": audio, "sampling_rate": TARGET_SAMPLING_RATE})
+            else:
+                samples.append(record["text"])
+    if not samples:
+        raise ValueError(f"样本文件为空: {sample_file}")
+    return samples
+
+
+def child(args):
+    """子进程: 固定 inter-op 线程数，测试各 intra-op 线程数和批大小的组合"""
+    import torch
+    # 必须在任何并行计算之前设置
+    torch.set_num_interop_threads(int(args.interop))
+
+    from utils import create_pipeline
+
+    task = TINY_MODELS[args.task][0]
+    pipe = create_pipeline(task, model_name=args.model, use_cache=False)
+
+    # 有样本文件时循环使用真实输入，否则使用合成输入 (仅适用于离线小模型)
+    if args.sample_file:
+        samples = load_samples(args.sample_file, args.task)
+
+        def make_input(name, i):
+            return samples[i % len(samples)]
+    else:
+        from run_benchmarks import make_input
+
+    results = []
+    for threads in parse_ints(args.threads):
+        torch.set_num_threads(threads)
+        # 预热
+        run_pipe(pipe, args.task, [make_input(args.task, 0)], 1)
+        latencies = []
+        for i in range(args.iterations):
+            _, seconds = time_call(run_pipe, pipe, args.task, [make_input(args.task, i)], 1)
+            latencies.append(seconds)
+        latency = latency_summary(latencies)
+
+        for batch_size in parse_ints(args.batch_sizes):
+            inputs = [make_input(args.task, i) for i in range(batch_size * args.batches)]
+            _, seconds = time_call(run_pipe, pipe, args.task, inputs, batch_size)
+            results.append({
+                "intra_op_threads": threads,
+                "inter_op_threads": int(args.interop),
+                "batch_size": batch_size,
+                "items_per_second": len(inputs) / seconds,
+                "p50_ms": latency["p50_ms"],
+            })
+            print(f"threads={threads} interop={args.interop} batch={batch_size}: "
+                  f"{results[-1]['items_per_second']:.1f} 条/秒, p50 {latency['p50_ms']:.1f} ms", file=sys.stderr)
+    print(json.dumps(results))
+
+
+def run_child(args, interop):
+    """在独立子进程中测试一个 inter-op 线程数"""
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--child",
+        "--task", args.task,
+        "--model", args.model,
+        "--interop", str(interop),
+        "--threads", args.threads,
+        "--batch_sizes", args.batch_sizes,
+        "--iterations", str(args.iterations),
+        "--batches", str(args.batches),
+    ]
+    if args.sample_file:
+        cmd += ["--sample_file", os.path.abspath(args.sample_file)]
+    env = dict(os.environ)
+    # 调优时不应用已有的调优配置
+    env["PIPELINE_TUNING"] = "0"
+    completed = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, env=env)
+    if completed.returncode != 0:
+        print(f"inter-op={interop} 测试失败", file=sys.stderr)
+        return []
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="线程数与批大小自动调优")
+    parser.add_argument("--task", required=True, choices=TINY_MODELS.keys(), help="任务")
+    parser.add_argument("--model", help="模型名称或路径 (默认: 本地随机小模型)")
+    parser.add_argument("--sample_file", help="有代表性的真实输入 (JSONL)，指定 --model 时必须提供")
+    parser.add_argument("--threads", default=",".join(map(str, default_thread_counts())),
+                        help="搜索的 intra-op 线程数，逗号分隔 (默认: 1,2,4...CPU核数)")
+    parser.add_argument("--interop", default="1,2,4", help="搜索的 inter-op 线程数，逗号分隔 (默认: 1,2,4)")
+    parser.add_argument("--batch_sizes", default="1,4,8,16,32", help="搜索的批大小，逗号分隔 (默认: 1,4,8,16,32)")
+    parser.add_argument("--iterations", type=int, default=10, help="测量单条延迟的请求数 (默认: 10)")
+    parser.add_argument("--batches", type=int, default=4, help="测量吞吐量时每种批大小运行的批数 (默认: 4)")
+    parser.add_argument("--objective", choices=["throughput", "latency"], default="throughput",
+                        help="优化目标: throughput (条/秒) 或 latency (单条p50) (默认: throughput)")
+    parser.add_argument("--model_dir", default=DEFAULT_MODEL_DIR, help="小模型保存目录")
+    parser.add_argument("--dry_run", action="store_true", help="只输出结果，不写入调优配置")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    if args.model and not args.sample_file:
+        parser.error("对正式模型调优时需要用 --sample_file 提供有代表性的真实输入")
+    if not args.model:
+        args.model = ensure_tiny_model(args.task, args.model_dir)
+
+    results = []
+    for interop in parse_ints(args.interop):
+        results.extend(run_child(args, interop))
+    if not results:
+        print("没有得到任何测试结果")
+        sys.exit(1)
+
+    if args.objective == "throughput":
+        best = max(results, key=lambda r: r["items_per_second"])
+    else:
+        # 延迟与批大小无关，同样延迟下选吞吐量更高的批大小
+        best = min(results, key=lambda r: (r["p50_ms"], -r["items_per_second"]))
+    config = {
+        "intra_op_threads": best["intra_op_threads"],
+        "inter_op_threads": best["inter_op_threads"],
+        "batch_size": best["batch_size"],
+    }
+
+    print("\n最佳配置:")
+    print("-" * 50)
+    for key, value in config.items():
+        print(f"{key}: {value}")
+    print(f"吞吐量: {best['items_per_second']:.1f} 条/秒, 单条p50延迟: {best['p50_ms']:.1f} ms")
+
+    if not args.dry_run:
+        from utils.tuning_utils import record_tuned_config, profile_path
+        task = TINY_MODELS[args.task][0]
+        record_tuned_config(task, args.model, config, metrics={
+            "objective": args.objective,
+            "items_per_second": best["items_per_second"],
+            "p50_ms": best["p50_ms"],
+            "candidates": len(results),
+        })
+        print(f"已保存到: {profile_path()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+基准测试公共工具：计时、分位数和内存统计
+"""
+
+import os
+import resource
+import sys
+import time
+
+# 基准测试全部离线运行
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+# 让 benchmarks/ 下的脚本可以导入项目根目录的 utils
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def percentile(values, pct):
+    """
+    计算分位数 (线性插值)
+
+    Args:
+        values (list): 数值列表
+        pct (float): 百分位，如 95
+
+    Returns:
+        float: 分位数，values 为空时返回None
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * pct / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def latency_summary(latencies):
+    """把延迟列表 (秒) 汇总为毫秒单位的 p50/p95/p99"""
+    return {
+        "count": len(latencies),
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else None,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+    }
+
+
+def _ms(seconds):
+    return seconds * 1000 if seconds is not None else None
+
+
+def peak_rss_mb():
+    """返回当前进程的峰值常驻内存 (MB)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以KB为单位
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def current_rss_mb():
+    """返回当前进程的常驻内存 (MB)，无法获取时返回None"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+def time_call(fn, *args, **kwargs):
+    """执行函数并返回 (结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
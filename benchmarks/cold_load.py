@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+冷启动加载测试
+在独立子进程中分别用普通方式和快速加载 (内存映射 safetensors + low_cpu_mem_usage) 创建pipeline，
+比较加载时间和加载期间的峰值内存。模型只有 .bin 权重时，快速加载第一次会转换为 safetensors，
+分别报告转换时的首次加载和转换后的加载
+
+示例:
+    # 使用本地构建的随机小模型 (以 .bin 格式保存)
+    python benchmarks/cold_load.py --output cold_load.json
+    # 使用本地已有的模型
+    python benchmarks/cold_load.py --model ~/models/gpt2 --task text-generation
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+import tempfile
+
+from bench_utils import peak_rss_mb, current_rss_mb, time_call
+from tiny_models import TINY_MODELS, ensure_tiny_model
+from run_benchmarks import DEFAULT_MODEL_DIR, environment_info
+
+
+def make_bin_copy(model_dir, target_dir):
+    """复制模型目录并把 safetensors 权重改存为 pytorch_model.bin，模拟旧格式的模型"""
+    if os.path.exists(os.path.join(target_dir, "pytorch_model.bin")):
+        return target_dir
+    import torch
+    from safetensors.torch import load_file
+
+    os.makedirs(target_dir, exist_ok=True)
+    state_dict = {}
+    for name in os.listdir(model_dir):
+        path = os.path.join(model_dir, name)
+        if name.endswith(".safetensors"):
+            state_dict.update(load_file(path))
+        elif os.path.isfile(path) and not name.endswith(".safetensors.index.json"):
+            shutil.copy(path, target_dir)
+    torch.save(state_dict, os.path.join(target_dir, "pytorch_model.bin"))
+    return target_dir
+
+
+def child(task, model_path, fast_load):
+    """子进程: 加载一次模型并输出加载时间和内存"""
+    from utils import create_pipeline
+
+    rss_before = current_rss_mb()
+    peak_before = peak_rss_mb()
+    _, seconds = time_call(create_pipeline, task, model_path=model_path, use_cache=False, fast_load=fast_load)
+    print(json.dumps({
+        "load_seconds": seconds,
+        "rss_before_mb": rss_before,
+        "rss_after_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_increase_mb": peak_rss_mb() - peak_before,
+    }))
+
+
+def run_child(task, model_path, fast_load, env):
+    """在独立子进程中加载模型"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--task", task, "--model", model_path]
+    if fast_load:
+        cmd.append("--fast_load")
+    completed = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "子进程失败"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(task, model_path):
+    """比较普通加载、首次快速加载 (含转换) 和转换后的快速加载"""
+    env = dict(os.environ)
+    # 使用独立的转换目录，保证首次快速加载包含转换
+    env["SAFETENSORS_CACHE_DIR"] = tempfile.mkdtemp(prefix="safetensors_bench_")
+    try:
+        report = {
+            "model": model_path,
+            "standard": run_child(task, model_path, False, env),
+            "fast_first": run_child(task, model_path, True, env),
+            "fast": run_child(task, model_path, True, env),
+        }
+    finally:
+        shutil.rmtree(env["SAFETENSORS_CACHE_DIR"], ignore_errors=True)
+
+    standard, fast = report["standard"], report["fast"]
+    if "error" not in standard and "error" not in fast:
+        report["speedup"] = standard["load_seconds"] / fast["load_seconds"]
+        report["peak_increase_saved_mb"] = standard["peak_increase_mb"] - fast["peak_increase_mb"]
+    return report
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="冷启动加载时间和峰值内存测试")
+    parser.add_argument("--tasks", default="qa,translation,text", help="测试的小模型任务，逗号分隔")
+    parser.add_argument("--model", help="测试指定的本地模型目录，代替小模型")
+    parser.add_argument("--task", help="--model 对应的pipeline任务类型，如 text-generation")
+    parser.add_argument("--model_dir", default=DEFAULT_MODEL_DIR, help="小模型保存目录")
+    parser.add_argument("--output", help="结果JSON保存路径 (默认输出到标准输出)")
+    parser.add_argument("--fast_load", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.task, args.model, args.fast_load)
+        return
+
+    results = {}
+    if args.model:
+        if not args.task:
+            parser.error("使用 --model 时需要指定 --task")
+        results[args.task] = compare(args.task, os.path.expanduser(args.model))
+    else:
+        for name in [t.strip() for t in args.tasks.split(",") if t.strip()]:
+            if name not in TINY_MODELS:
+                parser.error(f"未知任务: {name}")
+            model_path = ensure_tiny_model(name, args.model_dir)
+            bin_path = make_bin_copy(model_path, os.path.join(args.model_dir, "bin", name))
+            print(f"测试任务: {name} ({bin_path})", file=sys.stderr)
+            results[name] = compare(TINY_MODELS[name][0], bin_path)
+
+    report = {"environment": environment_info(), "results": results}
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data)
+        print(f"结果已保存: {args.output}", file=sys.stderr)
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
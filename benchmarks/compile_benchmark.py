@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+编译后端对比
+对问答和翻译模型分别以 eager 模式和编译后端 (torch.compile + 序列长度分桶) 运行
+长度各不相同的输入，比较首次调用耗时 (含编译)、稳态延迟和输出一致性，结果以JSON格式输出
+
+示例:
+    # 使用本地构建的随机小模型 (离线)
+    python benchmarks/compile_benchmark.py --output compile.json
+    # 使用各任务脚本的默认模型 (需要本地已有缓存)
+    python benchmarks/compile_benchmark.py --models default --iterations 50
+"""
+
+import sys
+import json
+import argparse
+
+from bench_utils import latency_summary, time_call
+from tiny_models import TINY_MODELS, ensure_tiny_model, sample_text
+from run_benchmarks import DEFAULT_MODEL_DIR, environment_info
+
+# 支持编译后端的任务及其正式模型
+DEFAULT_MODELS = {
+    "qa": "distilbert-base-cased-distilled-squad",
+    "translation": "Helsinki-NLP/opus-mt-zh-en",
+}
+
+
+def make_input(name, i):
+    """生成第 i 个测试输入，长度在多个分桶之间变化"""
+    if name == "qa":
+        return {"question": sample_text(6, seed=i), "context": sample_text(20 + (i * 37) % 200, seed=i + 10000)}
+    return sample_text(4 + (i * 7) % 60, seed=i)
+
+
+def run_once(pipe, name, item):
+    """运行单个输入并返回用于比较的输出"""
+    if name == "qa":
+        result = pipe(item)
+        return {"text": result["answer"], "score": result["score"]}
+    result = pipe(item, max_new_tokens=16)
+    return {"text": result[0]["translation_text"], "score": None}
+
+
+def measure(name, pipe, iterations):
+    """测量首次调用和稳态延迟，收集输出"""
+    _, first_call = time_call(run_once, pipe, name, make_input(name, 0))
+    # 预热: 让每个分桶都完成编译
+    for i in range(iterations):
+        run_once(pipe, name, make_input(name, i))
+    latencies = []
+    outputs = []
+    for i in range(iterations):
+        output, seconds = time_call(run_once, pipe, name, make_input(name, i))
+        latencies.append(seconds)
+        outputs.append(output)
+    return first_call, latencies, outputs
+
+
+def compare_task(name, model_id, iterations):
+    """对比单个任务的 eager 模式与编译后端"""
+    from utils import create_pipeline
+
+    task = TINY_MODELS[name][0]
+    report = {"model": model_id}
+    outputs = {}
+    for label, compile_model in (("eager", False), ("compiled", True)):
+        pipe, load_time = time_call(
+            create_pipeline, task, model_name=model_id, use_cache=False, compile_model=compile_model
+        )
+        first_call, latencies, outputs[label] = measure(name, pipe, iterations)
+        report[label] = {
+            "load_seconds": load_time,
+            "first_call_seconds": first_call,
+            "latency": latency_summary(latencies),
+        }
+        forward = pipe.model.forward
+        if pipe.model.config.is_encoder_decoder:
+            forward = pipe.model.get_encoder().forward
+        if hasattr(forward, "stats"):
+            report[label]["backend_stats"] = dict(forward.stats)
+        del pipe
+
+    pairs = list(zip(outputs["eager"], outputs["compiled"]))
+    agreement = {"exact_match": sum(a["text"] == b["text"] for a, b in pairs) / len(pairs)}
+    if name == "qa":
+        agreement["max_score_diff"] = max(abs(a["score"] - b["score"]) for a, b in pairs)
+    report["agreement"] = agreement
+    report["speedup_p50"] = report["eager"]["latency"]["p50_ms"] / report["compiled"]["latency"]["p50_ms"]
+    return report
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="编译后端与 eager 模式对比")
+    parser.add_argument("--tasks", default=",".join(DEFAULT_MODELS),
+                        help=f"对比的任务，逗号分隔 (默认: {','.join(DEFAULT_MODELS)})")
+    parser.add_argument("--models", choices=["tiny", "default"], default="tiny",
+                        help="tiny: 本地随机小模型 (离线); default: 各任务的正式模型")
+    parser.add_argument("--iterations", type=int, default=20, help="每个模型的测试请求数 (默认: 20)")
+    parser.add_argument("--model_dir", default=DEFAULT_MODEL_DIR, help="小模型保存目录")
+    parser.add_argument("--output", help="结果JSON保存路径 (默认输出到标准输出)")
+    args = parser.parse_args()
+
+    names = [t.strip() for t in args.tasks.split(",") if t.strip()]
+    unknown = [t for t in names if t not in DEFAULT_MODELS]
+    if unknown:
+        parser.error(f"不支持编译对比的任务: {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        model_id = DEFAULT_MODELS[name] if args.models == "default" else ensure_tiny_model(name, args.model_dir)
+        print(f"对比任务: {name} ({model_id})", file=sys.stderr)
+        try:
+            results[name] = compare_task(name, model_id, args.iterations)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+    report = {"environment": environment_info(), "results": results}
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data)
+        print(f"结果已保存: {args.output}", file=sys.stderr)
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
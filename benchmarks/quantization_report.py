@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+动态int8量化对比报告
+对问答、翻译、文本生成和语音识别模型分别以fp32和int8运行，
+比较延迟、模型大小、内存和输出一致性，结果以JSON格式输出
+
+示例:
+    # 使用本地构建的随机小模型 (离线)
+    python benchmarks/quantization_report.py --output quant.json
+    # 使用各任务脚本的默认模型 (需要本地已有缓存或可访问 Hub)
+    python benchmarks/quantization_report.py --models default --iterations 20
+"""
+
+import os
+import sys
+import json
+import argparse
+import difflib
+
+
+def _wants_default_models(argv):
+    for i, arg in enumerate(argv):
+        if arg == "--models=default" or (arg == "--models" and argv[i + 1:i + 2] == ["default"]):
+            return True
+    return False
+
+
+# 正式模型可能需要从 Hub 下载，须在导入 transformers 之前决定是否离线
+if _wants_default_models(sys.argv):
+    os.environ.setdefault("HF_HUB_OFFLINE", "0")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "0")
+
+from bench_utils import latency_summary, current_rss_mb, time_call
+from tiny_models import TINY_MODELS, ensure_tiny_model
+from run_benchmarks import DEFAULT_MODEL_DIR, make_input, run_pipe, environment_info
+
+# 量化支持的任务及其正式模型
+DEFAULT_MODELS = {
+    "qa": "distilbert-base-cased-distilled-squad",
+    "translation": "Helsinki-NLP/opus-mt-zh-en",
+    "text": "gpt2",
+    "asr": "openai/whisper-tiny",
+}
+
+
+def output_text(name, output):
+    """取出用于比较一致性的输出文本"""
+    if isinstance(output, list):
+        output = output[0]
+    if name == "qa":
+        return output["answer"]
+    if name == "translation":
+        return output["translation_text"]
+    if name == "text":
+        return output["generated_text"]
+    return output["text"]
+
+
+def measure(name, pipe, iterations):
+    """测量延迟并收集输出"""
+    run_pipe(pipe, name, [make_input(name, 0)], 1)
+    latencies = []
+    outputs = []
+    for i in range(iterations):
+        result, seconds = time_call(run_pipe, pipe, name, [make_input(name, i)], 1)
+        latencies.append(seconds)
+        outputs.append(output_text(name, result[0] if isinstance(result, list) else result))
+    return latencies, outputs
+
+
+def compare_task(name, model_id, iterations):
+    """对比单个任务的fp32与int8模型"""
+    from utils import create_pipeline
+    from utils.quantization_utils import serialized_size
+
+    task = TINY_MODELS[name][0]
+    report = {"model": model_id}
+
+    for label, quantize in (("fp32", False), ("int8", True)):
+        rss_before = current_rss_mb()
+        pipe, load_time = time_call(
+            create_pipeline, task, model_name=model_id, use_cache=False, quantize=quantize
+        )
+        rss_after = current_rss_mb()
+        latencies, outputs = measure(name, pipe, iterations)
+        report[label] = {
+            "load_seconds": load_time,
+            "model_size_mb": serialized_size(pipe.model) / 1024 / 1024,
+            "rss_increase_mb": rss_after - rss_before if rss_before is not None else None,
+            "latency": latency_summary(latencies),
+            "outputs": outputs,
+        }
+        del pipe
+
+    fp32, int8 = report["fp32"], report["int8"]
+    pairs = list(zip(fp32.pop("outputs"), int8.pop("outputs")))
+    report["agreement"] = {
+        "exact_match": sum(a == b for a, b in pairs) / len(pairs),
+        "mean_similarity": sum(difflib.SequenceMatcher(None, a, b).ratio() for a, b in pairs) / len(pairs),
+    }
+    report["speedup_p50"] = fp32["latency"]["p50_ms"] / int8["latency"]["p50_ms"]
+    report["size_ratio"] = int8["model_size_mb"] / fp32["model_size_mb"]
+    return report
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="动态int8量化对比报告")
+    parser.add_argument("--tasks", default=",".join(DEFAULT_MODELS),
+                        help=f"对比的任务，逗号分隔 (默认: {','.join(DEFAULT_MODELS)})")
+    parser.add_argument("--models", choices=["tiny", "default"], default="tiny",
+                        help="tiny: 本地随机小模型 (离线); default: 各任务的正式模型")
+    parser.add_argument("--iterations", type=int, default=10, help="每个模型的测试请求数 (默认: 10)")
+    parser.add_argument("--model_dir", default=DEFAULT_MODEL_DIR, help="小模型保存目录")
+    parser.add_argument("--output", help="结果JSON保存路径 (默认输出到标准输出)")
+    args = parser.parse_args()
+
+    names = [t.strip() for t in args.tasks.split(",") if t.strip()]
+    unknown = [t for t in names if t not in DEFAULT_MODELS]
+    if unknown:
+        parser.error(f"不支持量化对比的任务: {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        model_id = DEFAULT_MODELS[name] if args.models == "default" else ensure_tiny_model(name, args.model_dir)
+        print(f"对比任务: {name} ({model_id})", file=sys.stderr)
+        try:
+            results[name] = compare_task(name, model_id, args.iterations)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+    report = {"environment": environment_info(), "results": results}
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data)
+        print(f"结果已保存: {args.output}", file=sys.stderr)
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线基准测试
+使用本地构建的随机小模型，通过 create_pipeline 测试问答、翻译、文本生成、
+会话和语音识别的冷启动时间、延迟分位数、不同批次大小的吞吐量和峰值内存，
+结果以JSON格式输出，用于比较热点路径修改前后的性能
+
+示例:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --tasks qa,text --batch_sizes 1,8,32
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tempfile
+
+from bench_utils import latency_summary, peak_rss_mb, current_rss_mb, time_call
+from tiny_models import TINY_MODELS, ensure_tiny_model, sample_text
+
+# 默认的小模型保存目录
+DEFAULT_MODEL_DIR = os.path.join(tempfile.gettempdir(), "pipeline_bench_models")
+
+
+def make_input(name, i):
+    """生成第 i 个测试输入"""
+    if name == "qa":
+        return {"question": sample_text(8, seed=i), "context": sample_text(200, seed=i + 10000)}
+    if name == "translation":
+        return sample_text(30, seed=i)
+    if name == "text":
+        return sample_text(16, seed=i)
+    if name == "conversation":
+        return sample_text(20, seed=i)
+    if name == "asr":
+        import numpy as np
+        rng = np.random.default_rng(i)
+        audio = (rng.standard_normal(16000 * 5) * 0.1).astype(np.float32)
+        return {"raw": audio, "sampling_rate": 16000}
+    raise ValueError(f"未知任务: {name}")
+
+
+def call_kwargs(name):
+    """各任务推理时使用的参数"""
+    if name == "text":
+        return {"max_new_tokens": 16, "do_sample": False}
+    if name in ("translation", "conversation"):
+        return {"max_new_tokens": 16}
+    return {}
+
+
+def run_pipe(pipe, name, inputs, batch_size):
+    if name == "qa":
+        return pipe(inputs, batch_size=batch_size)
+    return pipe(inputs, batch_size=batch_size, **call_kwargs(name))
+
+
+def benchmark_task(name, model_dir, batch_sizes, iterations):
+    """
+    测试单个任务
+
+    Returns:
+        dict: 冷启动时间、单请求延迟、各批次吞吐量和峰值内存
+    """
+    from utils import create_pipeline, get_pipeline_cache
+
+    task = TINY_MODELS[name][0]
+    path = ensure_tiny_model(name, model_dir)
+    get_pipeline_cache().clear()
+
+    rss_before = current_rss_mb()
+    pipe, load_time = time_call(create_pipeline, task, model_path=path, use_cache=False)
+
+    # 预热
+    for i in range(2):
+        run_pipe(pipe, name, [make_input(name, i)], 1)
+
+    latencies = []
+    for i in range(iterations):
+        item = make_input(name, i)
+        _, seconds = time_call(run_pipe, pipe, name, [item], 1)
+        latencies.append(seconds)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        inputs = [make_input(name, i) for i in range(batch_size * 4)]
+        _, seconds = time_call(run_pipe, pipe, name, inputs, batch_size)
+        throughput[str(batch_size)] = {
+            "items": len(inputs),
+            "seconds": seconds,
+            "items_per_second": len(inputs) / seconds,
+        }
+
+    result = {
+        "task": task,
+        "cold_load_seconds": load_time,
+        "latency": latency_summary(latencies),
+        "throughput": throughput,
+        "rss_before_load_mb": rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    if name == "conversation":
+        # 多轮对话的每轮延迟
+        from utils.chat_utils import ChatEngine
+        engine = ChatEngine(path, max_new_tokens=16)
+        session = engine.new_session()
+        for i in range(iterations):
+            engine.chat(session, make_input(name, i))
+        result["turn_latency"] = latency_summary(session.latencies)
+
+    return result
+
+
+def run_isolated(name, args):
+    """在独立子进程中测试单个任务，使冷启动和峰值内存互不影响"""
+    # 先在父进程中构建模型，构建过程不计入子进程的内存峰值
+    ensure_tiny_model(name, args.model_dir)
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    cmd = [
+        sys.executable, os.path.abspath(__file__),
+        "--tasks", name,
+        "--batch_sizes", args.batch_sizes,
+        "--iterations", str(args.iterations),
+        "--model_dir", args.model_dir,
+        "--output", output,
+        "--no_isolate",
+    ]
+    try:
+        completed = subprocess.run(cmd, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "子进程失败"}
+        with open(output, "r", encoding="utf-8") as f:
+            return json.load(f)["results"][name]
+    finally:
+        os.remove(output)
+
+
+def environment_info():
+    """收集运行环境信息"""
+    import torch
+    import transformers
+    from utils import get_device
+
+    return {
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "device": get_device(),
+        "num_threads": torch.get_num_threads(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="离线pipeline基准测试")
+    parser.add_argument("--tasks", default=",".join(TINY_MODELS),
+                        help=f"测试的任务，逗号分隔 (默认: {','.join(TINY_MODELS)})")
+    parser.add_argument("--batch_sizes", default="1,4,16", help="测试吞吐量的批次大小 (默认: 1,4,16)")
+    parser.add_argument("--iterations", type=int, default=20, help="测试延迟的请求数 (默认: 20)")
+    parser.add_argument("--model_dir", default=DEFAULT_MODEL_DIR, help="小模型保存目录")
+    parser.add_argument("--output", help="结果JSON保存路径 (默认输出到标准输出)")
+    parser.add_argument("--no_isolate", action="store_true", help="所有任务在同一进程中运行")
+    args = parser.parse_args()
+
+    names = [t.strip() for t in args.tasks.split(",") if t.strip()]
+    unknown = [t for t in names if t not in TINY_MODELS]
+    if unknown:
+        parser.error(f"未知任务: {', '.join(unknown)}")
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    results = {}
+    for name in names:
+        if args.no_isolate:
+            try:
+                results[name] = benchmark_task(name, args.model_dir, batch_sizes, args.iterations)
+            except Exception as e:
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+        else:
+            print(f"测试任务: {name}", file=sys.stderr)
+            results[name] = run_isolated(name, args)
+
+    report = {"environment": environment_info(), "results": results}
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data)
+        print(f"结果已保存: {args.output}", file=sys.stderr)
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
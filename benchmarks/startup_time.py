@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+启动时间检查
+测量 import utils、list_local_models() 和各脚本 --help 的耗时，
+并检查这些操作没有导入 torch / transformers / huggingface_hub。
+超过时间上限或导入了重依赖时以非零状态退出，可用于防止启动时间回退
+
+示例:
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --max_seconds 0.5 --output startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 启动阶段不应导入的模块
+HEAVY_MODULES = ("torch", "transformers", "huggingface_hub")
+
+# 需要快速响应 --help 的脚本
+SCRIPTS = [
+    "tasks/question_answering/qa.py",
+    "tasks/translation/translator.py",
+    "tasks/text_generation/text_gen.py",
+    "tasks/conversation/chatbot.py",
+    "tasks/speech_recognition/asr.py",
+    "tasks/speech_translation/speech_translator.py",
+    "tasks/batch/batch_infer.py",
+    "tasks/serving/inference_server.py",
+    "examples/pipeline_showcase.py",
+]
+
+# 在子进程中执行的轻量操作
+IMPORT_CHECK = "import utils; utils.list_local_models()"
+
+
+def imported_heavy_modules(importtime_log):
+    """从 -X importtime 的输出中找出导入的重依赖"""
+    found = set()
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        name = line.rsplit("|", 1)[-1].strip()
+        top = name.split(".")[0]
+        if top in HEAVY_MODULES:
+            found.add(top)
+    return sorted(found)
+
+
+def measure(cmd, repeat):
+    """
+    多次运行命令，返回最短耗时和导入的重依赖
+
+    Returns:
+        dict: seconds (最短耗时)、heavy_imports、returncode
+    """
+    best = None
+    heavy = []
+    returncode = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime"] + cmd,
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        heavy = imported_heavy_modules(completed.stderr)
+        returncode = completed.returncode
+    return {"seconds": best, "heavy_imports": heavy, "returncode": returncode}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="检查CLI启动时间和延迟导入")
+    parser.add_argument("--max_seconds", type=float, default=1.0, help="每个命令允许的最长耗时 (默认: 1.0)")
+    parser.add_argument("--repeat", type=int, default=3, help="每个命令的运行次数，取最短耗时 (默认: 3)")
+    parser.add_argument("--output", help="结果JSON保存路径")
+    args = parser.parse_args()
+
+    commands = {"import utils + list_local_models": ["-c", IMPORT_CHECK]}
+    for script in SCRIPTS:
+        commands[f"{script} --help"] = [script, "--help"]
+
+    results = {}
+    failures = []
+    for name, cmd in commands.items():
+        result = measure(cmd, args.repeat)
+        results[name] = result
+        problems = []
+        if result["returncode"] != 0:
+            problems.append(f"退出码 {result['returncode']}")
+        if result["heavy_imports"]:
+            problems.append(f"导入了 {', '.join(result['heavy_imports'])}")
+        if result["seconds"] > args.max_seconds:
+            problems.append(f"耗时 {result['seconds']:.2f}s 超过 {args.max_seconds:.2f}s")
+        status = "失败: " + "; ".join(problems) if problems else "通过"
+        print(f"{name:<55} {result['seconds']:.3f}s  {status}")
+        if problems:
+            failures.append(name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"max_seconds": args.max_seconds, "results": results}, f, indent=2, ensure_ascii=False)
+
+    if failures:
+        print(f"\n{len(failures)} 项检查未通过")
+        sys.exit(1)
+    print("\n所有检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地构建随机初始化的小模型，供基准测试离线使用 (不访问 Hugging Face Hub)
+
+每个任务的模型结构与正式模型相同 (DistilBERT、Marian、GPT-2、Blenderbot、Whisper)，
+只是层数和维度很小，用来比较代码路径的性能变化，而不是模型质量。
+"""
+
+import json
+import os
+import random
+
+from tokenizers import Tokenizer, models, pre_tokenizers, processors
+from transformers import (
+    BlenderbotConfig,
+    BlenderbotForConditionalGeneration,
+    DistilBertConfig,
+    DistilBertForQuestionAnswering,
+    GPT2Config,
+    GPT2LMHeadModel,
+    MarianConfig,
+    MarianMTModel,
+    PreTrainedTokenizerFast,
+    WhisperConfig,
+    WhisperFeatureExtractor,
+    WhisperForConditionalGeneration,
+    WhisperProcessor,
+    WhisperTokenizer,
+)
+
+# 词表中的普通单词数
+VOCAB_WORDS = 1000
+
+SPECIAL_TOKENS = ["<pad>", "<unk>", "<s>", "</s>", "[CLS]", "[SEP]", "[MASK]"]
+
+WORDS = [f"w{i}" for i in range(VOCAB_WORDS)]
+
+
+def sample_text(num_words, seed=0):
+    """生成由词表单词组成的随机文本"""
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(num_words))
+
+
+def build_word_tokenizer(template="single", model_max_length=512):
+    """
+    构建按空格切词的 fast tokenizer
+
+    Args:
+        template (str): "bert" 使用 [CLS]/[SEP] 模板 (问答)，"eos" 在句尾加 </s>，
+            "single" 不加特殊符号
+        model_max_length (int): 最大长度
+
+    Returns:
+        PreTrainedTokenizerFast: tokenizer
+    """
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS + WORDS)}
+    tokenizer = Tokenizer(models.WordLevel(vocab=vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+
+    if template == "bert":
+        tokenizer.post_processor = processors.TemplateProcessing(
+            single="[CLS] $A [SEP]",
+            pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+            special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])],
+        )
+    elif template == "eos":
+        tokenizer.post_processor = processors.TemplateProcessing(
+            single="$A </s>",
+            pair="$A </s> $B </s>",
+            special_tokens=[("</s>", vocab["</s>"])],
+        )
+
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        unk_token="<unk>",
+        pad_token="<pad>",
+        bos_token="<s>",
+        eos_token="</s>",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+        mask_token="[MASK]",
+        model_max_length=model_max_length,
+    )
+
+
+def _vocab_size():
+    return len(SPECIAL_TOKENS) + VOCAB_WORDS
+
+
+def build_qa_model(save_dir):
+    """问答模型 (DistilBERT 结构)"""
+    config = DistilBertConfig(
+        vocab_size=_vocab_size(), dim=64, n_layers=2, n_heads=2, hidden_dim=128,
+        max_position_embeddings=512, pad_token_id=0,
+    )
+    DistilBertForQuestionAnswering(config).save_pretrained(save_dir)
+    build_word_tokenizer("bert").save_pretrained(save_dir)
+
+
+def build_translation_model(save_dir):
+    """翻译模型 (Marian 结构)"""
+    config = MarianConfig(
+        vocab_size=_vocab_size(), d_model=64, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=2, decoder_attention_heads=2,
+        encoder_ffn_dim=128, decoder_ffn_dim=128, max_position_embeddings=512,
+        pad_token_id=0, eos_token_id=3, decoder_start_token_id=0, forced_eos_token_id=3,
+    )
+    MarianMTModel(config).save_pretrained(save_dir)
+    build_word_tokenizer("eos").save_pretrained(save_dir)
+
+
+def build_text_generation_model(save_dir):
+    """文本生成模型 (GPT-2 结构)"""
+    config = GPT2Config(
+        vocab_size=_vocab_size(), n_embd=64, n_layer=2, n_head=2, n_positions=512,
+        bos_token_id=2, eos_token_id=3,
+    )
+    GPT2LMHeadModel(config).save_pretrained(save_dir)
+    build_word_tokenizer("single").save_pretrained(save_dir)
+
+
+def build_conversation_model(save_dir):
+    """会话模型 (Blenderbot 结构)"""
+    config = BlenderbotConfig(
+        vocab_size=_vocab_size(), d_model=64, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=2, decoder_attention_heads=2,
+        encoder_ffn_dim=128, decoder_ffn_dim=128, max_position_embeddings=128,
+        pad_token_id=0, bos_token_id=2, eos_token_id=3, decoder_start_token_id=2,
+    )
+    BlenderbotForConditionalGeneration(config).save_pretrained(save_dir)
+    build_word_tokenizer("eos", model_max_length=128).save_pretrained(save_dir)
+
+
+def _build_whisper_tokenizer(save_dir):
+    """构建最小的 Whisper 字节级 BPE 词表"""
+    from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+    vocab = {}
+    for char in bytes_to_unicode().values():
+        vocab[char] = len(vocab)
+    for word in WORDS[:200]:
+        vocab["Ġ" + word] = len(vocab)
+    specials = ["<|endoftext|>", "<|startoftranscript|>", "<|en|>", "<|translate|>",
+                "<|transcribe|>", "<|startoflm|>", "<|startofprev|>", "<|nocaptions|>",
+                "<|notimestamps|>"]
+    for token in specials:
+        vocab[token] = len(vocab)
+    # 时间戳 token，间隔 0.02 秒
+    for i in range(1501):
+        vocab[f"<|{i * 0.02:.2f}|>"] = len(vocab)
+
+    vocab_file = os.path.join(save_dir, "vocab.json")
+    merges_file = os.path.join(save_dir, "merges.txt")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    with open(merges_file, "w", encoding="utf-8") as f:
+        f.write("#version: 0.2\n")
+
+    tokenizer = WhisperTokenizer(vocab_file, merges_file, additional_special_tokens=specials)
+    return tokenizer, vocab
+
+
+def build_asr_model(save_dir):
+    """语音识别模型 (Whisper 结构)"""
+    os.makedirs(save_dir, exist_ok=True)
+    tokenizer, vocab = _build_whisper_tokenizer(save_dir)
+    config = WhisperConfig(
+        vocab_size=len(vocab), d_model=64, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=2, decoder_attention_heads=2,
+        encoder_ffn_dim=128, decoder_ffn_dim=128, num_mel_bins=80,
+        max_source_positions=1500, max_target_positions=64,
+        pad_token_id=vocab["<|endoftext|>"], bos_token_id=vocab["<|endoftext|>"],
+        eos_token_id=vocab["<|endoftext|>"],
+        decoder_start_token_id=vocab["<|startoftranscript|>"],
+    )
+    model = WhisperForConditionalGeneration(config)
+    model.generation_config.decoder_start_token_id = vocab["<|startoftranscript|>"]
+    model.generation_config.no_timestamps_token_id = vocab["<|notimestamps|>"]
+    model.generation_config.is_multilingual = False
+    model.generation_config.max_length = 32
+    model.save_pretrained(save_dir)
+    WhisperProcessor(WhisperFeatureExtractor(feature_size=80), tokenizer).save_pretrained(save_dir)
+
+
+# 任务名称 -> (pipeline任务类型, 构建函数)
+TINY_MODELS = {
+    "qa": ("question-answering", build_qa_model),
+    "translation": ("translation", build_translation_model),
+    "text": ("text-generation", build_text_generation_model),
+    "conversation": ("text2text-generation", build_conversation_model),
+    "asr": ("automatic-speech-recognition", build_asr_model),
+}
+
+
+def ensure_tiny_model(name, base_dir):
+    """
+    返回任务对应的小模型目录，不存在时构建
+
+    Args:
+        name (str): 任务名称，见 TINY_MODELS
+        base_dir (str): 保存模型的根目录
+
+    Returns:
+        str: 模型目录
+    """
+    save_dir = os.path.join(base_dir, name)
+    if not os.path.exists(os.path.join(save_dir, "config.json")):
+        print(f"构建小模型: {name} -> {save_dir}")
+        TINY_MODELS[name][1](save_dir)
+    return save_dir
@@ -5,27 +5,74 @@
 Transformers Pipeline 展示脚本
 
 这个脚本展示了多种 Hugging Face Transformers pipeline 的使用方法，
-包括问答、文本生成、翻译和会话等任务。
+包括语音识别、问答、文本生成、翻译和会话等任务。
 """
 
 import os
+import re
 import sys
 import argparse
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from utils import get_device, create_pipeline, print_device_info
+from utils import get_device, create_pipeline, print_device_info, print_cache_stats
+from utils.audio_utils import format_timestamp, list_audio_files, transcribe_files
+from utils.vad_utils import transcribe_with_vad, print_vad_stats
+
+# 各展示任务使用的 (pipeline任务类型, 模型)，预加载时按同样的参数创建pipeline
+TASK_MODELS = {
+    "asr": ("automatic-speech-recognition", "openai/whisper-tiny"),  # 使用小模型以加快演示速度
+    "qa": ("question-answering", "distilbert-base-cased-distilled-squad"),
+    "text": ("text-generation", "gpt2"),
+    "translation": ("translation", "Helsinki-NLP/opus-mt-zh-en"),  # 中译英
+    "conversation": ("text2text-generation", "facebook/blenderbot-400M-distill")
+}
+
+def showcase_asr():
+    """展示语音识别 (Automatic Speech Recognition)"""
+    print("\n=== 语音识别示例 ===")
+    
+    # 创建 pipeline
+    task, model_name = TASK_MODELS["asr"]
+    pipe = create_pipeline(task=task, model_name=model_name)
+    
+    # 请求用户输入
+    audio_file = input("请输入音频文件或目录路径：").strip()
+    
+    # 目录: 后台解码预取，按时长分批识别，结果按文件顺序输出
+    if os.path.isdir(audio_file):
+        print("处理中...")
+        for result in transcribe_files(pipe, list_audio_files(audio_file)):
+            if result["error"]:
+                print(f"{result['audio']}: 解码失败 ({result['error']})")
+            else:
+                print(f"{result['audio']}: {result['text']}")
+        return
+    
+    if not os.path.exists(audio_file):
+        print(f"错误：文件 '{audio_file}' 不存在")
+        return
+    
+    # 执行识别: 逐块检测语音段，只把语音拼接后批量识别，跳过静音，边识别边输出
+    print("处理中...")
+    print("\n识别结果：")
+    print("-" * 50)
+    stats = {}
+    for segment in transcribe_with_vad(pipe, audio_file, stats=stats):
+        print(f"[{format_timestamp(segment['start'])} -> {format_timestamp(segment['end'])}] {segment['text']}")
+    print("-" * 50)
+    print_vad_stats(stats)
 
 def showcase_qa():
     """展示问答系统"""
+    from utils.qa_utils import batch_answer
+
     print("\n=== 问答系统示例 ===")
     
     # 创建 pipeline
-    pipe = create_pipeline(
-        task="question-answering",
-        model_name="distilbert-base-cased-distilled-squad"
-    )
+    task, model_name = TASK_MODELS["qa"]
+    pipe = create_pipeline(task=task, model_name=model_name)
     
     # 示例上下文和问题
     context = """
@@ -35,29 +82,29 @@ def showcase_qa():
     目前比较普遍的观点认为，把人工智能定义为研究智能体的计算机科学分支较为合适。
     """
     
-    question = input("请输入问题 (例如：什么是人工智能？): ").strip() or "什么是人工智能？"
+    text = input("请输入问题，多个问题用'；'分隔 (例如：什么是人工智能？；智能体是什么？): ").strip()
+    questions = [q.strip() for q in re.split(r"[;；]", text) if q.strip()] or ["什么是人工智能？"]
     
-    # 执行问答
+    # 执行问答: 上下文只分词一次，所有问题一起推理
     print("思考中...")
-    result = pipe(question=question, context=context)
+    results = batch_answer(pipe, [{"question": q, "context": context} for q in questions])
     
     # 显示结果
     print("\n问答结果：")
     print("-" * 50)
-    print(f"问题：{question}")
-    print(f"回答：{result['answer']}")
-    print(f"置信度：{result['score']:.4f}")
-    print("-" * 50)
+    for question, result in zip(questions, results):
+        print(f"问题：{question}")
+        print(f"回答：{result['answer']}")
+        print(f"置信度：{result['score']:.4f}")
+        print("-" * 50)
 
 def showcase_text_generation():
     """展示文本生成"""
     print("\n=== 文本生成示例 ===")
     
     # 创建 pipeline
-    pipe = create_pipeline(
-        task="text-generation",
-        model_name="gpt2"
-    )
+    task, model_name = TASK_MODELS["text"]
+    pipe = create_pipeline(task=task, model_name=model_name)
     
     # 示例提示
     prompt = input("请输入提示文本 (例如：人工智能将在未来): ").strip() or "人工智能将在未来"
@@ -83,10 +130,8 @@ def showcase_translation():
     print("\n=== 翻译示例 ===")
     
     # 创建 pipeline
-    pipe = create_pipeline(
-        task="translation",
-        model_name="Helsinki-NLP/opus-mt-zh-en"  # 中译英
-    )
+    task, model_name = TASK_MODELS["translation"]
+    pipe = create_pipeline(task=task, model_name=model_name)
     
     # 示例文本
     text = input("请输入中文文本 (例如：人工智能是计算机科学的一个分支): ").strip() or "人工智能是计算机科学的一个分支"
@@ -106,39 +151,33 @@ def showcase_conversation():
     """展示会话"""
     print("\n=== 会话示例 ===")
     
-    # 创建 pipeline
-    pipe = create_pipeline(
-        task="conversational",
-        model_name="facebook/blenderbot-400M-distill"
-    )
+    from utils.chat_utils import ChatEngine
+    
+    # 创建会话引擎，每轮只处理新的输入
+    engine = ChatEngine(TASK_MODELS["conversation"][1])
+    session = engine.new_session()
     
     # 示例对话
     print("\n请进行对话，最多三轮 (输入 'q' 提前结束):")
     
-    conversation = None
-    
     for i in range(3):
         user_input = input("\n用户：").strip()
         if user_input.lower() == 'q':
             break
             
-        # 执行对话
-        if conversation is None:
-            conversation = pipe(user_input)
-        else:
-            conversation = pipe(user_input, past_user_inputs=conversation.past_user_inputs, 
-                               generated_responses=conversation.generated_responses)
-            
-        # 显示结果
-        bot_response = conversation.generated_responses[-1]
+        # 执行对话并显示结果
+        bot_response = engine.chat(session, user_input)
         print(f"机器人：{bot_response}")
 
 def main():
     """主函数"""
     # 解析命令行参数
     parser = argparse.ArgumentParser(description="Transformers Pipeline 展示")
-    parser.add_argument("--task", choices=["qa", "text", "translation", "conversation", "all"],
+    parser.add_argument("--task", choices=["asr", "qa", "text", "translation", "conversation", "all"],
                        help="要展示的任务 (默认：all)")
+    parser.add_argument("--no_prefetch", action="store_true", help="不在后台预加载后续任务的模型")
+    parser.add_argument("--prefetch_memory_gb", type=float,
+                       help="预加载的内存预算，单位GB (默认与pipeline缓存相同)")
     args = parser.parse_args()
     
     # 打印设备信息
@@ -150,11 +189,24 @@ def main():
     if args.task and args.task != "all":
         tasks = [args.task]
     else:
-        tasks = ["qa", "text", "translation", "conversation"]
+        tasks = ["asr", "qa", "text", "translation", "conversation"]
+    
+    # 在后台预加载接下来的任务模型，等待用户输入时模型已在加载
+    prefetcher = None
+    if not args.no_prefetch:
+        from utils.prefetch_utils import PipelinePrefetcher
+        prefetcher = PipelinePrefetcher(
+            [TASK_MODELS[task] for task in tasks],
+            max_memory_gb=args.prefetch_memory_gb
+        )
     
     # 执行展示
-    for task in tasks:
-        if task == "qa":
+    for i, task in enumerate(tasks):
+        if prefetcher is not None:
+            prefetcher.advance(i)
+        if task == "asr":
+            showcase_asr()
+        elif task == "qa":
             showcase_qa()
         elif task == "text":
             showcase_text_generation()
@@ -163,7 +215,14 @@ def main():
         elif task == "conversation":
             showcase_conversation()
     
+    if prefetcher is not None:
+        prefetcher.close()
+        stats = prefetcher.stats
+        print(f"\n预加载: 提交 {stats['scheduled']}, 完成 {stats['loaded']}, "
+              f"因内存预算跳过 {stats['skipped']}, 失败 {stats['failed']}")
+    
     print("\n=== 展示完成 ===")
+    print_cache_stats()
     print("如需了解更多详情，请查看 'tasks/' 目录下的各个任务脚本")
 
 if __name__ == "__main__":
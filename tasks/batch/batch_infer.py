@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量推理脚本
+以流式方式对JSONL文件批量执行问答、翻译、文本生成或语音识别，支持断点续跑
+
+输入格式 (每行一个JSON对象):
+    qa:          {"id": ..., "question": "...", "context": "..."}
+    translation: {"id": ..., "text": "..."}
+    text:        {"id": ..., "prompt": "..."}
+    asr:         {"id": ..., "audio": "/path/to/audio.wav"}
+"""
+
+import os
+import sys
+import argparse
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from utils import get_device, create_pipeline, get_pipeline_metrics
+from utils.tuning_utils import tuned_batch_size
+from utils.batch_utils import run_batch
+
+# 任务名称与pipeline任务类型、默认模型
+TASKS = {
+    "qa": ("question-answering", "distilbert-base-cased-distilled-squad"),
+    "translation": ("translation", "Helsinki-NLP/opus-mt-zh-en"),
+    "text": ("text-generation", "gpt2"),
+    "asr": ("automatic-speech-recognition", "openai/whisper-tiny"),
+}
+
+def main():
+    """主函数"""
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description="基于Transformers的批量推理")
+    parser.add_argument("--task", required=True, choices=TASKS.keys(), help="任务类型")
+    parser.add_argument("--input", required=True, help="输入JSONL文件路径")
+    parser.add_argument("--output", required=True, help="输出JSONL文件路径")
+    parser.add_argument("--model", help="指定模型路径或名称 (默认使用任务默认模型)")
+    parser.add_argument("--batch_size", type=int, help="每批推理的记录数 (默认: 本机调优配置，没有时为8)")
+    parser.add_argument("--window_size", type=int, help="每次读入并按长度排序的记录数 (默认: batch_size * 32)")
+    parser.add_argument("--max_length", type=int, help="文本生成/翻译的最大长度")
+    parser.add_argument("--restart", action="store_true", help="忽略断点，从头开始")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="CPU多进程推理的进程数，进程间共享模型权重 (默认: 0，单进程)")
+    parser.add_argument("--metrics_output", help="保存各阶段耗时指标的路径 (.json 或 .prom)")
+    parser.add_argument("--threads_per_worker", type=int, help="每个推理进程的线程数 (默认: 平均分配CPU核心)")
+    parser.add_argument("--quantize", action="store_true", help="使用动态int8量化在CPU上运行模型")
+    args = parser.parse_args()
+
+    # 获取设备
+    device = get_device()
+    print(f"使用设备: {device}")
+
+    task, default_model = TASKS[args.task]
+    model_name = args.model or default_model
+
+    # 创建pipeline
+    print(f"加载模型: {model_name}")
+    pipe = create_pipeline(
+        task=task,
+        model_name=model_name,
+        instrument=bool(args.metrics_output),
+        quantize=args.quantize
+    )
+
+    batch_size = args.batch_size or tuned_batch_size(pipe, 8)
+
+    kwargs = {}
+    if args.max_length:
+        kwargs["max_length"] = args.max_length
+
+    # 多进程模式：模型只加载一次，由各进程共享
+    pool = None
+    process_fn = None
+    if args.workers > 0:
+        from utils.worker_utils import CPUWorkerPool
+        pool = CPUWorkerPool(pipe, num_workers=args.workers, threads_per_worker=args.threads_per_worker)
+        process_fn = pool.map
+    elif args.task == "qa" and not args.metrics_output:
+        # 批量问答: 同一上下文只分词一次，所有 问题×窗口 特征一起分批推理
+        from utils.qa_utils import batch_answer
+
+        def process_fn(inputs, batch_size, **kwargs):
+            return batch_answer(pipe, inputs, batch_size=batch_size)
+
+    try:
+        stats = run_batch(
+            pipe,
+            task,
+            args.input,
+            args.output,
+            batch_size=batch_size,
+            window_size=args.window_size,
+            resume=not args.restart,
+            process_fn=process_fn,
+            **kwargs
+        )
+    finally:
+        if pool:
+            pool.close()
+
+    print(f"\n本次处理 {stats['processed']} 条，累计 {stats['total_done']} 条")
+    print(f"耗时 {stats['seconds']:.1f} 秒 ({stats['records_per_second']:.1f} 条/秒)")
+    print(f"结果已写入: {args.output}")
+    
+    # 多进程模式下各阶段在子进程中执行，父进程只有加载前的空指标
+    metrics = get_pipeline_metrics(pipe)
+    if metrics and args.metrics_output:
+        with open(args.metrics_output, "w", encoding="utf-8") as f:
+            if args.metrics_output.endswith(".prom"):
+                f.write(metrics.to_prometheus())
+            else:
+                f.write(metrics.to_json())
+        print(f"指标已写入: {args.metrics_output}")
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@
 
 """
 聊天机器人示例脚本
-展示如何使用Transformers的conversation pipeline创建简单的聊天机器人
+展示如何基于Transformers的会话模型创建简单的聊天机器人，
+多轮对话中复用已编码的历史，每轮延迟不随对话长度增长
 """
 
 import os
@@ -13,18 +14,18 @@ import argparse
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from utils import get_device, create_pipeline
+from utils import get_device
 
 # 默认会话模型
 DEFAULT_MODEL = "facebook/blenderbot-400M-distill"
 
-def interactive_chat(pipe):
+def interactive_chat(engine):
     """交互式聊天"""
     print("\n欢迎使用聊天机器人！")
     print("输入'退出'或'exit'结束对话\n")
     
-    # 初始化对话历史
-    conversation_history = []
+    # 会话只保存在窗口内的历史和缓存，每轮只处理新的输入
+    session = engine.new_session()
     
     while True:
         # 获取用户输入
@@ -32,19 +33,11 @@ def interactive_chat(pipe):
         if user_input.lower() in ["退出", "exit"]:
             break
             
-        # 如果是新对话
-        if not conversation_history:
-            conversation = pipe(user_input)
-        else:
-            # 将用户输入添加到现有对话
-            conversation_history.append(user_input)
-            conversation = pipe(conversation_history)
-            
         # 获取模型响应
-        bot_response = conversation.generated_responses[-1]
-        conversation_history = conversation.to_dict()["past_user_inputs"]
+        bot_response = engine.chat(session, user_input)
         
         print(f"机器人: {bot_response}")
+        print(f"(耗时 {session.latencies[-1]:.2f}s, 历史 {session.history_tokens()} tokens)")
 
 def main():
     """主函数"""
@@ -52,30 +45,34 @@ def main():
     parser = argparse.ArgumentParser(description="基于Transformers的聊天机器人")
     parser.add_argument("--model", default=DEFAULT_MODEL, help=f"聊天模型名称 (默认: {DEFAULT_MODEL})")
     parser.add_argument("--message", help="单条消息模式：输入一条消息并获取回复")
+    parser.add_argument("--max_history_tokens", type=int, help="保留的历史token数 (默认由模型最大长度决定)")
+    parser.add_argument("--max_new_tokens", type=int, default=60, help="每轮回复的最大token数 (默认: 60)")
     args = parser.parse_args()
     
     # 获取设备
     device = get_device()
     print(f"使用设备: {device}")
     
-    # 创建会话pipeline
+    # 创建会话引擎 (解析参数之后才导入 torch 和 transformers)
+    from utils.chat_utils import ChatEngine
+    
     print(f"加载聊天模型: {args.model}")
-    pipe = create_pipeline(
-        task="conversational",
-        model_name=args.model
+    engine = ChatEngine(
+        args.model,
+        max_history_tokens=args.max_history_tokens,
+        max_new_tokens=args.max_new_tokens
     )
     
     # 如果命令行提供了消息，直接回复
     if args.message:
-        conversation = pipe(args.message)
-        bot_response = conversation.generated_responses[-1]
+        bot_response = engine.chat(engine.new_session(), args.message)
         print(f"\n用户: {args.message}")
         print(f"机器人: {bot_response}")
     else:
         # 否则进入交互模式
-        interactive_chat(pipe)
+        interactive_chat(engine)
     
     print("\n感谢使用聊天机器人！")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
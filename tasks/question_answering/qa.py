@@ -3,7 +3,8 @@
 
 """
 问答系统示例脚本
-展示如何使用Transformers的问答pipeline完成基于上下文的问答任务
+展示如何使用Transformers的问答pipeline完成基于上下文的问答任务，
+也支持先用BM25检索文档库中的相关段落再抽取答案
 """
 
 import os
@@ -14,6 +15,7 @@ import argparse
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 from utils import get_device, create_pipeline
+from utils.retrieval_utils import BM25Index, answer_from_index
 
 # 默认问答模型
 DEFAULT_MODEL = "distilbert-base-cased-distilled-squad"
@@ -45,15 +47,77 @@ def interactive_qa(pipe):
         print(f"置信度: {result['score']:.4f}")
         print("-" * 80 + "\n")
 
+def print_corpus_answer(question, result):
+    """显示文档库问答结果"""
+    print(f"问题: {question}")
+    if result is None:
+        print("未检索到相关段落")
+        return
+    print(f"回答: {result['answer']}")
+    print(f"置信度: {result['score']:.4f}")
+    print(f"来源: {result['source']} (段落 {result['passage_id']})")
+
+def interactive_corpus_qa(pipe, index, top_k):
+    """基于文档库的交互式问答"""
+    print(f"\n欢迎使用文档库问答系统！(共 {len(index)} 个段落)")
+    print("输入'退出'或'exit'结束对话\n")
+    
+    while True:
+        question = input("请输入问题: ").strip()
+        if question.lower() in ["退出", "exit"]:
+            break
+            
+        print("\n检索中...\n")
+        result = answer_from_index(pipe, index, question, top_k=top_k)
+        print_corpus_answer(question, result)
+        print("-" * 80 + "\n")
+
+def read_questions(path):
+    """读取问题文件，每行一个问题"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def print_batch_answers(pipe, questions, context, batch_size):
+    """对同一上下文批量回答多个问题"""
+    from utils.qa_utils import batch_answer
+    results = batch_answer(pipe, [{"question": q, "context": context} for q in questions], batch_size=batch_size)
+    for question, result in zip(questions, results):
+        print(f"\n问题: {question}")
+        print(f"回答: {result['answer']}")
+        print(f"置信度: {result['score']:.4f}")
+
+def load_index(args):
+    """加载或建立文档库索引"""
+    index_dir = args.index_dir or os.path.join(args.docs_dir, ".bm25_index")
+    if BM25Index.exists(index_dir) and not args.rebuild_index:
+        print(f"加载索引: {index_dir}")
+        return BM25Index.load(index_dir)
+    print(f"建立索引: {args.docs_dir} -> {index_dir}")
+    return BM25Index.build(args.docs_dir, index_dir, passage_chars=args.passage_chars)
+
 def main():
     """主函数"""
     # 解析命令行参数
     parser = argparse.ArgumentParser(description="基于Transformers的问答系统")
     parser.add_argument("--model", default=DEFAULT_MODEL, help=f"问答模型名称 (默认: {DEFAULT_MODEL})")
     parser.add_argument("--context", help="上下文文本")
+    parser.add_argument("--context_file", help="上下文文本文件 (代替 --context)")
     parser.add_argument("--question", help="问题文本")
+    parser.add_argument("--questions_file", help="问题文件，每行一个问题，对同一上下文批量回答")
+    parser.add_argument("--batch_size", type=int, default=32, help="批量问答时每批的特征数 (默认: 32)")
+    parser.add_argument("--docs_dir", help="文档库目录 (txt/md)，指定后从文档库中检索上下文")
+    parser.add_argument("--index_dir", help="索引保存目录 (默认: <docs_dir>/.bm25_index)")
+    parser.add_argument("--rebuild_index", action="store_true", help="重新建立索引")
+    parser.add_argument("--passage_chars", type=int, default=1000, help="建立索引时每个段落的字符数 (默认: 1000)")
+    parser.add_argument("--top_k", type=int, default=5, help="每个问题送入问答模型的段落数 (默认: 5)")
+    parser.add_argument("--quantize", action="store_true", help="使用动态int8量化在CPU上运行模型")
+    parser.add_argument("--compile", action="store_true", help="使用编译后端 (torch.compile，输入按长度分桶补齐)")
     args = parser.parse_args()
     
+    if args.context_file:
+        with open(args.context_file, "r", encoding="utf-8") as f:
+            args.context = f.read()
+    
     # 获取设备
     device = get_device()
     print(f"使用设备: {device}")
@@ -62,11 +126,25 @@ def main():
     print(f"加载问答模型: {args.model}")
     pipe = create_pipeline(
         task="question-answering",
-        model_name=args.model
+        model_name=args.model,
+        quantize=args.quantize,
+        compile_model=args.compile
     )
     
+    # 文档库模式：先检索再阅读
+    if args.docs_dir:
+        index = load_index(args)
+        if args.question:
+            print()
+            result = answer_from_index(pipe, index, args.question, top_k=args.top_k)
+            print_corpus_answer(args.question, result)
+        else:
+            interactive_corpus_qa(pipe, index, args.top_k)
+    # 问题文件: 上下文只分词一次，所有问题一起分批推理
+    elif args.context and args.questions_file:
+        print_batch_answers(pipe, read_questions(args.questions_file), args.context, args.batch_size)
     # 如果命令行提供了上下文和问题，直接回答
-    if args.context and args.question:
+    elif args.context and args.question:
         result = pipe(question=args.question, context=args.context)
         print(f"\n问题: {args.question}")
         print(f"回答: {result['answer']}")
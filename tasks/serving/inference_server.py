@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地推理服务
+基于asyncio的HTTP服务，提供问答、翻译、文本生成和语音识别接口，
+并发请求会被合并为微批次在专用推理线程上执行
+
+接口 (POST, JSON):
+    /qa        {"question": "...", "context": "..."}
+    /translate {"text": "..."}
+    /generate  {"prompt": "..."}
+    /asr       {"audio": "<base64编码的音频文件>"}
+               或 {"audio_path": "相对 --audio_root 的路径"} (仅在指定 --audio_root 时可用)
+可选字段 "timeout_ms" 指定请求截止时间。GET /health 和 /stats 返回服务状态。
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import binascii
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from utils import get_device, create_pipeline
+from utils.batch_utils import run_pipeline_batch
+from utils.serving_utils import MicroBatcher, QueueFullError, DeadlineExceededError
+
+# 接口路径与pipeline任务类型、默认模型、请求字段
+ENDPOINTS = {
+    "/qa": ("question-answering", "distilbert-base-cased-distilled-squad", ("question", "context")),
+    "/translate": ("translation", "Helsinki-NLP/opus-mt-zh-en", ("text",)),
+    "/generate": ("text-generation", "gpt2", ("prompt",)),
+    "/asr": ("automatic-speech-recognition", "openai/whisper-tiny", ("audio",)),
+}
+
+TASK_NAMES = {"qa": "/qa", "translation": "/translate", "text": "/generate", "asr": "/asr"}
+
+HTTP_STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+
+def make_process_fn(path, pipe, batch_size, max_length):
+    """为接口创建批处理函数"""
+    task = ENDPOINTS[path][0]
+    kwargs = {}
+    if task == "text-generation":
+        # pad token 和左侧填充由 create_pipeline 统一设置
+        kwargs = {"max_length": max_length, "do_sample": False}
+
+    def process(inputs):
+        if task == "question-answering":
+            inputs = [{"question": i["question"], "context": i["context"]} for i in inputs]
+        else:
+            field = ENDPOINTS[path][2][0]
+            inputs = [i[field] for i in inputs]
+        return run_pipeline_batch(pipe, inputs, batch_size, **kwargs)
+
+    return process
+
+
+class InferenceServer:
+    """微批处理推理服务"""
+
+    def __init__(self, args):
+        self.args = args
+        self.batchers = {}
+        self.audio_root = os.path.realpath(args.audio_root) if args.audio_root else None
+        # 所有模型共用一个推理线程，避免相互争抢计算资源
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    async def load(self, task_names):
+        """在推理线程上加载所需的pipeline"""
+        loop = asyncio.get_running_loop()
+        for name in task_names:
+            path = TASK_NAMES[name]
+            task, model_name, _ = ENDPOINTS[path]
+            print(f"加载 {path} 模型: {model_name}")
+            pipe = await loop.run_in_executor(
+                self.executor, lambda: create_pipeline(task=task, model_name=model_name)
+            )
+            batcher = MicroBatcher(
+                make_process_fn(path, pipe, self.args.max_batch_size, self.args.max_length),
+                max_batch_size=self.args.max_batch_size,
+                max_wait_ms=self.args.max_wait_ms,
+                max_queue_size=self.args.max_queue_size,
+                executor=self.executor
+            )
+            batcher.start()
+            self.batchers[path] = batcher
+
+    def resolve_audio(self, payload):
+        """
+        把 /asr 请求中的音频换成pipeline的输入，写回 payload["audio"]
+
+        "audio" 为base64编码的音频文件内容；"audio_path" 只在配置了 --audio_root 时接受，
+        且解析后必须位于该目录之内，避免客户端读取服务器上的任意文件或让pipeline下载URL。
+
+        Returns:
+            str: 错误信息，没有错误时返回 None
+        """
+        if "audio_path" in payload:
+            if self.audio_root is None:
+                return "服务未配置 --audio_root，不接受 audio_path"
+            relative = payload.pop("audio_path")
+            if not isinstance(relative, str) or not relative.strip():
+                return "audio_path 必须是非空字符串"
+            full_path = os.path.realpath(os.path.join(self.audio_root, relative))
+            if os.path.commonpath([full_path, self.audio_root]) != self.audio_root:
+                return "audio_path 必须位于 --audio_root 之内"
+            if not os.path.isfile(full_path):
+                return f"音频文件不存在: {relative}"
+            payload["audio"] = full_path
+            return None
+
+        if "audio" not in payload:
+            return None
+        if not isinstance(payload["audio"], str):
+            return "audio 必须是base64编码的字符串"
+        try:
+            payload["audio"] = base64.b64decode(payload["audio"], validate=True)
+        except (binascii.Error, ValueError):
+            return "audio 不是有效的base64编码"
+        return None
+
+    async def handle_request(self, method, path, body):
+        """处理单个请求，返回 (状态码, JSON对象)"""
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "endpoints": sorted(self.batchers)}
+        if method == "GET" and path == "/stats":
+            return 200, {p: dict(b.stats, queued=b.queue.qsize()) for p, b in self.batchers.items()}
+        if method != "POST" or path not in self.batchers:
+            return 404, {"error": f"未知接口: {method} {path}"}
+
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return 400, {"error": "请求体必须是JSON"}
+        if not isinstance(payload, dict):
+            return 400, {"error": "请求体必须是JSON对象"}
+        error = self.resolve_audio(payload) if path == "/asr" else None
+        if error:
+            return 400, {"error": error}
+        missing = [f for f in ENDPOINTS[path][2] if f not in payload]
+        if missing:
+            return 400, {"error": f"缺少字段: {', '.join(missing)}"}
+        invalid = [f for f in ENDPOINTS[path][2]
+                   if not isinstance(payload[f], (str, bytes)) or not payload[f].strip()]
+        if invalid:
+            return 400, {"error": f"字段必须是非空字符串: {', '.join(invalid)}"}
+
+        try:
+            timeout = float(payload.get("timeout_ms", self.args.default_timeout_ms)) / 1000
+        except (TypeError, ValueError):
+            return 400, {"error": "timeout_ms 必须是数字"}
+        if not timeout > 0:
+            return 400, {"error": "timeout_ms 必须大于0"}
+        deadline = time.monotonic() + timeout
+        try:
+            result = await asyncio.wait_for(self.batchers[path].submit(payload, deadline), timeout)
+        except QueueFullError as e:
+            return 503, {"error": str(e)}
+        except (DeadlineExceededError, asyncio.TimeoutError):
+            return 504, {"error": "请求超时"}
+        except Exception as e:
+            return 500, {"error": str(e)}
+        return 200, {"result": result}
+
+    async def handle_connection(self, reader, writer):
+        """解析HTTP/1.1请求并写回JSON响应"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    status, response = 400, {"error": "Content-Length 无效"}
+                    keep_alive = False
+                elif length > MAX_BODY_SIZE:
+                    status, response = 413, {"error": "请求体过大"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, response = await self.handle_request(method, path, body)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+
+                data = json.dumps(response, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, task_names):
+        await self.load(task_names)
+        server = await asyncio.start_server(self.handle_connection, self.args.host, self.args.port)
+        print(f"\n推理服务已启动: http://{self.args.host}:{self.args.port}")
+        print(f"可用接口: {', '.join(sorted(self.batchers))}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """主函数"""
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description="基于Transformers的本地推理服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址 (默认: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口 (默认: 8000)")
+    parser.add_argument("--tasks", default="qa,translation,text,asr",
+                        help="启用的任务，逗号分隔 (默认: qa,translation,text,asr)")
+    parser.add_argument("--max_batch_size", type=int, default=8, help="每个微批次的最大请求数 (默认: 8)")
+    parser.add_argument("--max_wait_ms", type=float, default=10, help="收集微批次的最长等待时间 (默认: 10ms)")
+    parser.add_argument("--max_queue_size", type=int, default=256, help="每个接口的最大排队请求数 (默认: 256)")
+    parser.add_argument("--default_timeout_ms", type=float, default=30000, help="请求默认截止时间 (默认: 30000ms)")
+    parser.add_argument("--max_length", type=int, default=50, help="文本生成的最大长度 (默认: 50)")
+    parser.add_argument("--audio_root", help="/asr 接口允许通过 audio_path 读取的音频目录 (默认不允许读取服务器文件)")
+    args = parser.parse_args()
+
+    task_names = [t.strip() for t in args.tasks.split(",") if t.strip()]
+    unknown = [t for t in task_names if t not in TASK_NAMES]
+    if unknown:
+        parser.error(f"未知任务: {', '.join(unknown)}")
+
+    # 获取设备
+    device = get_device()
+    print(f"使用设备: {device}")
+
+    try:
+        asyncio.run(InferenceServer(args).serve(task_names))
+    except KeyboardInterrupt:
+        print("\n推理服务已停止")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+语音识别示例脚本
+展示如何使用Transformers的automatic-speech-recognition pipeline转写音频，
+支持对长音频分窗批量识别，以及先检测语音段、跳过静音再识别，
+也支持对整个目录或清单中的音频文件批量识别
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from utils import get_device, create_pipeline
+from utils.tuning_utils import tuned_batch_size
+from utils.audio_utils import (TARGET_SAMPLING_RATE, get_audio_duration, load_audio, transcribe_long_audio,
+                               format_timestamp, list_audio_files, read_manifest, transcribe_files)
+from utils.vad_utils import transcribe_with_vad, print_vad_stats
+
+# 默认语音识别模型
+DEFAULT_MODEL = "openai/whisper-tiny"
+
+def transcribe(pipe, audio_file, args):
+    """转写单个音频文件"""
+    if not os.path.exists(audio_file):
+        print(f"错误：文件 '{audio_file}' 不存在")
+        return
+
+    try:
+        duration = get_audio_duration(audio_file)
+        print(f"\n音频时长: {format_timestamp(duration)}")
+    except RuntimeError:
+        # soundfile 无法读取的格式 (如 m4a) 交给 ffmpeg 解码，解码后才知道时长
+        duration = None
+
+    # 只识别检测到的语音段，时间戳换算回原始时间线
+    if args.vad:
+        stats = {}
+        for segment in transcribe_with_vad(
+            pipe,
+            audio_file,
+            batch_size=args.batch_size,
+            max_segment_s=args.window,
+            window_s=args.window,
+            overlap_s=args.overlap,
+            stats=stats,
+            margin_db=args.vad_margin_db
+        ):
+            print(f"[{format_timestamp(segment['start'])} -> {format_timestamp(segment['end'])}] {segment['text']}")
+        print()
+        print_vad_stats(stats)
+        return
+
+    if duration is None:
+        samples = load_audio(audio_file)
+        print(f"\n音频时长: {format_timestamp(len(samples) / TARGET_SAMPLING_RATE)}")
+        inputs = {"raw": samples, "sampling_rate": TARGET_SAMPLING_RATE}
+        if len(samples) <= args.window * TARGET_SAMPLING_RATE and not args.long_form:
+            print(pipe(inputs)["text"])
+            return
+        # 分窗读取依赖 soundfile，已解码的音频交给pipeline分块识别
+        result = pipe(inputs, chunk_length_s=args.window, batch_size=args.batch_size, return_timestamps=True)
+        for chunk in result.get("chunks", []):
+            chunk_start, chunk_end = chunk["timestamp"]
+            chunk_end = chunk_end if chunk_end is not None else len(samples) / TARGET_SAMPLING_RATE
+            print(f"[{format_timestamp(chunk_start or 0.0)} -> {format_timestamp(chunk_end)}] {chunk['text'].strip()}")
+        return
+
+    # 短音频直接整段识别
+    if duration <= args.window and not args.long_form:
+        result = pipe(audio_file)
+        print(result["text"])
+        return
+
+    # 长音频分窗批量识别，边识别边输出
+    for segment in transcribe_long_audio(
+        pipe,
+        audio_file,
+        window_s=args.window,
+        overlap_s=args.overlap,
+        batch_size=args.batch_size
+    ):
+        print(f"[{format_timestamp(segment['start'])} -> {format_timestamp(segment['end'])}] {segment['text']}")
+
+def transcribe_many(pipe, paths, args):
+    """批量识别多个音频文件，结果按清单顺序输出"""
+    print(f"\n共 {len(paths)} 个音频文件")
+    stats = {}
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        for result in transcribe_files(
+            pipe,
+            paths,
+            batch_size=args.batch_size,
+            decode_workers=args.decode_workers,
+            prefetch_batches=args.prefetch_batches,
+            use_processes=args.decode_processes,
+            stats=stats
+        ):
+            if output:
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+            if result["error"]:
+                print(f"[{result['index'] + 1}/{len(paths)}] {result['audio']} 解码失败: {result['error']}")
+                continue
+            print(f"[{result['index'] + 1}/{len(paths)}] {result['audio']} ({format_timestamp(result['duration'])})")
+            print(f"  {result['text']}")
+    finally:
+        if output:
+            output.close()
+
+    wall = stats["wall_seconds"]
+    print(f"\n识别 {stats['files']} 个文件，音频总时长 {format_timestamp(stats['audio_seconds'])}，"
+          f"耗时 {wall:.1f} 秒 (实时率 {stats['audio_seconds'] / wall if wall else 0:.1f}x)")
+    print(f"推理线程等待解码: {stats['decode_wait_seconds']:.1f} 秒")
+    if stats["failed"]:
+        print(f"解码失败 {len(stats['failed'])} 个文件:")
+        for path in stats["failed"]:
+            print(f"  {path}")
+    if args.output:
+        print(f"结果已写入: {args.output}")
+
+def interactive_asr(pipe, args):
+    """交互式语音识别"""
+    print("\n欢迎使用语音识别系统！")
+    print("输入'退出'或'exit'结束使用\n")
+
+    while True:
+        audio_file = input("请输入音频文件路径: ").strip()
+        if audio_file.lower() in ["退出", "exit"]:
+            break
+
+        transcribe(pipe, audio_file, args)
+        print("-" * 80)
+
+def main():
+    """主函数"""
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description="基于Transformers的语音识别")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"语音识别模型名称 (默认: {DEFAULT_MODEL})")
+    parser.add_argument("--audio", help="音频文件路径")
+    parser.add_argument("--input_dir", help="音频目录，批量识别其中所有音频文件")
+    parser.add_argument("--manifest", help="音频清单，每行一个路径或包含 audio 字段的JSON对象")
+    parser.add_argument("--output", help="批量识别结果保存路径 (JSONL)")
+    parser.add_argument("--decode_workers", type=int, default=4, help="批量识别时的解码线程数 (默认: 4)")
+    parser.add_argument("--decode_processes", action="store_true", help="批量识别时使用进程池解码")
+    parser.add_argument("--prefetch_batches", type=int, default=4, help="批量识别时预取的批数 (默认: 4)")
+    parser.add_argument("--long_form", action="store_true", help="强制使用长音频分窗模式")
+    parser.add_argument("--window", type=float, default=30.0, help="分窗长度，单位秒 (默认: 30)")
+    parser.add_argument("--overlap", type=float, default=5.0, help="相邻窗口重叠长度，单位秒 (默认: 5)")
+    parser.add_argument("--batch_size", type=int, help="每批识别的窗口数 (默认: 本机调优配置，没有时为8)")
+    parser.add_argument("--vad", action="store_true", help="先检测语音段，只识别语音部分 (跳过静音)")
+    parser.add_argument("--vad_margin_db", type=float, default=10.0,
+                        help="语音帧能量需高于底噪的分贝数 (默认: 10)")
+    parser.add_argument("--quantize", action="store_true", help="使用动态int8量化在CPU上运行模型")
+    args = parser.parse_args()
+
+    # 获取设备
+    device = get_device()
+    print(f"使用设备: {device}")
+
+    # 创建语音识别pipeline
+    print(f"加载语音识别模型: {args.model}")
+    pipe = create_pipeline(
+        task="automatic-speech-recognition",
+        model_name=args.model,
+        quantize=args.quantize
+    )
+
+    args.batch_size = args.batch_size or tuned_batch_size(pipe, 8)
+    
+    # 目录或清单: 后台解码预取，按时长分批识别
+    if args.input_dir or args.manifest:
+        paths = read_manifest(args.manifest) if args.manifest else list_audio_files(args.input_dir)
+        transcribe_many(pipe, paths, args)
+    # 如果命令行提供了音频文件，直接识别
+    elif args.audio:
+        transcribe(pipe, args.audio, args)
+    else:
+        # 否则进入交互模式
+        interactive_asr(pipe, args)
+
+    print("\n感谢使用语音识别系统！")
+
+if __name__ == "__main__":
+    main()
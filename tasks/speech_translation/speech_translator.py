@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+语音翻译示例脚本
+语音识别和翻译两个模型组成流水线并发运行:
+whisper 每识别出一段文本就立即送入翻译模型，不必等整段音频识别完成
+"""
+
+import os
+import sys
+import argparse
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from utils import get_device, create_pipeline
+from utils.chain_utils import PipelineChain, ChainStage
+from tasks.translation.translator import TRANSLATION_MODELS
+
+# 默认语音识别模型
+DEFAULT_ASR_MODEL = "openai/whisper-tiny"
+
+def build_chain(asr_pipe, translate_pipe, audio_file, args):
+    """创建 语音识别 -> 翻译 流水线"""
+    from utils.audio_utils import transcribe_long_audio
+    from utils.translation_utils import make_translate_fn
+
+    segments = transcribe_long_audio(
+        asr_pipe,
+        audio_file,
+        window_s=args.window,
+        overlap_s=args.overlap,
+        batch_size=args.asr_batch_size
+    )
+    translate_fn = make_translate_fn(translate_pipe, batch_size=args.translate_batch_size)
+
+    def translate_segments(batch):
+        # 空白分段不送入翻译模型
+        texts = [segment["text"].strip() for segment in batch]
+        translations = iter(translate_fn([text for text in texts if text]) if any(texts) else [])
+        for segment, text in zip(batch, texts):
+            segment["translation"] = next(translations) if text else ""
+        return batch
+
+    return PipelineChain(
+        segments,
+        [ChainStage("translation", translate_segments, batch_size=args.translate_batch_size)],
+        queue_size=args.queue_size
+    )
+
+def translate_audio(asr_pipe, translate_pipe, audio_file, args):
+    """识别并翻译单个音频文件，边处理边输出"""
+    from utils.audio_utils import format_timestamp
+
+    if not os.path.exists(audio_file):
+        print(f"错误：文件 '{audio_file}' 不存在")
+        return
+
+    chain = build_chain(asr_pipe, translate_pipe, audio_file, args)
+    for segment in chain:
+        print(f"[{format_timestamp(segment['start'])} -> {format_timestamp(segment['end'])}] {segment['text']}")
+        print(f"{'':>24}{segment['translation']}")
+    chain.print_stats()
+
+def main():
+    """主函数"""
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description="基于Transformers的流式语音翻译")
+    parser.add_argument("--audio", required=True, help="音频文件路径")
+    parser.add_argument("--lang_pair", choices=TRANSLATION_MODELS.keys(), default="zh-en",
+                        help="语言对 (默认: zh-en)")
+    parser.add_argument("--asr_model", default=DEFAULT_ASR_MODEL, help=f"语音识别模型 (默认: {DEFAULT_ASR_MODEL})")
+    parser.add_argument("--translation_model", help="翻译模型，默认按语言对选择")
+    parser.add_argument("--window", type=float, default=30.0, help="分窗长度，单位秒 (默认: 30)")
+    parser.add_argument("--overlap", type=float, default=5.0, help="相邻窗口重叠长度，单位秒 (默认: 5)")
+    parser.add_argument("--asr_batch_size", type=int, default=1,
+                        help="每批识别的窗口数，越小首段输出越快 (默认: 1)")
+    parser.add_argument("--translate_batch_size", type=int, default=8, help="每批翻译的最大分段数 (默认: 8)")
+    parser.add_argument("--queue_size", type=int, default=8, help="识别与翻译之间队列的最大长度 (默认: 8)")
+    parser.add_argument("--quantize", action="store_true", help="使用动态int8量化在CPU上运行模型")
+    args = parser.parse_args()
+
+    # 获取设备
+    device = get_device()
+    print(f"使用设备: {device}")
+
+    translation_model = args.translation_model or TRANSLATION_MODELS[args.lang_pair]
+    print(f"加载语音识别模型: {args.asr_model}")
+    asr_pipe = create_pipeline(
+        task="automatic-speech-recognition",
+        model_name=args.asr_model,
+        quantize=args.quantize
+    )
+    print(f"加载翻译模型: {translation_model}")
+    translate_pipe = create_pipeline(
+        task="translation",
+        model_name=translation_model,
+        quantize=args.quantize
+    )
+
+    translate_audio(asr_pipe, translate_pipe, args.audio, args)
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,112 @@ from utils import get_device, create_pipeline
 # 默认文本生成模型
 DEFAULT_MODEL = "gpt2"
 
-def interactive_generation(pipe):
+def print_stream(pipe, prompt, max_length, temperature, prefix_cache=None):
+    """流式生成并逐token输出，Ctrl+C 可中途取消"""
+    from utils.generation_utils import stream_generate
+    
+    stream = stream_generate(pipe, prompt, max_length=max_length, temperature=temperature,
+                             prefix_cache=prefix_cache)
+    print("-" * 80)
+    print(prompt, end="", flush=True)
+    try:
+        for piece in stream:
+            print(piece, end="", flush=True)
+    except KeyboardInterrupt:
+        stream.cancel()
+        print("\n[已取消]", end="")
+    print()
+    print("-" * 80)
+    
+    metrics = stream.metrics
+    if metrics["ttft"] is not None:
+        print(f"首token延迟: {metrics['ttft'] * 1000:.1f} ms, "
+              f"生成 {metrics['tokens']} 个token, {metrics['tokens_per_second']:.1f} tokens/s")
+    if metrics["mean_token_latency"] is not None:
+        print(f"平均每token延迟: {metrics['mean_token_latency'] * 1000:.1f} ms")
+
+def print_speculative(pipe, draft_pipe, prompt, args):
+    """使用草稿模型投机解码，并输出接受率和生成速度"""
+    import time
+    import torch
+    from utils.generation_utils import speculative_generate
+    
+    tokenizer = pipe.tokenizer
+    input_ids = tokenizer(prompt, return_tensors="pt").input_ids
+    max_new_tokens = max(args.max_length - input_ids.shape[1], 1)
+    do_sample = not args.greedy
+    
+    output_ids, stats = speculative_generate(
+        pipe.model,
+        draft_pipe.model,
+        input_ids,
+        max_new_tokens=max_new_tokens,
+        num_draft_tokens=args.num_draft_tokens,
+        do_sample=do_sample,
+        temperature=args.temperature,
+        top_k=args.top_k,
+        top_p=args.top_p,
+        eos_token_id=tokenizer.eos_token_id
+    )
+    print("-" * 80)
+    print(tokenizer.decode(output_ids[0], skip_special_tokens=True))
+    print("-" * 80)
+    print(f"草稿token接受率: {stats['acceptance_rate']:.1%} ({stats['accepted']}/{stats['drafted']}), "
+          f"目标模型前向次数: {stats['target_calls']}")
+    print(f"生成 {stats['new_tokens']} 个token, {stats['tokens_per_second']:.1f} tokens/s")
+    
+    if args.compare:
+        # 只用目标模型逐token生成，作为速度对照 (采样参数与投机解码相同)
+        generate_kwargs = {"do_sample": do_sample, "pad_token_id": tokenizer.eos_token_id}
+        if do_sample:
+            generate_kwargs["temperature"] = args.temperature
+            if args.top_k is not None:
+                generate_kwargs["top_k"] = args.top_k
+            if args.top_p is not None:
+                generate_kwargs["top_p"] = args.top_p
+        start = time.perf_counter()
+        with torch.no_grad():
+            baseline = pipe.model.generate(
+                input_ids.to(pipe.model.device),
+                max_new_tokens=max_new_tokens,
+                **generate_kwargs
+            )
+        seconds = time.perf_counter() - start
+        baseline_tokens = baseline.shape[1] - input_ids.shape[1]
+        baseline_speed = baseline_tokens / seconds if seconds else 0.0
+        print(f"普通解码: {baseline_tokens} 个token, {baseline_speed:.1f} tokens/s, "
+              f"加速比: {stats['tokens_per_second'] / baseline_speed:.2f}x")
+        if not do_sample:
+            same = torch.equal(baseline[0].cpu(), output_ids[0].cpu())
+            print(f"与普通贪心解码输出一致: {'是' if same else '否'}")
+
+def generate_texts(pipe, prompt, max_length, temperature, num_return, prefix_cache=None):
+    """生成文本，提供前缀缓存时复用已缓存前缀的KV缓存"""
+    if prefix_cache is None:
+        result = pipe(
+            prompt, 
+            max_length=max_length,
+            temperature=temperature,
+            num_return_sequences=num_return,
+            do_sample=True
+        )
+        return [res['generated_text'] for res in result]
+    
+    from utils.prefix_cache import generate_with_prefix_cache
+    texts, stats = generate_with_prefix_cache(
+        pipe,
+        prompt,
+        prefix_cache,
+        num_return_sequences=num_return,
+        max_length=max_length,
+        temperature=temperature,
+        do_sample=True
+    )
+    print(f"复用缓存token: {stats['cached_tokens']}, 计算token: {stats['computed_tokens']}, "
+          f"耗时: {stats['seconds']:.2f}s")
+    return texts
+
+def interactive_generation(pipe, stream=False, prefix="", prefix_cache=None):
     """交互式文本生成"""
     print("\n欢迎使用文本生成系统！")
     print("输入'退出'或'exit'结束使用\n")
@@ -28,6 +133,7 @@ def interactive_generation(pipe):
         prompt = input("请输入提示文本: ").strip()
         if prompt.lower() in ["退出", "exit"]:
             break
+        prompt = prefix + prompt
         
         # 获取生成参数
         try:
@@ -40,21 +146,21 @@ def interactive_generation(pipe):
             temperature = 0.7
             num_return = 1
             
+        # 流式模式下逐token输出
+        if stream:
+            print()
+            print_stream(pipe, prompt, max_length, temperature, prefix_cache)
+            continue
+            
         # 执行文本生成
         print("\n生成中...\n")
-        result = pipe(
-            prompt, 
-            max_length=max_length,
-            temperature=temperature,
-            num_return_sequences=num_return,
-            do_sample=True
-        )
+        texts = generate_texts(pipe, prompt, max_length, temperature, num_return, prefix_cache)
         
         # 显示结果
         print("-" * 80)
-        for i, res in enumerate(result):
+        for i, text in enumerate(texts):
             print(f"生成结果 {i+1}:")
-            print(res['generated_text'])
+            print(text)
             print("-" * 80)
 
 def main():
@@ -66,8 +172,25 @@ def main():
     parser.add_argument("--max_length", type=int, default=50, help="最大生成长度")
     parser.add_argument("--temperature", type=float, default=0.7, help="温度参数(0.1-1.0)")
     parser.add_argument("--num_return", type=int, default=1, help="生成结果数量")
+    parser.add_argument("--stream", action="store_true", help="流式输出生成的token (只生成一个结果)")
+    parser.add_argument("--quantize", action="store_true", help="使用动态int8量化在CPU上运行模型")
+    parser.add_argument("--prefix_file", help="共享前缀文件 (如指令、少样本示例)，其内容加在每个提示之前")
+    parser.add_argument("--prefix_cache", action="store_true", help="缓存提示前缀的KV缓存，相同前缀只计算一次")
+    parser.add_argument("--prefix_cache_mb", type=float, default=512, help="前缀缓存的内存上限，单位MB (默认: 512)")
+    parser.add_argument("--draft_model", help="投机解码使用的草稿模型 (如 distilgpt2)，须与生成模型使用相同的tokenizer")
+    parser.add_argument("--num_draft_tokens", type=int, default=4, help="草稿模型每轮提出的token数 (默认: 4)")
+    parser.add_argument("--greedy", action="store_true", help="投机解码使用贪心解码而不是采样")
+    parser.add_argument("--top_k", type=int, help="投机解码采样时的 top_k (默认: 模型 generation_config 中的值)")
+    parser.add_argument("--top_p", type=float, help="投机解码采样时的 top_p (默认: 模型 generation_config 中的值)")
+    parser.add_argument("--compare", action="store_true", help="投机解码后再用普通解码生成一次，对比速度")
     args = parser.parse_args()
     
+    if args.draft_model:
+        if not args.prompt:
+            parser.error("投机解码 (--draft_model) 需要通过 --prompt 提供提示文本")
+        if args.stream or args.prefix_cache:
+            parser.error("投机解码 (--draft_model) 不支持 --stream 和 --prefix_cache")
+    
     # 获取设备
     device = get_device()
     print(f"使用设备: {device}")
@@ -76,28 +199,48 @@ def main():
     print(f"加载文本生成模型: {args.model}")
     pipe = create_pipeline(
         task="text-generation",
-        model_name=args.model
+        model_name=args.model,
+        quantize=args.quantize
     )
     
+    # 共享前缀
+    prefix = ""
+    if args.prefix_file:
+        with open(args.prefix_file, "r", encoding="utf-8") as f:
+            prefix = f.read()
+    prompt = prefix + args.prompt if args.prompt else None
+    
+    prefix_cache = None
+    if args.prefix_cache:
+        from utils.prefix_cache import PrefixKVCache
+        prefix_cache = PrefixKVCache(pipe.model, max_mb=args.prefix_cache_mb)
+    
     # 如果命令行提供了提示文本，直接生成
-    if args.prompt:
-        result = pipe(
-            args.prompt, 
-            max_length=args.max_length,
-            temperature=args.temperature,
-            num_return_sequences=args.num_return,
-            do_sample=True
+    if prompt and args.draft_model:
+        print(f"加载草稿模型: {args.draft_model}")
+        draft_pipe = create_pipeline(
+            task="text-generation",
+            model_name=args.draft_model,
+            quantize=args.quantize
         )
+        print_speculative(pipe, draft_pipe, prompt, args)
+    elif prompt and args.stream:
+        print_stream(pipe, prompt, args.max_length, args.temperature, prefix_cache)
+    elif prompt:
+        texts = generate_texts(pipe, prompt, args.max_length, args.temperature, args.num_return, prefix_cache)
         
         print("\n生成结果:")
         print("-" * 80)
-        for i, res in enumerate(result):
+        for i, text in enumerate(texts):
             print(f"生成结果 {i+1}:")
-            print(res['generated_text'])
+            print(text)
             print("-" * 80)
     else:
         # 否则进入交互模式
-        interactive_generation(pipe)
+        interactive_generation(pipe, stream=args.stream, prefix=prefix, prefix_cache=prefix_cache)
+    
+    if prefix_cache is not None:
+        prefix_cache.print_stats()
     
     print("\n感谢使用文本生成系统！")
 
@@ -14,6 +14,7 @@ import argparse
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 from utils import get_device, create_pipeline
+from utils.translation_utils import translate_document, make_translate_fn
 
 # 默认翻译模型
 TRANSLATION_MODELS = {
@@ -43,7 +44,37 @@ def select_language_pair():
             pass
         print("无效选择，请重新输入")
 
-def interactive_translation(pipe, lang_pair):
+def translate_texts(pipe, texts, cache=None, model_id=None):
+    """翻译文本列表，提供缓存时只有未命中的文本送入模型"""
+    if cache is not None:
+        return cache.translate(pipe, texts, model=model_id)
+    return [result["translation_text"] for result in pipe(texts)]
+
+def translate_file(translate_fn, lang_pair, args):
+    """流式翻译文本文件，按段落边翻译边写出"""
+    if not os.path.exists(args.file):
+        print(f"错误：文件 '{args.file}' 不存在")
+        return
+    
+    source_lang, target_lang = lang_pair.split("-")
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        with open(args.file, "r", encoding="utf-8") as f:
+            for block in translate_document(
+                f,
+                translate_fn,
+                source_lang,
+                target_lang,
+                window_segments=args.window_segments
+            ):
+                out.write(block)
+                out.flush()
+    finally:
+        if args.output:
+            out.close()
+            print(f"译文已保存: {args.output}")
+
+def interactive_translation(pipe, lang_pair, cache=None, model_id=None):
     """交互式翻译"""
     source_lang, target_lang = lang_pair.split("-")
     print(f"\n欢迎使用翻译系统！({source_lang} → {target_lang})")
@@ -56,10 +87,9 @@ def interactive_translation(pipe, lang_pair):
             break
             
         # 执行翻译
-        result = pipe(text)
+        translated_text = translate_texts(pipe, [text], cache, model_id)[0]
         
         # 显示结果
-        translated_text = result[0]["translation_text"]
         print(f"{target_lang} > {translated_text}\n")
 
 def main():
@@ -68,7 +98,16 @@ def main():
     parser = argparse.ArgumentParser(description="基于Transformers的翻译系统")
     parser.add_argument("--lang_pair", choices=TRANSLATION_MODELS.keys(), help="语言对 (例如: en-zh)")
     parser.add_argument("--text", help="要翻译的文本")
+    parser.add_argument("--file", help="要翻译的文本文件，按句子分批翻译并保留段落格式")
+    parser.add_argument("--output", help="译文保存路径 (默认输出到标准输出)")
+    parser.add_argument("--batch_size", type=int, default=16, help="每批翻译的句子数 (默认: 16)")
+    parser.add_argument("--window_segments", type=int, default=256, help="每次读入并排序的句子数 (默认: 256)")
     parser.add_argument("--model", help="指定翻译模型路径或名称")
+    parser.add_argument("--quantize", action="store_true", help="使用动态int8量化在CPU上运行模型")
+    parser.add_argument("--compile", action="store_true", help="使用编译后端 (torch.compile，输入按长度分桶补齐)")
+    parser.add_argument("--cache", action="store_true", help="使用持久化翻译缓存，重复的句子不再重新翻译")
+    parser.add_argument("--cache_path", help="翻译缓存数据库路径")
+    parser.add_argument("--cache_max_mb", type=float, help="翻译缓存大小上限，单位MB (默认: 256)")
     args = parser.parse_args()
     
     # 获取设备
@@ -96,20 +135,42 @@ def main():
     print(f"加载翻译模型: {model_name}")
     pipe = create_pipeline(
         task="translation",
-        model_name=model_name
+        model_name=model_name,
+        quantize=args.quantize,
+        compile_model=args.compile
     )
     
-    # 如果命令行提供了文本，直接翻译
-    if args.text:
-        result = pipe(args.text)
-        translated_text = result[0]["translation_text"]
-        
+    # 翻译缓存
+    cache = None
+    model_id = f"{model_name}|int8" if args.quantize else model_name
+    if args.cache:
+        from utils.translation_cache import TranslationCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_MB
+        cache = TranslationCache(
+            path=args.cache_path or DEFAULT_CACHE_PATH,
+            max_mb=args.cache_max_mb or DEFAULT_MAX_MB
+        )
+    
+    translate_fn = make_translate_fn(pipe, batch_size=args.batch_size, cache=cache, model_id=model_id)
+    
+    if args.file:
+        # 文档模式
+        translate_file(translate_fn, lang_pair, args)
+    elif args.text:
+        # 如果命令行提供了文本，按句子切分后翻译，避免长文本被截断
         source_lang, target_lang = lang_pair.split("-")
+        translated_text = "".join(
+            translate_document(args.text.splitlines(True), translate_fn, source_lang, target_lang)
+        ).rstrip("\n")
+        
         print(f"\n{source_lang} > {args.text}")
         print(f"{target_lang} > {translated_text}")
     else:
         # 否则进入交互模式
-        interactive_translation(pipe, lang_pair)
+        interactive_translation(pipe, lang_pair, cache, model_id)
+    
+    if cache is not None:
+        cache.print_stats()
+        cache.close()
     
     print("\n感谢使用翻译系统！")
 
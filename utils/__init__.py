@@ -1,10 +1,28 @@
-from .device_utils import get_device, print_device_info
-from .model_utils import download_model, create_pipeline, list_local_models
-
-__all__ = [
-    'get_device',
-    'print_device_info',
-    'download_model',
-    'create_pipeline',
-    'list_local_models'
-] 
\ No newline at end of file
+import importlib
+
+# 公开函数所在的子模块。子模块在第一次访问时才导入，
+# 这样 list_local_models、参数解析等操作不会加载 torch 和 transformers
+_EXPORTS = {
+    'get_device': 'device_utils',
+    'print_device_info': 'device_utils',
+    'download_model': 'model_utils',
+    'create_pipeline': 'model_utils',
+    'list_local_models': 'model_utils',
+    'get_model_catalog': 'model_catalog',
+    'get_pipeline_cache': 'pipeline_cache',
+    'print_cache_stats': 'pipeline_cache',
+    'get_pipeline_metrics': 'instrumentation'
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
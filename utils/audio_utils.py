@@ -0,0 +1,314 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from .chain_utils import ChainStage, PipelineChain
+
+# whisper 模型要求的采样率
+TARGET_SAMPLING_RATE = 16000
+
+# 目录模式下识别的音频文件扩展名
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".m4a", ".opus")
+
+
+def get_audio_duration(audio_path):
+    """
+    读取音频文件头获取时长，不解码音频数据
+
+    Args:
+        audio_path (str): 音频文件路径
+
+    Returns:
+        float: 音频时长 (秒)
+    """
+    info = sf.info(audio_path)
+    return info.frames / info.samplerate
+
+
+def resample_audio(audio, orig_sr, target_sr=TARGET_SAMPLING_RATE):
+    """
+    将单声道音频重采样到目标采样率 (线性插值)
+
+    Args:
+        audio (np.ndarray): 单声道音频数据
+        orig_sr (int): 原始采样率
+        target_sr (int): 目标采样率
+
+    Returns:
+        np.ndarray: 重采样后的 float32 音频数据
+    """
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio.astype(np.float32, copy=False)
+    target_len = int(round(len(audio) * target_sr / orig_sr))
+    src_positions = np.arange(target_len) * (orig_sr / target_sr)
+    return np.interp(src_positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def load_audio(audio_path, target_sr=TARGET_SAMPLING_RATE):
+    """
+    读取整个音频文件并转为目标采样率的单声道数据
+
+    Args:
+        audio_path (str): 音频文件路径
+        target_sr (int): 输出音频的采样率
+
+    Returns:
+        np.ndarray: 单声道 float32 音频数据
+    """
+    try:
+        audio, orig_sr = sf.read(audio_path, dtype="float32", always_2d=True)
+    except RuntimeError:
+        # soundfile 不支持的格式 (如 m4a) 交给 ffmpeg 解码
+        from transformers.pipelines.audio_utils import ffmpeg_read
+        with open(audio_path, "rb") as f:
+            return ffmpeg_read(f.read(), target_sr)
+    return resample_audio(audio.mean(axis=1), orig_sr, target_sr)
+
+
+def iter_audio_windows(audio_path, window_s=30.0, overlap_s=5.0, target_sr=TARGET_SAMPLING_RATE):
+    """
+    以固定长度、相互重叠的窗口惰性读取音频文件
+
+    使用 soundfile 分块读取，任意时刻内存中只保留一个窗口的数据。
+
+    Args:
+        audio_path (str): 音频文件路径
+        window_s (float): 窗口长度 (秒)
+        overlap_s (float): 相邻窗口的重叠长度 (秒)
+        target_sr (int): 输出音频的采样率
+
+    Yields:
+        dict: {"start": 窗口起始时间, "samples": 单声道音频, "is_last": 是否为最后一个窗口}
+    """
+    if overlap_s >= window_s:
+        raise ValueError("重叠长度必须小于窗口长度")
+
+    info = sf.info(audio_path)
+    orig_sr = info.samplerate
+    window_frames = int(window_s * orig_sr)
+    overlap_frames = int(overlap_s * orig_sr)
+    step_s = (window_frames - overlap_frames) / orig_sr
+
+    blocks = sf.blocks(audio_path, blocksize=window_frames, overlap=overlap_frames,
+                       dtype="float32", always_2d=True)
+
+    pending = None
+    index = 0
+    for block in blocks:
+        samples = resample_audio(block.mean(axis=1), orig_sr, target_sr)
+        if pending is not None:
+            yield pending
+        pending = {"start": index * step_s, "samples": samples, "is_last": False}
+        index += 1
+        # 最后一块不足一个窗口时不会再有后续窗口
+        if len(block) < window_frames:
+            break
+
+    if pending is not None:
+        pending["is_last"] = True
+        yield pending
+
+
+def _stitch_chunks(window, chunks, window_s, overlap_s):
+    """
+    把窗口内的相对时间戳换算为全局时间，并只保留属于本窗口的分段
+
+    重叠区域以中点为界，前半段归前一个窗口，后半段归后一个窗口。
+    """
+    start = window["start"]
+    duration = len(window["samples"]) / TARGET_SAMPLING_RATE
+    lower = start + overlap_s / 2 if start > 0 else start
+    upper = float("inf") if window["is_last"] else start + window_s - overlap_s / 2
+
+    segments = []
+    for chunk in chunks:
+        chunk_start, chunk_end = chunk["timestamp"]
+        chunk_start = chunk_start or 0.0
+        # 最后一个分段可能没有结束时间
+        chunk_end = chunk_end if chunk_end is not None else duration
+        seg_start = start + chunk_start
+        seg_end = start + min(chunk_end, duration)
+        middle = (seg_start + seg_end) / 2
+        text = chunk["text"].strip()
+        if text and lower <= middle < upper:
+            segments.append({"start": seg_start, "end": seg_end, "text": text})
+    return segments
+
+
+def transcribe_long_audio(pipe, audio_path, window_s=30.0, overlap_s=5.0, batch_size=8):
+    """
+    长音频分窗批量识别
+
+    将音频切成重叠的窗口，按批次送入whisper模型，并在重叠处拼接文本。
+    每完成一个批次就输出对应的带时间戳分段。
+
+    Args:
+        pipe: automatic-speech-recognition pipeline实例
+        audio_path (str): 音频文件路径
+        window_s (float): 窗口长度 (秒)，whisper 最长为30秒
+        overlap_s (float): 相邻窗口的重叠长度 (秒)
+        batch_size (int): 每批送入模型的窗口数
+
+    Yields:
+        dict: {"start": 开始时间, "end": 结束时间, "text": 文本}
+    """
+    def run(windows):
+        inputs = [{"raw": w["samples"], "sampling_rate": TARGET_SAMPLING_RATE} for w in windows]
+        results = pipe(inputs, batch_size=batch_size, return_timestamps=True)
+        for window, result in zip(windows, results):
+            for segment in _stitch_chunks(window, result.get("chunks", []), window_s, overlap_s):
+                yield segment
+
+    batch = []
+    for window in iter_audio_windows(audio_path, window_s, overlap_s):
+        batch.append(window)
+        if len(batch) >= batch_size:
+            yield from run(batch)
+            batch = []
+    if batch:
+        yield from run(batch)
+
+
+def list_audio_files(input_dir):
+    """递归列出目录下的音频文件，按路径排序"""
+    paths = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def read_manifest(manifest_path):
+    """
+    读取音频清单
+
+    每行一个音频路径，或一个包含 "audio" 字段的JSON对象。相对路径相对于清单所在目录。
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    paths = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            path = json.loads(line)["audio"] if line.startswith("{") else line
+            paths.append(os.path.join(base_dir, path))
+    return paths
+
+
+def _safe_duration(audio_path):
+    """读取音频时长，soundfile 无法读取文件头时返回0"""
+    try:
+        return get_audio_duration(audio_path)
+    except (RuntimeError, OSError):
+        return 0.0
+
+
+def transcribe_files(pipe, paths, batch_size=8, decode_workers=4, prefetch_batches=4, use_processes=False,
+                     group_window=None, chunk_length_s=30.0, stats=None):
+    """
+    批量识别大量音频文件
+
+    解码和重采样在线程池 (或进程池) 中进行，解码结果经有界队列预取给推理线程，
+    模型不需要等待文件读取和 ffmpeg。文件按清单顺序每 group_window 个读取时长，
+    窗口内按时长排序后分批，同一批的音频长度相近。结果按清单顺序输出。
+    无法解码的文件不影响其他文件，其结果的 text 为None，error 为错误信息。
+
+    Args:
+        pipe: automatic-speech-recognition pipeline实例
+        paths (list): 音频文件路径列表 (清单顺序)
+        batch_size (int): 每批送入模型的文件数
+        decode_workers (int): 解码线程数 (或进程数)
+        prefetch_batches (int): 预取队列中最多缓存的批数
+        use_processes (bool): 使用进程池解码 (重采样受GIL限制时更快)
+        group_window (int, optional): 按时长分组的窗口大小，默认为 batch_size * 8
+        chunk_length_s (float): 超过该长度的音频分块识别
+        stats (dict, optional): 传入时写入统计信息: 文件数、音频总时长、解码失败的文件、
+            推理线程等待解码的时间、推理忙碌时间和总耗时
+
+    Yields:
+        dict: {"index": 清单中的序号, "audio": 路径, "duration": 时长, "text": 文本, "error": 错误信息或None}
+    """
+    group_window = group_window or batch_size * 8
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    executor = pool_cls(max_workers=decode_workers)
+    stats = stats if stats is not None else {}
+    stats.update({"files": 0, "audio_seconds": 0.0, "decode_wait_seconds": 0.0, "failed": []})
+
+    def batches():
+        """按时长分组并提交解码任务，队列满时暂停提交"""
+        for window_start in range(0, len(paths), group_window):
+            window = [
+                (i, paths[i], _safe_duration(paths[i]))
+                for i in range(window_start, min(window_start + group_window, len(paths)))
+            ]
+            window.sort(key=lambda item: item[2])
+            for start in range(0, len(window), batch_size):
+                items = window[start:start + batch_size]
+                futures = [executor.submit(load_audio, path) for _, path, _ in items]
+                yield {"items": items, "futures": futures}
+
+    def recognize(groups):
+        results = []
+        for group in groups:
+            start = time.perf_counter()
+            decoded, failed = [], []
+            for (i, path, _), future in zip(group["items"], group["futures"]):
+                try:
+                    audio = future.result()
+                    if len(audio) == 0:
+                        raise ValueError("音频为空")
+                    decoded.append((i, path, audio))
+                except Exception as e:
+                    failed.append({"index": i, "audio": path, "duration": 0.0, "text": None,
+                                   "error": f"{type(e).__name__}: {e}"})
+            stats["decode_wait_seconds"] += time.perf_counter() - start
+
+            batch_results = failed
+            if decoded:
+                inputs = [{"raw": audio, "sampling_rate": TARGET_SAMPLING_RATE} for _, _, audio in decoded]
+                kwargs = {}
+                if any(len(audio) > chunk_length_s * TARGET_SAMPLING_RATE for _, _, audio in decoded):
+                    kwargs["chunk_length_s"] = chunk_length_s
+                outputs = pipe(inputs, batch_size=batch_size, **kwargs)
+                batch_results += [
+                    {"index": i, "audio": path, "duration": len(audio) / TARGET_SAMPLING_RATE,
+                     "text": output["text"].strip(), "error": None}
+                    for (i, path, audio), output in zip(decoded, outputs)
+                ]
+            results.append(batch_results)
+        return results
+
+    chain = PipelineChain(batches(), [ChainStage("asr", recognize)], queue_size=prefetch_batches)
+
+    # 批次按时长乱序完成，缓存后按清单顺序输出
+    pending = {}
+    next_index = 0
+    try:
+        for group in chain:
+            for result in group:
+                pending[result["index"]] = result
+            while next_index in pending:
+                result = pending.pop(next_index)
+                stats["files"] += 1
+                stats["audio_seconds"] += result["duration"]
+                if result["error"]:
+                    stats["failed"].append(result["audio"])
+                yield result
+                next_index += 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        stats["asr_busy_seconds"] = chain.stats["asr"]["busy_seconds"]
+        stats["wall_seconds"] = chain.stats["wall_seconds"]
+
+
+def format_timestamp(seconds):
+    """把秒数格式化为 HH:MM:SS.ss"""
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:05.2f}"
@@ -0,0 +1,213 @@
+import json
+import os
+import time
+
+
+def _qa_input(record):
+    return {"question": record["question"], "context": record["context"]}
+
+
+def _qa_length(record):
+    return len(record["question"]) + len(record["context"])
+
+
+def _audio_length(record):
+    # 音频以文件大小近似时长
+    try:
+        return os.path.getsize(record["audio"])
+    except OSError:
+        return 0
+
+
+# 各任务的输入字段映射: (构造pipeline输入, 估算输入长度)
+TASK_ADAPTERS = {
+    "question-answering": (_qa_input, _qa_length),
+    "translation": (lambda r: r["text"], lambda r: len(r["text"])),
+    "text-generation": (lambda r: r["prompt"], lambda r: len(r["prompt"])),
+    "automatic-speech-recognition": (lambda r: r["audio"], _audio_length),
+}
+
+
+def iter_jsonl_windows(input_path, window_size, start_offset=0, start_line=0):
+    """
+    从JSONL文件中按窗口惰性读取记录
+
+    Args:
+        input_path (str): 输入JSONL文件路径
+        window_size (int): 每个窗口的最大记录数
+        start_offset (int): 开始读取的字节偏移 (用于断点续跑)
+        start_line (int): start_offset 对应的行号
+
+    Yields:
+        tuple: (records, end_offset, lines_read)，records 为 [(行号, 记录)] 列表，
+            end_offset 为窗口结束处的字节偏移，lines_read 为已读取的总行数
+    """
+    with open(input_path, "rb") as f:
+        f.seek(start_offset)
+        line_no = start_line
+        window = []
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            line_no += 1
+            line = line.strip()
+            if not line:
+                continue
+            window.append((line_no - 1, json.loads(line.decode("utf-8"))))
+            if len(window) >= window_size:
+                yield window, f.tell(), line_no
+                window = []
+        if window:
+            yield window, f.tell(), line_no
+
+
+def sort_by_length(records, length_fn):
+    """
+    按输入长度排序，使相邻的记录长度相近，分批后可以减少填充
+
+    Args:
+        records (list): [(行号, 记录)] 列表
+        length_fn (callable): 估算记录长度的函数
+
+    Returns:
+        list: 排序后的 [(行号, 记录)]
+    """
+    return sorted(records, key=lambda item: length_fn(item[1]))
+
+
+def iter_batches(items, batch_size):
+    """把列表按顺序切分为批次"""
+    for i in range(0, len(items), batch_size):
+        yield items[i:i + batch_size]
+
+
+def run_pipeline_batch(pipe, inputs, batch_size, **kwargs):
+    """
+    以批处理方式调用pipeline，并保证输出与输入一一对应
+
+    Args:
+        pipe: transformers pipeline实例
+        inputs (list): pipeline输入列表
+        batch_size (int): 传给pipeline的批次大小
+        **kwargs: 传给pipeline的其他参数
+
+    Returns:
+        list: 与inputs等长的结果列表
+    """
+    results = pipe(inputs, batch_size=batch_size, **kwargs)
+    # 部分pipeline在只有一个输入时直接返回单个结果
+    if len(inputs) == 1 and (not isinstance(results, list) or len(results) != 1):
+        results = [results]
+    return list(results)
+
+
+def load_checkpoint(checkpoint_path):
+    """读取断点信息，不存在时返回None"""
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint_path, state):
+    """原子地写入断点信息"""
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+
+def run_batch(pipe, task, input_path, output_path, batch_size=8, window_size=None,
+              resume=True, process_fn=None, **kwargs):
+    """
+    以流式方式对JSONL输入批量执行pipeline，并将结果逐步写入JSONL输出
+
+    输入按窗口读取，窗口内按长度排序后连续分批推理，输出按输入顺序写入。
+    每个窗口完成后记录断点，任务中断后再次运行会从上次完成的窗口继续。
+    内存占用只与窗口大小有关，与输入文件大小无关。
+
+    Args:
+        pipe: transformers pipeline实例
+        task (str): 任务类型，需在 TASK_ADAPTERS 中
+        input_path (str): 输入JSONL文件路径
+        output_path (str): 输出JSONL文件路径
+        batch_size (int): 每批推理的记录数
+        window_size (int, optional): 每个窗口读取的记录数，默认为 batch_size * 32
+        resume (bool): 是否从断点继续 (默认: True)
+        process_fn (callable, optional): 替代 run_pipeline_batch 的批处理函数，
+            签名为 process_fn(inputs, batch_size, **kwargs)，inputs 为整个窗口按长度排序后的输入
+        **kwargs: 传给pipeline的其他参数，如 max_length
+
+    Returns:
+        dict: 本次运行的统计信息
+    """
+    if task not in TASK_ADAPTERS:
+        raise ValueError(f"不支持的批处理任务: {task}")
+    to_input, length_fn = TASK_ADAPTERS[task]
+    window_size = window_size or batch_size * 32
+    checkpoint_path = output_path + ".ckpt.json"
+
+    if process_fn is None:
+        def process_fn(inputs, batch_size, **kwargs):
+            return run_pipeline_batch(pipe, inputs, batch_size, **kwargs)
+
+    state = load_checkpoint(checkpoint_path) if resume else None
+    if state and state.get("input_path") != os.path.abspath(input_path):
+        print("断点对应的输入文件不同，重新开始")
+        state = None
+
+    if state:
+        print(f"从断点继续: 已完成 {state['lines_done']} 行")
+        # 丢弃上次中断时未完成窗口写入的部分输出
+        with open(output_path, "ab") as out:
+            out.truncate(state["output_size"])
+    else:
+        state = {
+            "input_path": os.path.abspath(input_path),
+            "input_offset": 0,
+            "lines_done": 0,
+            "records_done": 0,
+            "output_size": 0,
+        }
+        open(output_path, "wb").close()
+
+    processed = 0
+    start = time.perf_counter()
+
+    with open(output_path, "ab") as out:
+        for window, end_offset, lines_done in iter_jsonl_windows(
+                input_path, window_size, state["input_offset"], state["lines_done"]):
+            # 按长度排序后连续切分批次，同一批次内长度相近
+            ordered = sort_by_length(window, length_fn)
+            outputs = process_fn([to_input(record) for _, record in ordered], batch_size, **kwargs)
+            results = {line_no: output for (line_no, _), output in zip(ordered, outputs)}
+
+            # 按输入顺序写出本窗口的结果
+            for line_no, record in window:
+                row = {"line": line_no, "id": record.get("id"), "result": results[line_no]}
+                out.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+
+            processed += len(window)
+            state.update(
+                input_offset=end_offset,
+                lines_done=lines_done,
+                records_done=state["records_done"] + len(window),
+                output_size=out.tell(),
+            )
+            save_checkpoint(checkpoint_path, state)
+
+            elapsed = time.perf_counter() - start
+            print(f"已处理 {state['records_done']} 条 ({processed / elapsed:.1f} 条/秒)")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "processed": processed,
+        "total_done": state["records_done"],
+        "seconds": elapsed,
+        "records_per_second": processed / elapsed if elapsed else 0.0,
+    }
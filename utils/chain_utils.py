@@ -0,0 +1,169 @@
+import queue
+import threading
+import time
+
+# 队列中表示上游结束的标记
+_END = object()
+
+
+class _StageError:
+    """在队列中向下游传递的异常"""
+
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+
+class ChainStage:
+    """
+    流水线中的一个处理阶段
+
+    Args:
+        name (str): 阶段名称，用于统计
+        fn (callable): 接收条目列表、返回等长结果列表的函数
+        batch_size (int): 单次调用的最大条目数。队列中已有的条目会被合并处理，
+            但不会为了凑满批次而等待
+    """
+
+    def __init__(self, name, fn, batch_size=1):
+        self.name = name
+        self.fn = fn
+        self.batch_size = batch_size
+
+
+class PipelineChain:
+    """
+    多模型流水线执行器
+
+    源迭代器和每个阶段各自运行在独立线程中，阶段之间用有界队列连接。
+    上游每产出一个条目就立即交给下游处理，各阶段并发运行，
+    总耗时接近最慢的阶段而不是各阶段之和。有界队列在下游较慢时对上游形成背压。
+    """
+
+    def __init__(self, source, stages, queue_size=8):
+        """
+        Args:
+            source (iterable): 产生输入条目的迭代器 (在独立线程中迭代)
+            stages (list): ChainStage 列表，按顺序执行
+            queue_size (int): 阶段之间队列的最大长度
+        """
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self._stop = threading.Event()
+        self._threads = []
+        self.stats = {"source": {"items": 0, "busy_seconds": 0.0}}
+        for stage in stages:
+            self.stats[stage.name] = {"items": 0, "calls": 0, "busy_seconds": 0.0}
+        self.stats["wall_seconds"] = 0.0
+
+    def _put(self, q, item):
+        """放入队列，停止时放弃等待"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_source(self, out_q):
+        stats = self.stats["source"]
+        iterator = iter(self.source)
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats["busy_seconds"] += time.perf_counter() - start
+                stats["items"] += 1
+                if not self._put(out_q, item):
+                    return
+        except Exception as e:
+            self._put(out_q, _StageError("source", e))
+            return
+        self._put(out_q, _END)
+
+    def _run_stage(self, stage, in_q, out_q):
+        stats = self.stats[stage.name]
+        finished = False
+        while not finished and not self._stop.is_set():
+            try:
+                item = in_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _END or isinstance(item, _StageError):
+                self._put(out_q, item)
+                return
+
+            # 合并队列中已经到达的条目，不等待凑批
+            batch = [item]
+            while len(batch) < stage.batch_size:
+                try:
+                    item = in_q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _END or isinstance(item, _StageError):
+                    finished = item
+                    break
+                batch.append(item)
+
+            start = time.perf_counter()
+            try:
+                results = stage.fn(batch)
+            except Exception as e:
+                self._put(out_q, _StageError(stage.name, e))
+                return
+            stats["busy_seconds"] += time.perf_counter() - start
+            stats["calls"] += 1
+            stats["items"] += len(batch)
+            for result in results:
+                if not self._put(out_q, result):
+                    return
+            if finished:
+                self._put(out_q, finished)
+                return
+
+    def __iter__(self):
+        """启动所有线程并按顺序产出最后一个阶段的结果"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        self._threads = [threading.Thread(target=self._run_source, args=(queues[0],), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            self._threads.append(threading.Thread(
+                target=self._run_stage, args=(stage, queues[i], queues[i + 1]), daemon=True
+            ))
+
+        start = time.perf_counter()
+        for thread in self._threads:
+            thread.start()
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    break
+                if isinstance(item, _StageError):
+                    raise RuntimeError(f"阶段 {item.stage} 出错: {item.error}") from item.error
+                yield item
+        finally:
+            self.stats["wall_seconds"] = time.perf_counter() - start
+            self.close()
+
+    def close(self):
+        """停止所有线程"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def print_stats(self):
+        """打印各阶段的忙碌时间和总耗时"""
+        wall = self.stats["wall_seconds"]
+        print("\n流水线统计:")
+        print("-" * 50)
+        busy_total = 0.0
+        for name in ["source"] + [stage.name for stage in self.stages]:
+            stats = self.stats[name]
+            busy_total += stats["busy_seconds"]
+            print(f"{name:<16} 条目: {stats['items']:<6} 忙碌时间: {stats['busy_seconds']:.2f}s")
+        print(f"总耗时: {wall:.2f}s  (各阶段顺序执行约需 {busy_total:.2f}s)")
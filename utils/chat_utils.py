@@ -0,0 +1,178 @@
+import os
+import time
+
+import torch
+from transformers import AutoConfig
+
+from .model_catalog import get_model_catalog
+from .model_utils import create_pipeline
+
+
+class ChatSession:
+    """
+    单个会话的状态
+
+    每轮对话只在加入时编码一次，之后以token形式保存；
+    对解码器模型还保存已计算的 past_key_values。
+    """
+
+    def __init__(self):
+        self.turns = []
+        self.past_key_values = None
+        self.latencies = []
+
+    def history_tokens(self):
+        """返回历史中的token总数"""
+        return sum(len(ids) for _, ids in self.turns)
+
+
+class ChatEngine:
+    """
+    增量式多轮对话引擎
+
+    - 编码器-解码器模型 (如 blenderbot)：复用每轮已编码的token，
+      编码器输入限制在 token 预算内，生成时使用 KV 缓存
+    - 解码器模型 (如 DialoGPT)：在轮次之间保留 past_key_values，
+      每轮只需要计算新加入的用户输入
+
+    历史超出 token 预算时从最早的轮次开始丢弃，每轮延迟不随对话长度增长。
+    丢弃时一次多丢弃 trim_chunk_tokens 个token，之后的若干轮历史都不会超出预算，
+    解码器模型的缓存只在这时重建一次，而不是窗口填满后每轮都重新计算。
+    编码器是双向注意力，新加入的token会改变所有位置的编码，编码器输入每轮都要重新计算，
+    其长度受 token 预算限制。
+    """
+
+    def __init__(self, model_name, max_history_tokens=None, max_new_tokens=60, trim_chunk_tokens=None,
+                 **generate_kwargs):
+        """
+        Args:
+            model_name (str): 会话模型名称或本地路径
+            max_history_tokens (int, optional): 保留的历史token数，默认由模型最大长度决定
+            max_new_tokens (int): 每轮回复的最大token数
+            trim_chunk_tokens (int, optional): 历史超出预算时额外丢弃的token数，默认为预算的1/4
+            **generate_kwargs: 传给 model.generate 的其他参数
+        """
+        # 本地已有完整快照时直接读取，不向 Hub 查询
+        config_source = model_name
+        if not os.path.isdir(model_name):
+            config_source = get_model_catalog().resolve(model_name) or model_name
+        config = AutoConfig.from_pretrained(config_source)
+        self.is_encoder_decoder = config.is_encoder_decoder
+
+        # 复用 create_pipeline 的设备选择与缓存
+        task = "text2text-generation" if self.is_encoder_decoder else "text-generation"
+        pipe = create_pipeline(task=task, model_name=model_name)
+        self.model = pipe.model
+        self.tokenizer = pipe.tokenizer
+        self.max_new_tokens = max_new_tokens
+        self.generate_kwargs = generate_kwargs
+
+        max_positions = getattr(config, "max_position_embeddings", None) or self.tokenizer.model_max_length
+        if max_history_tokens is None:
+            # 解码器模型的历史与回复共享位置编码
+            reserved = 0 if self.is_encoder_decoder else max_new_tokens
+            max_history_tokens = max_positions - reserved - 2
+        self.max_history_tokens = max_history_tokens
+        self.trim_chunk_tokens = trim_chunk_tokens if trim_chunk_tokens is not None else max_history_tokens // 4
+
+        if self.is_encoder_decoder:
+            # blenderbot 用两个空格分隔轮次
+            self.separator_ids = self.tokenizer.encode("  ", add_special_tokens=False)
+        else:
+            self.separator_ids = []
+
+    def new_session(self):
+        """创建新的会话"""
+        return ChatSession()
+
+    def _encode_turn(self, text, is_user):
+        """编码单轮文本"""
+        if self.is_encoder_decoder:
+            return self.tokenizer.encode(" " + text if is_user else text, add_special_tokens=False)
+        # DialoGPT 风格：每轮以 eos 结尾
+        return self.tokenizer.encode(text, add_special_tokens=False) + [self.tokenizer.eos_token_id]
+
+    def _trim_history(self, session):
+        """
+        历史超出 token 预算时丢弃最早的轮次，直到比预算少 trim_chunk_tokens 个token
+
+        Returns:
+            bool: 是否发生了丢弃
+        """
+        if session.history_tokens() <= self.max_history_tokens:
+            return False
+        target = max(self.max_history_tokens - self.trim_chunk_tokens, 0)
+        while len(session.turns) > 1 and session.history_tokens() > target:
+            session.turns.pop(0)
+        return True
+
+    def _history_ids(self, session):
+        ids = []
+        for i, (_, turn_ids) in enumerate(session.turns):
+            if i:
+                ids.extend(self.separator_ids)
+            ids.extend(turn_ids)
+        return ids
+
+    def _reply_seq2seq(self, session):
+        self._trim_history(session)
+        input_ids = self.tokenizer.build_inputs_with_special_tokens(self._history_ids(session))
+        input_ids = torch.tensor([input_ids], device=self.model.device)
+
+        with torch.no_grad():
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=self.max_new_tokens,
+                **self.generate_kwargs
+            )
+        reply = self.tokenizer.decode(output[0], skip_special_tokens=True).strip()
+        return reply, self._encode_turn(reply, is_user=False)
+
+    def _reply_causal(self, session):
+        if self._trim_history(session):
+            # 位置编码已经改变，缓存失效，重新计算整个窗口 (每丢弃一批历史才发生一次)
+            session.past_key_values = None
+
+        input_ids = torch.tensor([self._history_ids(session)], device=self.model.device)
+        with torch.no_grad():
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=session.past_key_values,
+                max_new_tokens=self.max_new_tokens,
+                pad_token_id=self.tokenizer.eos_token_id,
+                return_dict_in_generate=True,
+                **self.generate_kwargs
+            )
+        # 缓存覆盖了历史和本轮回复，下一轮只需计算新的用户输入
+        session.past_key_values = output.past_key_values
+
+        reply_ids = output.sequences[0, input_ids.shape[1]:].tolist()
+        if not reply_ids or reply_ids[-1] != self.tokenizer.eos_token_id:
+            reply_ids.append(self.tokenizer.eos_token_id)
+        reply = self.tokenizer.decode(reply_ids, skip_special_tokens=True).strip()
+        return reply, reply_ids
+
+    def chat(self, session, text):
+        """
+        在会话中加入一轮用户输入并生成回复
+
+        Args:
+            session (ChatSession): 会话状态
+            text (str): 用户输入
+
+        Returns:
+            str: 模型回复
+        """
+        start = time.perf_counter()
+        session.turns.append((True, self._encode_turn(text, is_user=True)))
+
+        if self.is_encoder_decoder:
+            reply, reply_ids = self._reply_seq2seq(session)
+        else:
+            reply, reply_ids = self._reply_causal(session)
+
+        session.turns.append((False, reply_ids))
+        session.latencies.append(time.perf_counter() - start)
+        return reply
@@ -0,0 +1,277 @@
+import os
+import threading
+import types
+
+import torch
+
+# 编译结果的磁盘缓存目录
+COMPILED_CACHE_DIR = os.path.expanduser(
+    os.environ.get("COMPILED_MODEL_CACHE", "~/.cache/transformers-pipeline-practice/compiled")
+)
+
+# 序列长度分桶，输入补齐到不小于自身长度的最小分桶，超过最大分桶时使用 eager 模式
+DEFAULT_BUCKETS = (32, 64, 128, 256, 512)
+
+# 编译结果与 eager 输出的最大允许误差
+PARITY_ATOL = 1e-4
+
+
+def bucket_length(length, buckets=DEFAULT_BUCKETS):
+    """返回不小于 length 的最小分桶，超过最大分桶时返回None"""
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return None
+
+
+def _pad_to(tensor, length, value):
+    """在序列维度 (第1维) 右侧补齐到 length"""
+    missing = length - tensor.shape[1]
+    if missing <= 0:
+        return tensor
+    pad = torch.full((tensor.shape[0], missing), value, dtype=tensor.dtype, device=tensor.device)
+    return torch.cat([tensor, pad], dim=1)
+
+
+def _setup_inductor():
+    """
+    配置 torch.compile: 编译结果缓存到磁盘
+
+    inductor 的 FX 图缓存保存在 COMPILED_CACHE_DIR 下，之后的运行遇到相同的图直接复用。
+    编译失败不在全局屏蔽 (不修改 suppress_errors)，由各形状第一次运行时捕获并退回 eager 模式。
+    """
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(COMPILED_CACHE_DIR, "inductor"))
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    import torch._dynamo
+    # 每种 (批大小, 分桶) 形状编译一次，放宽重新编译次数的上限
+    torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 64)
+
+
+def _outputs_match(actual, expected, length, mask=None):
+    """
+    比较编译输出与 eager 输出
+
+    expected 由未补齐的输入得到，actual 的序列维度截取前 length 个位置后比较；
+    给出 mask 时只比较 mask 为1的位置 (批内补齐的位置不参与比较)。
+    """
+    for key, value in expected.items():
+        if not isinstance(value, torch.Tensor):
+            continue
+        other = actual[key]
+        if value.dim() >= 2 and other.dim() >= 2 and other.shape[1] != value.shape[1]:
+            other = other[:, :length]
+        if other.shape != value.shape:
+            return False
+        if mask is not None and value.dim() >= 2 and value.shape[:2] == mask.shape:
+            keep = mask.bool()
+            value, other = value[keep], other[keep]
+        if not torch.allclose(other.float(), value.float(), atol=PARITY_ATOL):
+            return False
+    return True
+
+
+class _ShapeVerifier:
+    """记录每种形状是否可以使用编译结果，第一次遇到时与 eager 输出对比"""
+
+    def __init__(self):
+        self._verified = {}
+        self._lock = threading.Lock()
+        self.stats = {"compiled_calls": 0, "eager_calls": 0, "shapes": 0, "mismatches": 0, "failures": 0}
+
+    def check(self, shape, run_compiled, run_eager, length, mask=None):
+        """
+        返回该形状是否使用编译结果
+
+        Args:
+            shape (tuple): 形状键
+            run_compiled (callable): 在补齐后的输入上运行编译函数，返回截取前的输出
+            run_eager (callable): 在未补齐的输入上运行 eager 前向
+            length (int): 未补齐时的序列长度
+            mask (Tensor, optional): 未补齐时的 attention_mask
+        """
+        with self._lock:
+            if shape in self._verified:
+                return self._verified[shape]
+            self.stats["shapes"] += 1
+            try:
+                with torch.no_grad():
+                    actual = run_compiled()
+                    expected = run_eager()
+                ok = _outputs_match(actual, expected, length, mask)
+                if not ok:
+                    self.stats["mismatches"] += 1
+                    print(f"编译结果与 eager 输出不一致，形状 {shape} 使用 eager 模式")
+            except Exception as e:
+                # 例如缺少C++编译器，只影响本模型的该形状
+                ok = False
+                self.stats["failures"] += 1
+                print(f"编译失败 ({type(e).__name__}: {e})，形状 {shape} 使用 eager 模式")
+            self._verified[shape] = ok
+            return ok
+
+
+class BucketedForward:
+    """
+    按序列长度分桶的编译前向函数
+
+    输入在右侧补齐到分桶长度 (attention_mask 补0)，编译后的图只会遇到少数几种形状。
+    每种形状第一次运行时与未补齐输入的 eager 输出对比，不一致或编译失败的形状改用 eager 模式。
+    """
+
+    def __init__(self, model, pad_token_id, buckets=DEFAULT_BUCKETS):
+        self.eager_forward = model.forward
+        self.compiled_forward = torch.compile(self.eager_forward, dynamic=False)
+        self.pad_token_id = pad_token_id or 0
+        self.buckets = buckets
+        self.verifier = _ShapeVerifier()
+        self.stats = self.verifier.stats
+
+    def _pad_inputs(self, inputs, bucket):
+        padded = {}
+        for name, tensor in inputs.items():
+            if name == "input_ids":
+                padded[name] = _pad_to(tensor, bucket, self.pad_token_id)
+            else:
+                # attention_mask 和 token_type_ids 都以0补齐
+                padded[name] = _pad_to(tensor, bucket, 0)
+        return padded
+
+    def _run_compiled(self, padded, bucket, length):
+        outputs = self.compiled_forward(**padded, return_dict=True)
+        for key in list(outputs.keys()):
+            value = outputs[key]
+            # 去掉补齐位置
+            if isinstance(value, torch.Tensor) and value.dim() >= 2 and value.shape[1] == bucket:
+                outputs[key] = value[:, :length]
+        return outputs
+
+    def __call__(self, input_ids=None, attention_mask=None, token_type_ids=None, **kwargs):
+        inputs = {"input_ids": input_ids}
+        if input_ids is not None and attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        inputs["attention_mask"] = attention_mask
+        if token_type_ids is not None:
+            inputs["token_type_ids"] = token_type_ids
+
+        # 其他参数 (如 inputs_embeds、output_attentions) 不走编译路径
+        extra = {k: v for k, v in kwargs.items() if v is not None and k != "return_dict"}
+        bucket = bucket_length(input_ids.shape[1], self.buckets) if input_ids is not None else None
+        if bucket is not None and not extra:
+            length = input_ids.shape[1]
+            padded = self._pad_inputs(inputs, bucket)
+            shape = (input_ids.shape[0], bucket)
+            if self.verifier.check(
+                shape,
+                lambda: self._run_compiled(padded, bucket, length),
+                lambda: self.eager_forward(**inputs, return_dict=True),
+                length,
+                attention_mask,
+            ):
+                self.stats["compiled_calls"] += 1
+                return self._run_compiled(padded, bucket, length)
+
+        self.stats["eager_calls"] += 1
+        return self.eager_forward(**inputs, **kwargs)
+
+
+class VerifiedEncoder:
+    """
+    编译后的编码器前向函数
+
+    generate 已把输入补齐到分桶长度，这里按 attention_mask 找出补齐前的长度，
+    每种形状第一次运行时与未补齐输入的 eager 输出对比，不一致或编译失败的形状改用 eager 模式。
+    没有 input_ids 的编码器 (如 whisper 的定长特征) 直接比较相同输入的两种输出。
+    """
+
+    def __init__(self, encoder):
+        self.eager_forward = encoder.forward
+        self.compiled_forward = torch.compile(self.eager_forward, dynamic=False)
+        self.verifier = _ShapeVerifier()
+        self.stats = self.verifier.stats
+
+    def __call__(self, *args, **kwargs):
+        tensors = [v for v in list(args) + list(kwargs.values()) if isinstance(v, torch.Tensor)]
+        shape = tuple(tuple(t.shape) for t in tensors)
+        length, mask, eager_args, eager_kwargs = None, None, args, kwargs
+
+        input_ids = kwargs.get("input_ids")
+        attention_mask = kwargs.get("attention_mask")
+        if isinstance(input_ids, torch.Tensor) and isinstance(attention_mask, torch.Tensor) and not args:
+            # 去掉所有样本都是补齐的尾部列
+            columns = attention_mask.any(dim=0).nonzero()
+            length = int(columns[-1]) + 1 if len(columns) else input_ids.shape[1]
+            mask = attention_mask[:, :length]
+            eager_kwargs = dict(kwargs, input_ids=input_ids[:, :length], attention_mask=mask)
+
+        def run_compiled():
+            return self.compiled_forward(*args, **kwargs)
+
+        def run_eager():
+            return self.eager_forward(*eager_args, **eager_kwargs)
+
+        if self.verifier.check(shape, run_compiled, run_eager, length, mask):
+            self.stats["compiled_calls"] += 1
+            return self.compiled_forward(*args, **kwargs)
+        self.stats["eager_calls"] += 1
+        return self.eager_forward(*args, **kwargs)
+
+
+def _compile_seq2seq(model, buckets):
+    """
+    编译编码器-解码器模型的编码器
+
+    使用 torch.compile (inductor) 编译编码器，generate 的输入补齐到分桶长度，
+    使编码器只会遇到少数几种形状。解码器每步长度都在变化，保持 eager 模式。
+    """
+    encoder = model.get_encoder()
+    encoder.forward = VerifiedEncoder(encoder)
+
+    pad_token_id = model.config.pad_token_id or 0
+    original_generate = model.generate
+
+    def generate(self, input_ids=None, attention_mask=None, **kwargs):
+        if input_ids is not None:
+            if attention_mask is None:
+                attention_mask = torch.ones_like(input_ids)
+            bucket = bucket_length(input_ids.shape[1], buckets)
+            if bucket is not None:
+                # 补齐位置的 attention_mask 为0，编码器输出和交叉注意力都会忽略它们
+                input_ids = _pad_to(input_ids, bucket, pad_token_id)
+                attention_mask = _pad_to(attention_mask, bucket, 0)
+        return original_generate(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+
+    model.generate = types.MethodType(generate, model)
+    return model
+
+
+def compile_pipeline(pipe, buckets=DEFAULT_BUCKETS):
+    """
+    为pipeline启用编译后端
+
+    使用 torch.compile (inductor)，输入补齐到序列长度分桶，避免每种新长度都重新编译；
+    编译结果缓存在磁盘上，之后的运行直接复用。
+
+    - 编码器模型 (如问答、文本分类): 编译模型前向
+    - 编码器-解码器模型 (如 Marian 翻译): 编译编码器，解码器保持 eager 模式
+
+    Args:
+        pipe: transformers pipeline实例
+        buckets (tuple): 序列长度分桶
+
+    Returns:
+        pipeline: 同一个pipeline实例
+    """
+    model = pipe.model
+    model.eval()
+    if model.config.is_encoder_decoder:
+        _setup_inductor()
+        _compile_seq2seq(model, buckets)
+    elif pipe.task in ("question-answering", "text-classification", "token-classification"):
+        _setup_inductor()
+        pad_token_id = getattr(pipe.tokenizer, "pad_token_id", None)
+        model.forward = BucketedForward(model, pad_token_id, buckets)
+    else:
+        print(f"编译后端不支持任务 {pipe.task}，使用 eager 模式")
+        return pipe
+    pipe._compiled = True
+    return pipe
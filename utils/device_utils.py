@@ -1,4 +1,3 @@
-import torch
 import os
 
 def get_device():
@@ -8,6 +7,9 @@ def get_device():
     Returns:
         str: 设备名称 ('mps', 'cuda', 'cpu')
     """
+    # 在函数内导入，避免 import utils 时加载 torch
+    import torch
+    
     if torch.backends.mps.is_available():
         return "mps"  # Apple Silicon GPU
     elif torch.cuda.is_available():
@@ -17,6 +19,8 @@ def get_device():
 
 def print_device_info():
     """打印当前设备信息"""
+    import torch
+    
     device = get_device()
     
     if device == "mps":
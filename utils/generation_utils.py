@@ -0,0 +1,370 @@
+import queue
+import threading
+import time
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
+
+
+class CancelCriteria(StoppingCriteria):
+    """在取消事件被设置后停止生成"""
+
+    def __init__(self, cancel_event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        stop = self.cancel_event.is_set()
+        return torch.full((input_ids.shape[0],), stop, dtype=torch.bool, device=input_ids.device)
+
+
+class _TokenStreamer(BaseStreamer):
+    """把 generate 每一步产生的token放入队列，并记录产生时间"""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self._prompt_seen = False
+
+    def put(self, value):
+        # 第一次调用传入的是提示文本本身
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        now = time.perf_counter()
+        for token_id in value.reshape(-1).tolist():
+            self.queue.put((token_id, now))
+
+    def end(self):
+        self.queue.put(None)
+
+
+class GenerationStream:
+    """
+    流式文本生成
+
+    在后台线程中运行 generate，迭代时逐个返回新解码的文本片段。
+    调用 cancel() 或提前停止迭代都会让生成在下一步结束。
+
+    生成完成后可通过 metrics 获取首token延迟 (TTFT) 和每个token的延迟。
+    """
+
+    def __init__(self, pipe, prompt, max_length=50, prefix_cache=None, **generate_kwargs):
+        """
+        Args:
+            pipe: text-generation pipeline实例
+            prompt (str): 提示文本
+            max_length (int): 生成的最大总长度 (包括提示文本)
+            prefix_cache (PrefixKVCache, optional): 前缀缓存，提示的已缓存前缀直接复用KV缓存，
+                生成结束后存入本次提示的前缀
+            **generate_kwargs: 传给 model.generate 的其他参数，如 temperature
+        """
+        self.tokenizer = pipe.tokenizer
+        self.model = pipe.model
+        self._cancel_event = threading.Event()
+        self._streamer = _TokenStreamer()
+        self._token_times = []
+        self._error = None
+        self._finished = False
+        self.cancelled = False
+
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        generate_kwargs.setdefault("pad_token_id", self.tokenizer.eos_token_id)
+        self._prefix_cache = prefix_cache
+        self._token_ids = inputs["input_ids"][0].tolist()
+        if prefix_cache is not None:
+            past_key_values, cached = prefix_cache.lookup(self._token_ids)
+            generate_kwargs["past_key_values"] = past_key_values
+            generate_kwargs["return_dict_in_generate"] = True
+            prefix_cache.stats["cached_tokens"] += cached
+            prefix_cache.stats["computed_tokens"] += len(self._token_ids) - cached
+        kwargs = dict(
+            inputs,
+            max_length=max_length,
+            streamer=self._streamer,
+            stopping_criteria=StoppingCriteriaList([CancelCriteria(self._cancel_event)]),
+            **generate_kwargs
+        )
+
+        self._start = time.perf_counter()
+        self._end = None
+        self._thread = threading.Thread(target=self._run, args=(kwargs,), daemon=True)
+        self._thread.start()
+
+    def _run(self, kwargs):
+        try:
+            with torch.no_grad():
+                output = self.model.generate(**kwargs)
+            if self._prefix_cache is not None:
+                self._prefix_cache.insert(self._token_ids, output.past_key_values)
+        except Exception as e:
+            self._error = e
+            self._streamer.end()
+
+    def __iter__(self):
+        token_ids = []
+        emitted = ""
+        try:
+            while True:
+                item = self._streamer.queue.get()
+                if item is None:
+                    self._finished = True
+                    break
+                token_id, produced_at = item
+                self._token_times.append(produced_at)
+                if token_id == self.tokenizer.eos_token_id:
+                    continue
+
+                token_ids.append(token_id)
+                text = self.tokenizer.decode(token_ids, skip_special_tokens=True)
+                # 多字节字符可能跨越多个token，等待完整后再输出
+                if text.endswith("\ufffd"):
+                    continue
+                piece = text[len(emitted):]
+                emitted = text
+                if piece:
+                    yield piece
+        finally:
+            # 消费方提前退出时停止生成
+            if not self._finished:
+                self.cancel()
+            self._thread.join()
+            self._end = time.perf_counter()
+
+        if self._error is not None:
+            raise self._error
+
+    def cancel(self):
+        """取消生成，模型会在当前步结束后停止"""
+        if not self._finished:
+            self.cancelled = True
+        self._cancel_event.set()
+
+    @property
+    def metrics(self):
+        """
+        返回本次生成的延迟统计
+
+        Returns:
+            dict: ttft (首token延迟)、token_latencies (每个token与前一个的间隔)、
+                tokens、total_time、tokens_per_second 和 cancelled
+        """
+        end = self._end or time.perf_counter()
+        times = self._token_times
+        latencies = [b - a for a, b in zip(times, times[1:])]
+        total = end - self._start
+        return {
+            "ttft": times[0] - self._start if times else None,
+            "token_latencies": latencies,
+            "mean_token_latency": sum(latencies) / len(latencies) if latencies else None,
+            "tokens": len(times),
+            "total_time": total,
+            "tokens_per_second": len(times) / total if total else 0.0,
+            "cancelled": self.cancelled,
+        }
+
+
+def stream_generate(pipe, prompt, max_length=50, temperature=0.7, do_sample=True, prefix_cache=None,
+                    **generate_kwargs):
+    """
+    流式生成文本
+
+    Args:
+        pipe: text-generation pipeline实例
+        prompt (str): 提示文本
+        max_length (int): 生成的最大总长度
+        temperature (float): 温度参数
+        do_sample (bool): 是否采样
+        prefix_cache (PrefixKVCache, optional): 前缀缓存，复用提示已缓存前缀的KV缓存
+        **generate_kwargs: 传给 model.generate 的其他参数
+
+    Returns:
+        GenerationStream: 可迭代的生成流，迭代得到文本片段
+
+    Example:
+        stream = stream_generate(pipe, "人工智能将在未来")
+        for piece in stream:
+            print(piece, end="", flush=True)
+        print(stream.metrics["ttft"])
+    """
+    return GenerationStream(
+        pipe,
+        prompt,
+        max_length=max_length,
+        temperature=temperature,
+        do_sample=do_sample,
+        prefix_cache=prefix_cache,
+        **generate_kwargs
+    )
+
+
+def _token_probs(logits, do_sample=False, temperature=1.0, top_k=None, top_p=None):
+    """
+    把logits转换为采样分布，返回CPU上的float32张量
+
+    采样时依次使用 generate 自己的 temperature / top_k / top_p 处理器，保证与普通采样的分布一致；
+    贪心解码只取argmax，不做任何截断。
+    """
+    from transformers import TemperatureLogitsWarper, TopKLogitsWarper, TopPLogitsWarper
+
+    logits = logits.float().cpu()
+    if do_sample:
+        squeeze = logits.dim() == 1
+        scores = logits.unsqueeze(0) if squeeze else logits
+        if temperature is not None and temperature != 1.0:
+            scores = TemperatureLogitsWarper(temperature)(None, scores)
+        if top_k:
+            scores = TopKLogitsWarper(top_k)(None, scores)
+        if top_p is not None and top_p < 1.0:
+            scores = TopPLogitsWarper(top_p)(None, scores)
+        logits = scores.squeeze(0) if squeeze else scores
+    return torch.softmax(logits, dim=-1)
+
+
+def _pick(probs, do_sample, generator=None):
+    """从分布中采样或取最大值，返回token id"""
+    if do_sample:
+        return torch.multinomial(probs, 1, generator=generator).item()
+    return probs.argmax(dim=-1).item()
+
+
+def _sync_cache(model, cache, ids, length):
+    """让KV缓存恰好覆盖 ids 的前 length 个token: 多余的裁掉，缺少的补算"""
+    current = cache.get_seq_length()
+    if current > length:
+        cache.crop(length)
+    elif current < length:
+        model(input_ids=ids[:, current:length], past_key_values=cache, use_cache=True)
+
+
+def speculative_generate(model, draft_model, input_ids, max_new_tokens=50, num_draft_tokens=4,
+                         do_sample=False, temperature=1.0, top_k=None, top_p=None, eos_token_id=None,
+                         generator=None):
+    """
+    投机解码 (speculative decoding)
+
+    每一轮由小的草稿模型连续提出 num_draft_tokens 个token，目标模型用一次前向计算
+    同时验证这些token。贪心模式下接受与目标模型argmax一致的前缀；采样模式下按
+    min(1, p/q) 的概率接受，被拒绝时从 max(0, p - q) 归一化后的分布重新采样。
+    两种模式的输出分布都与只用目标模型逐token生成完全相同，只是目标模型的前向次数更少。
+    采样时目标模型和草稿模型的分布都经过与 generate 相同的 temperature / top_k / top_p 处理，
+    未指定的 top_k、top_p 取目标模型 generation_config 中的值。
+
+    两个模型必须使用相同的tokenizer。只支持单条输入。
+
+    Args:
+        model: 目标模型 (如 gpt2)
+        draft_model: 草稿模型 (如 distilgpt2)
+        input_ids (torch.Tensor): 形状为 (1, L) 的提示token
+        max_new_tokens (int): 最多生成的新token数
+        num_draft_tokens (int): 每轮草稿模型提出的token数
+        do_sample (bool): 是否采样，False 时为贪心解码
+        temperature (float): 温度参数
+        top_k (int, optional): 只在概率最高的 top_k 个token中采样，默认取 generation_config.top_k
+        top_p (float, optional): 只在累计概率达到 top_p 的token中采样，默认取 generation_config.top_p
+        eos_token_id (int, optional): 结束token
+        generator (torch.Generator, optional): CPU随机数生成器
+
+    Returns:
+        tuple: (包含提示在内的token张量, 统计字典)
+            统计字典包括 new_tokens、drafted、accepted、acceptance_rate、
+            target_calls、seconds 和 tokens_per_second
+    """
+    from transformers import DynamicCache
+
+    if input_ids.shape[0] != 1:
+        raise ValueError("投机解码只支持单条输入")
+    if model.get_output_embeddings().weight.shape[0] != draft_model.get_output_embeddings().weight.shape[0]:
+        raise ValueError("草稿模型与目标模型的词表大小不一致，两者必须使用相同的tokenizer")
+
+    if top_k is None:
+        top_k = model.generation_config.top_k
+    if top_p is None:
+        top_p = model.generation_config.top_p
+    warp = dict(do_sample=do_sample, temperature=temperature, top_k=top_k, top_p=top_p)
+
+    device = model.device
+    ids = input_ids.to(device)
+    prompt_length = ids.shape[1]
+    target_cache = DynamicCache()
+    draft_cache = DynamicCache()
+    stats = {"drafted": 0, "accepted": 0, "target_calls": 0}
+
+    start = time.perf_counter()
+    with torch.no_grad():
+        # 缓存始终覆盖除最后一个token之外的全部token
+        _sync_cache(model, target_cache, ids, ids.shape[1] - 1)
+        _sync_cache(draft_model, draft_cache, ids.to(draft_model.device), ids.shape[1] - 1)
+
+        finished = False
+        while not finished:
+            generated = ids.shape[1] - prompt_length
+            remaining = max_new_tokens - generated
+            if remaining <= 0:
+                break
+            # 每轮至少产生一个目标模型的token，草稿数不超过剩余长度
+            k = min(num_draft_tokens, remaining - 1)
+
+            # 草稿模型逐个提出token
+            draft_tokens = []
+            draft_probs = []
+            next_input = ids[:, -1:].to(draft_model.device)
+            for _ in range(k):
+                logits = draft_model(input_ids=next_input, past_key_values=draft_cache, use_cache=True).logits
+                probs = _token_probs(logits[0, -1], **warp)
+                token = _pick(probs, do_sample, generator)
+                draft_tokens.append(token)
+                draft_probs.append(probs)
+                next_input = torch.tensor([[token]], device=draft_model.device)
+                if token == eos_token_id:
+                    break
+
+            # 目标模型一次前向计算验证所有草稿token
+            verify_ids = torch.tensor([[ids[0, -1].item()] + draft_tokens], device=device)
+            logits = model(input_ids=verify_ids, past_key_values=target_cache, use_cache=True).logits
+            target_probs = _token_probs(logits[0], **warp)
+            stats["target_calls"] += 1
+            stats["drafted"] += len(draft_tokens)
+
+            new_tokens = []
+            for i, token in enumerate(draft_tokens):
+                p, q = target_probs[i], draft_probs[i]
+                if do_sample:
+                    accept = torch.rand(1, generator=generator).item() < (p[token] / q[token]).item()
+                else:
+                    accept = p.argmax().item() == token
+                if accept:
+                    new_tokens.append(token)
+                    stats["accepted"] += 1
+                    continue
+                # 被拒绝: 从修正后的分布中取一个token代替
+                if do_sample:
+                    residual = (p - q).clamp(min=0)
+                    total = residual.sum()
+                    new_tokens.append(_pick(residual / total if total > 0 else p, True, generator))
+                else:
+                    new_tokens.append(p.argmax().item())
+                break
+            else:
+                # 全部接受时，目标模型最后一个位置的分布额外给出一个token
+                new_tokens.append(_pick(target_probs[len(draft_tokens)], do_sample, generator))
+
+            if eos_token_id is not None and eos_token_id in new_tokens:
+                new_tokens = new_tokens[:new_tokens.index(eos_token_id) + 1]
+                finished = True
+            new_tokens = new_tokens[:remaining]
+            ids = torch.cat([ids, torch.tensor([new_tokens], device=device)], dim=1)
+
+            # 丢弃被拒绝token的缓存，补上草稿模型缺少的缓存
+            if not finished:
+                _sync_cache(model, target_cache, ids, ids.shape[1] - 1)
+                _sync_cache(draft_model, draft_cache, ids.to(draft_model.device), ids.shape[1] - 1)
+
+    seconds = time.perf_counter() - start
+    new_count = ids.shape[1] - prompt_length
+    stats.update({
+        "new_tokens": new_count,
+        "acceptance_rate": stats["accepted"] / stats["drafted"] if stats["drafted"] else 0.0,
+        "seconds": seconds,
+        "tokens_per_second": new_count / seconds if seconds else 0.0,
+    })
+    return ids, stats
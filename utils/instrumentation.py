@@ -0,0 +1,263 @@
+import copy
+import json
+import threading
+import time
+import types
+
+# 直方图默认分桶上界 (秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# pipeline前向输出中表示生成token的字段
+_GENERATED_KEYS = ("generated_sequence", "output_ids", "tokens")
+
+
+class Histogram:
+    """累计分桶直方图，格式与Prometheus一致"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def to_dict(self):
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative.append([bound, running])
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "buckets": cumulative,
+        }
+
+
+class PipelineMetrics:
+    """
+    pipeline各阶段的计数器与耗时直方图
+
+    阶段包括 preprocess (分词/特征提取)、forward (模型前向，含完整生成过程)、
+    model_call (每次模型调用，生成任务中即每个生成步) 和 postprocess。
+    """
+
+    STAGES = ("preprocess", "forward", "model_call", "postprocess")
+
+    def __init__(self, task=None, model=None):
+        self.labels = {"task": task or "", "model": model or ""}
+        self.histograms = {stage: Histogram() for stage in self.STAGES}
+        self.counters = {"samples": 0, "input_tokens": 0, "generated_tokens": 0, "calls": 0}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.histograms[stage].observe(seconds)
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        """以字典形式返回所有指标"""
+        with self._lock:
+            return {
+                "labels": dict(self.labels),
+                "counters": dict(self.counters),
+                "histograms": {stage: h.to_dict() for stage, h in self.histograms.items()},
+            }
+
+    def to_json(self, indent=2):
+        """以JSON字符串返回所有指标"""
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
+
+    def to_prometheus(self, prefix="pipeline"):
+        """以Prometheus文本格式返回所有指标"""
+        data = self.to_dict()
+        labels = ",".join(f'{k}="{v}"' for k, v in data["labels"].items())
+        lines = []
+        for name, value in data["counters"].items():
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{{{labels}}} {value}")
+        for stage, hist in data["histograms"].items():
+            metric = f"{prefix}_{stage}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in hist["buckets"]:
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {hist["count"]}')
+            lines.append(f"{metric}_sum{{{labels}}} {hist['sum']}")
+            lines.append(f"{metric}_count{{{labels}}} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _count_inputs(metrics, inputs):
+    """统计样本数和输入token数"""
+    metrics.inc("samples")
+    if isinstance(inputs, dict):
+        ids = inputs.get("input_ids")
+        if ids is not None and hasattr(ids, "numel"):
+            mask = inputs.get("attention_mask")
+            metrics.inc("input_tokens", int(mask.sum()) if mask is not None else ids.numel())
+
+
+def _count_outputs(metrics, outputs, pad_token_id=None):
+    """
+    统计生成的token数
+
+    不计补齐位置；仅解码器模型的输出包含提示，减去提示的token数；
+    编码器-解码器模型的输出以 decoder_start_token 开头，每条序列减1。
+    """
+    if not isinstance(outputs, dict):
+        return
+    for key in _GENERATED_KEYS:
+        value = outputs.get(key)
+        if value is None or not hasattr(value, "numel"):
+            continue
+        if value.numel() == 0:
+            return
+        tokens = int((value != pad_token_id).sum()) if pad_token_id is not None else value.numel()
+        sequences = value.numel() // value.shape[-1]
+        prompt_ids = outputs.get("input_ids")
+        if key == "generated_sequence" and prompt_ids is not None and hasattr(prompt_ids, "numel"):
+            prompt_tokens = int((prompt_ids != pad_token_id).sum()) if pad_token_id is not None else prompt_ids.numel()
+            # 每个提示可能返回多条序列
+            tokens -= prompt_tokens * (sequences // max(prompt_ids.shape[0], 1))
+        else:
+            tokens -= sequences
+        metrics.inc("generated_tokens", max(tokens, 0))
+        return
+
+
+def _timed_generator(gen, metrics, stage, on_item=None):
+    """为生成器形式的阶段 (如问答、语音识别的分块预处理) 逐项计时"""
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(gen)
+        except StopIteration:
+            return
+        metrics.observe(stage, time.perf_counter() - start)
+        if on_item is not None:
+            on_item(metrics, item)
+        yield item
+
+
+def instrument_pipeline(pipe, task=None, model=None):
+    """
+    为pipeline实例添加分阶段计时和计数
+
+    通过替换实例上的 preprocess/_forward/postprocess 方法实现，
+    并在模型上注册前向钩子记录每次模型调用 (每个生成步) 的耗时。
+    重复调用返回已有的指标对象。
+
+    Args:
+        pipe: transformers pipeline实例
+        task (str, optional): 指标标签中的任务名称
+        model (str, optional): 指标标签中的模型名称
+
+    Returns:
+        PipelineMetrics: 该pipeline的指标
+    """
+    existing = getattr(pipe, "_pipeline_metrics", None)
+    if isinstance(existing, PipelineMetrics):
+        return existing
+
+    metrics = PipelineMetrics(task=task or getattr(pipe, "task", None), model=model)
+    tokenizer = getattr(pipe, "tokenizer", None)
+    pad_token_id = getattr(tokenizer, "pad_token_id", None)
+    # 模型钩子注册在共享的模型上，只记录经由本实例 _forward 的调用
+    call_state = threading.local()
+    original_preprocess = pipe.preprocess
+    original_forward = pipe._forward
+    original_postprocess = pipe.postprocess
+
+    def preprocess(self, *args, **kwargs):
+        metrics.inc("calls")
+        start = time.perf_counter()
+        result = original_preprocess(*args, **kwargs)
+        if isinstance(result, types.GeneratorType):
+            return _timed_generator(result, metrics, "preprocess", _count_inputs)
+        metrics.observe("preprocess", time.perf_counter() - start)
+        _count_inputs(metrics, result)
+        return result
+
+    def _forward(self, *args, **kwargs):
+        start = time.perf_counter()
+        call_state.active = True
+        try:
+            result = original_forward(*args, **kwargs)
+        finally:
+            call_state.active = False
+        metrics.observe("forward", time.perf_counter() - start)
+        _count_outputs(metrics, result, pad_token_id)
+        return result
+
+    def postprocess(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = original_postprocess(*args, **kwargs)
+        metrics.observe("postprocess", time.perf_counter() - start)
+        return result
+
+    pipe.preprocess = types.MethodType(preprocess, pipe)
+    pipe._forward = types.MethodType(_forward, pipe)
+    pipe.postprocess = types.MethodType(postprocess, pipe)
+
+    # 每次模型调用 (生成任务中即每个解码步) 的耗时
+    def pre_hook(module, args):
+        if getattr(call_state, "active", False):
+            call_state.start = time.perf_counter()
+
+    def post_hook(module, args, output):
+        start = getattr(call_state, "start", None)
+        if getattr(call_state, "active", False) and start is not None:
+            metrics.observe("model_call", time.perf_counter() - start)
+            call_state.start = None
+
+    if hasattr(pipe.model, "register_forward_pre_hook"):
+        pipe.model.register_forward_pre_hook(pre_hook)
+        pipe.model.register_forward_hook(post_hook)
+
+    pipe._pipeline_metrics = metrics
+    return metrics
+
+
+_proxy_lock = threading.Lock()
+
+
+def instrumented_view(pipe, task=None, model=None):
+    """
+    返回带计时的pipeline浅拷贝
+
+    拷贝与原实例共享模型和分词器，计时只加在拷贝上，缓存中的原实例保持不变，
+    不启用计时的调用方没有额外开销。同一实例重复调用返回同一个拷贝。
+
+    Args:
+        pipe: transformers pipeline实例
+        task (str, optional): 指标标签中的任务名称
+        model (str, optional): 指标标签中的模型名称
+
+    Returns:
+        pipeline: 带计时的pipeline，可用 get_pipeline_metrics 读取指标
+    """
+    with _proxy_lock:
+        proxy = pipe.__dict__.get("_instrumented_view")
+        if proxy is None:
+            proxy = copy.copy(pipe)
+            instrument_pipeline(proxy, task=task, model=model)
+            pipe._instrumented_view = proxy
+        return proxy
+
+
+def get_pipeline_metrics(pipe):
+    """返回pipeline的指标，未启用计时时返回None"""
+    metrics = getattr(pipe, "_pipeline_metrics", None)
+    return metrics if isinstance(metrics, PipelineMetrics) else None
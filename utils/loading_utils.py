@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import shutil
+
+# .bin 权重转换为 safetensors 后的保存目录
+SAFETENSORS_CACHE_DIR = os.path.expanduser(
+    os.environ.get("SAFETENSORS_CACHE_DIR", "~/.cache/transformers-pipeline-practice/safetensors")
+)
+
+_BIN_WEIGHTS = "pytorch_model.bin"
+_BIN_INDEX = "pytorch_model.bin.index.json"
+_SAFE_WEIGHTS = "model.safetensors"
+_SAFE_INDEX = "model.safetensors.index.json"
+
+
+def has_safetensors(model_dir):
+    """模型目录中是否已有 safetensors 权重"""
+    return any(name.endswith(".safetensors") for name in os.listdir(model_dir))
+
+
+def _converted_dir(model_dir):
+    """转换结果的目录，源权重文件变化 (修改时间或大小) 后会重新转换"""
+    parts = [os.path.realpath(model_dir)]
+    for name in sorted(os.listdir(model_dir)):
+        if name.startswith("pytorch_model") and name.endswith((".bin", ".json")):
+            stat = os.stat(os.path.join(model_dir, name))
+            parts.append(f"{name}:{stat.st_mtime}:{stat.st_size}")
+    digest = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+    name = os.path.basename(os.path.normpath(model_dir))
+    return os.path.join(SAFETENSORS_CACHE_DIR, f"{name}-{digest}")
+
+
+def _convert_shard(bin_path, safe_path):
+    """把单个 .bin 文件转换为 safetensors，返回保存的张量名称"""
+    import torch
+    from safetensors.torch import save_file
+
+    state_dict = torch.load(bin_path, map_location="cpu", weights_only=True)
+    # 共享存储的张量 (如绑定的词嵌入和输出层) 只保存一份，加载时由模型重新绑定
+    tensors = {}
+    seen = set()
+    for name, tensor in state_dict.items():
+        key = (tensor.untyped_storage().data_ptr(), tensor.storage_offset(), tuple(tensor.shape))
+        if key in seen:
+            continue
+        seen.add(key)
+        tensors[name] = tensor.contiguous()
+    save_file(tensors, safe_path, metadata={"format": "pt"})
+    return list(tensors)
+
+
+def ensure_safetensors(model_dir):
+    """
+    返回包含 safetensors 权重的模型目录
+
+    目录中已有 safetensors 权重时直接返回；只有 .bin 权重时在缓存目录中转换一次，
+    其他文件 (配置、tokenizer 等) 以符号链接引用，之后直接使用转换结果。
+
+    Args:
+        model_dir (str): 本地模型目录
+
+    Returns:
+        str: 可以用 safetensors 加载的模型目录
+    """
+    if has_safetensors(model_dir):
+        return model_dir
+    has_bin = os.path.isfile(os.path.join(model_dir, _BIN_WEIGHTS))
+    has_index = os.path.isfile(os.path.join(model_dir, _BIN_INDEX))
+    if not has_bin and not has_index:
+        return model_dir
+
+    target = _converted_dir(model_dir)
+    if os.path.isdir(target):
+        return target
+
+    print(f"转换权重为 safetensors: {model_dir}")
+    tmp_dir = target + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for name in os.listdir(model_dir):
+        if name.startswith("pytorch_model") or name.endswith(".bin"):
+            continue
+        os.symlink(os.path.realpath(os.path.join(model_dir, name)), os.path.join(tmp_dir, name))
+
+    if has_index:
+        # 分片权重逐个转换，并改写索引中的文件名
+        with open(os.path.join(model_dir, _BIN_INDEX), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        renamed = {}
+        weight_map = {}
+        for shard in sorted(set(index["weight_map"].values())):
+            safe_shard = shard.replace("pytorch_model", "model").replace(".bin", ".safetensors")
+            saved = set(_convert_shard(os.path.join(model_dir, shard), os.path.join(tmp_dir, safe_shard)))
+            renamed[shard] = (safe_shard, saved)
+        for name, shard in index["weight_map"].items():
+            safe_shard, saved = renamed[shard]
+            if name in saved:
+                weight_map[name] = safe_shard
+        with open(os.path.join(tmp_dir, _SAFE_INDEX), "w", encoding="utf-8") as f:
+            json.dump({"metadata": index.get("metadata", {}), "weight_map": weight_map}, f, indent=2)
+    else:
+        _convert_shard(os.path.join(model_dir, _BIN_WEIGHTS), os.path.join(tmp_dir, _SAFE_WEIGHTS))
+
+    try:
+        os.replace(tmp_dir, target)
+    except OSError:
+        # 其他进程已经完成了同样的转换
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(target):
+            raise
+    print(f"safetensors 权重已保存: {target}")
+    return target
+
+
+def fast_load_kwargs():
+    """
+    快速加载使用的模型参数
+
+    safetensors 权重按内存映射读取；low_cpu_mem_usage 跳过随机初始化，
+    权重直接加载为目标数据类型，加载过程中不会出现第二份完整的权重副本。
+    """
+    return {"low_cpu_mem_usage": True, "use_safetensors": True}
@@ -0,0 +1,296 @@
+import json
+import os
+import threading
+
+# 目录结构: <hub>/models--<org>--<name>/{refs/main, snapshots/<revision>/, blobs/}
+DEFAULT_HUB_CACHE = os.path.expanduser(
+    os.environ.get("HF_HUB_CACHE")
+    or os.path.join(os.environ.get("HF_HOME", "~/.cache/huggingface"), "hub")
+)
+
+DEFAULT_CATALOG_PATH = os.path.expanduser(
+    os.environ.get("MODEL_CATALOG_PATH", "~/.cache/transformers-pipeline-practice/model_catalog.json")
+)
+
+CATALOG_VERSION = 3
+
+# 分词器/特征提取器文件，快照中至少要有一个才能直接加载
+_TOKENIZER_FILES = (
+    "tokenizer.json", "tokenizer_config.json", "vocab.json", "vocab.txt",
+    "spiece.model", "sentencepiece.bpe.model", "source.spm", "preprocessor_config.json",
+)
+
+# 按 model_type 推断的任务
+_TASKS_BY_MODEL_TYPE = {
+    "whisper": "automatic-speech-recognition",
+    "marian": "translation",
+    "blenderbot": "conversational",
+    "blenderbot-small": "conversational",
+}
+
+# 按 architectures 后缀推断的任务
+_TASKS_BY_ARCH_SUFFIX = (
+    ("ForQuestionAnswering", "question-answering"),
+    ("ForSpeechSeq2Seq", "automatic-speech-recognition"),
+    ("ForCTC", "automatic-speech-recognition"),
+    ("ForSequenceClassification", "text-classification"),
+    ("ForTokenClassification", "token-classification"),
+    ("LMHeadModel", "text-generation"),
+    ("ForCausalLM", "text-generation"),
+    ("ForConditionalGeneration", "text2text-generation"),
+    ("ForMaskedLM", "fill-mask"),
+)
+
+
+def guess_task(config):
+    """根据 config.json 推断模型的默认任务，无法推断时返回None"""
+    task = _TASKS_BY_MODEL_TYPE.get(config.get("model_type"))
+    if task:
+        return task
+    for arch in config.get("architectures") or []:
+        for suffix, arch_task in _TASKS_BY_ARCH_SUFFIX:
+            if arch.endswith(suffix):
+                return arch_task
+    return None
+
+
+def weight_format(snapshot_dir):
+    """返回快照中的权重格式: safetensors / bin / safetensors+bin / None"""
+    formats = set()
+    for name in os.listdir(snapshot_dir):
+        if name.endswith(".safetensors"):
+            formats.add("safetensors")
+        elif name.endswith(".bin") and name.startswith("pytorch_model"):
+            formats.add("bin")
+    return "+".join(sorted(formats)) or None
+
+
+def has_tokenizer(snapshot_dir):
+    """快照中是否有分词器或特征提取器文件"""
+    return any(os.path.isfile(os.path.join(snapshot_dir, name)) for name in _TOKENIZER_FILES)
+
+
+def shards_complete(snapshot_dir):
+    """分片权重的索引文件 (*.index.json) 中列出的分片是否都已下载，没有索引文件时返回True"""
+    for name in os.listdir(snapshot_dir):
+        if not name.endswith(".index.json"):
+            continue
+        try:
+            with open(os.path.join(snapshot_dir, name), "r", encoding="utf-8") as f:
+                shards = set(json.load(f).get("weight_map", {}).values())
+        except (OSError, ValueError, AttributeError):
+            return False
+        if not all(os.path.isfile(os.path.join(snapshot_dir, shard)) for shard in shards):
+            return False
+    return True
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+class ModelCatalog:
+    """
+    本地模型快照目录
+
+    记录 Hugging Face 缓存 (及额外目录) 中每个模型的快照路径、版本、任务、
+    权重格式和磁盘占用，保存为JSON文件。刷新时只重新扫描修改时间发生变化的模型目录，
+    解析模型名称只读本地文件，不访问网络。
+    """
+
+    def __init__(self, hub_cache=DEFAULT_HUB_CACHE, catalog_path=DEFAULT_CATALOG_PATH, extra_dirs=None):
+        """
+        Args:
+            hub_cache (str): Hugging Face hub 缓存目录
+            catalog_path (str): 目录文件的保存路径
+            extra_dirs (list, optional): 额外扫描的本地模型根目录，其中每个子目录是一个模型
+        """
+        self.hub_cache = hub_cache
+        self.catalog_path = catalog_path
+        self.extra_dirs = list(extra_dirs or [])
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.catalog_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CATALOG_VERSION:
+            self.entries = data.get("entries", {})
+
+    def save(self):
+        """把目录写入磁盘"""
+        os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
+        tmp_path = self.catalog_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CATALOG_VERSION, "entries": self.entries}, f, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, self.catalog_path)
+
+    def _iter_model_dirs(self):
+        """列出所有候选模型目录: (模型名称, 目录, 来源, 根目录)"""
+        if os.path.isdir(self.hub_cache):
+            for name in os.listdir(self.hub_cache):
+                if not name.startswith("models--"):
+                    continue
+                parts = name[len("models--"):].split("--")
+                yield "/".join(parts), os.path.join(self.hub_cache, name), "hub", self.hub_cache
+        for base_dir in self.extra_dirs:
+            if not os.path.isdir(base_dir):
+                continue
+            for name in os.listdir(base_dir):
+                path = os.path.join(base_dir, name)
+                if os.path.isfile(os.path.join(path, "config.json")):
+                    yield name, path, "local", base_dir
+
+    @staticmethod
+    def _signature(repo_dir, source):
+        """目录的修改时间签名，新增快照或切换版本都会改变签名"""
+        if source == "local":
+            return max(_mtime(repo_dir), _mtime(os.path.join(repo_dir, "config.json")))
+        paths = [repo_dir, os.path.join(repo_dir, "refs"), os.path.join(repo_dir, "refs", "main"),
+                 os.path.join(repo_dir, "snapshots")]
+        snapshots = os.path.join(repo_dir, "snapshots")
+        if os.path.isdir(snapshots):
+            paths.extend(os.path.join(snapshots, s) for s in os.listdir(snapshots))
+        return max(_mtime(p) for p in paths)
+
+    @staticmethod
+    def _select_snapshot(repo_dir):
+        """返回 refs/main 指向的快照，没有时返回最新的快照"""
+        snapshots = os.path.join(repo_dir, "snapshots")
+        if not os.path.isdir(snapshots):
+            return None, None
+        ref_file = os.path.join(repo_dir, "refs", "main")
+        if os.path.isfile(ref_file):
+            with open(ref_file, "r") as f:
+                revision = f.read().strip()
+            if os.path.isdir(os.path.join(snapshots, revision)):
+                return revision, os.path.join(snapshots, revision)
+        candidates = [s for s in os.listdir(snapshots) if os.path.isdir(os.path.join(snapshots, s))]
+        if not candidates:
+            return None, None
+        revision = max(candidates, key=lambda s: _mtime(os.path.join(snapshots, s)))
+        return revision, os.path.join(snapshots, revision)
+
+    def _describe(self, repo_dir, source, root, signature):
+        """读取模型目录生成目录条目，不是完整模型时返回None"""
+        if source == "local":
+            revision, snapshot = None, repo_dir
+            size_dir = repo_dir
+        else:
+            revision, snapshot = self._select_snapshot(repo_dir)
+            # 快照中的文件是指向 blobs 的链接，磁盘占用按 blobs 计算
+            size_dir = os.path.join(repo_dir, "blobs")
+        if snapshot is None or not os.path.isfile(os.path.join(snapshot, "config.json")):
+            return None
+
+        try:
+            with open(os.path.join(snapshot, "config.json"), "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            config = {}
+
+        return {
+            "path": snapshot,
+            "revision": revision,
+            "source": source,
+            "root": root,
+            "model_type": config.get("model_type"),
+            "task": guess_task(config),
+            "weight_format": weight_format(snapshot),
+            "has_tokenizer": has_tokenizer(snapshot),
+            "shards_complete": shards_complete(snapshot),
+            "size_bytes": _dir_size(size_dir),
+            "signature": signature,
+        }
+
+    def refresh(self):
+        """
+        增量刷新目录
+
+        只有修改时间签名变化的模型目录会被重新读取，已删除的模型从目录中移除。
+
+        Returns:
+            int: 本次重新读取的模型数
+        """
+        with self._lock:
+            seen = set()
+            updated = 0
+            for name, repo_dir, source, root in self._iter_model_dirs():
+                seen.add(name)
+                signature = self._signature(repo_dir, source)
+                entry = self.entries.get(name)
+                if entry and entry.get("signature") == signature and entry.get("root") == root:
+                    continue
+                entry = self._describe(repo_dir, source, root, signature)
+                if entry is None:
+                    self.entries.pop(name, None)
+                else:
+                    self.entries[name] = entry
+                updated += 1
+
+            # 只移除本次扫描过的根目录下已不存在的模型
+            removed = [name for name, entry in self.entries.items()
+                       if name not in seen and self._is_scanned(entry)]
+            for name in removed:
+                del self.entries[name]
+
+            if updated or removed:
+                self.save()
+            return updated
+
+    def _is_scanned(self, entry):
+        return entry.get("source") == "hub" or entry.get("root") in self.extra_dirs
+
+    def resolve(self, model_name):
+        """
+        把模型名称解析为本地快照路径
+
+        只解析包含权重和分词器文件、且分片索引列出的分片都已下载的完整快照。只下载了
+        config.json 或下载中断的模型返回None，由调用方按模型名称加载 (必要时下载)。
+
+        Args:
+            model_name (str): 模型名称，如 "openai/whisper-tiny"
+
+        Returns:
+            str: 本地快照目录，本地没有完整的模型时返回None
+        """
+        self.refresh()
+        entry = self.entries.get(model_name)
+        if (entry and self._is_scanned(entry) and entry.get("weight_format") and entry.get("has_tokenizer")
+                and entry.get("shards_complete") and os.path.isfile(os.path.join(entry["path"], "config.json"))):
+            return entry["path"]
+        return None
+
+    def list_models(self):
+        """返回 {模型名称: 条目} 字典"""
+        self.refresh()
+        return {name: entry for name, entry in self.entries.items() if self._is_scanned(entry)}
+
+
+_catalogs = {}
+
+
+def get_model_catalog(extra_dirs=None):
+    """返回模型目录实例 (按额外目录区分)"""
+    key = tuple(extra_dirs or ())
+    if key not in _catalogs:
+        _catalogs[key] = ModelCatalog(extra_dirs=list(key))
+    return _catalogs[key]
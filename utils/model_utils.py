@@ -1,7 +1,12 @@
-from huggingface_hub import snapshot_download
 import os
-from transformers import pipeline
 from .device_utils import get_device
+from .pipeline_cache import PipelineCache, get_pipeline_cache
+from .instrumentation import instrumented_view
+from .model_catalog import get_model_catalog
+from .tuning_utils import get_tuned_config, apply_thread_config, apply_tuned_config
+
+# huggingface_hub、transformers 和量化工具都在实际使用时才导入，
+# 列出本地模型、解析参数等操作不需要加载这些依赖
 
 def download_model(model_name, local_dir=None):
     """
@@ -14,6 +19,8 @@ def download_model(model_name, local_dir=None):
     Returns:
         str: 模型保存路径
     """
+    from huggingface_hub import snapshot_download
+    
     print(f"正在下载模型: {model_name}")
     
     if local_dir:
@@ -28,7 +35,8 @@ def download_model(model_name, local_dir=None):
     print(f"模型已下载到: {model_path}")
     return model_path
 
-def create_pipeline(task, model_name=None, model_path=None):
+def create_pipeline(task, model_name=None, model_path=None, torch_dtype=None, use_cache=True,
+                    instrument=False, quantize=False, fast_load=False, compile_model=False):
     """
     创建指定任务的pipeline
     
@@ -36,57 +44,121 @@ def create_pipeline(task, model_name=None, model_path=None):
         task (str): 任务类型，如 "automatic-speech-recognition", "question-answering" 等
         model_name (str, optional): 模型名称，如果指定则使用该模型
         model_path (str, optional): 本地模型路径，如果指定则优先使用本地模型
+        torch_dtype (torch.dtype, optional): 模型权重的数据类型，如 torch.float16
+        use_cache (bool): 是否复用进程内已加载的相同pipeline (默认: True)
+        instrument (bool): 是否记录各阶段耗时和token计数，可用 get_pipeline_metrics 读取 (默认: False)
+        quantize (bool): 是否对 Linear 层做动态int8量化并在CPU上运行，量化结果缓存在磁盘上 (默认: False)
+        fast_load (bool): 是否以内存映射方式加载 safetensors 权重，.bin 权重在第一次使用时转换 (默认: False)
+        compile_model (bool): 是否用 torch.compile 编译模型，输入按序列长度分桶补齐，
+            编译结果缓存在磁盘上 (默认: False)
         
     Returns:
         pipeline: 创建的pipeline实例
     """
     device = get_device()
     
-    if model_path:
-        # 使用本地模型文件
-        print(f"使用本地模型: {model_path}")
-        pipe = pipeline(task, model=model_path, device=device)
-    elif model_name:
-        # 使用指定模型
-        print(f"使用模型: {model_name}")
-        pipe = pipeline(task, model=model_name, device=device)
-    else:
-        # 使用任务默认模型
-        print(f"使用默认模型")
-        pipe = pipeline(task, device=device)
+    if quantize:
+        # 动态量化的算子只支持CPU
+        if device != "cpu":
+            print(f"量化模型只支持CPU，忽略设备 {device}")
+        device = "cpu"
+        torch_dtype = "int8-dynamic"
+    
+    # 本机有调优配置时先设置线程数 (inter-op 线程数必须在计算开始前设置)
+    tuned = get_tuned_config(task, model_path or model_name)
+    if tuned:
+        apply_thread_config(tuned)
+    
+    # 本地已有快照时直接从快照目录加载，不向 Hub 查询最新版本
+    snapshot_path = None
+    if model_name and not model_path:
+        snapshot_path = get_model_catalog().resolve(model_name)
+    
+    def load():
+        if quantize:
+            from .quantization_utils import create_quantized_pipeline
+            return create_quantized_pipeline(task, model_path or snapshot_path or model_name)
         
+        from transformers import pipeline
+        
+        if fast_load and (model_path or model_name):
+            return _fast_load_pipeline(task, model_path or snapshot_path or model_name, device, torch_dtype)
+        
+        if model_path:
+            # 使用本地模型文件
+            print(f"使用本地模型: {model_path}")
+            return pipeline(task, model=model_path, device=device, torch_dtype=torch_dtype)
+        elif snapshot_path:
+            # 使用本地缓存的模型快照
+            print(f"使用本地模型快照: {model_name} ({snapshot_path})")
+            return pipeline(task, model=snapshot_path, device=device, torch_dtype=torch_dtype)
+        elif model_name:
+            # 使用指定模型
+            print(f"使用模型: {model_name}")
+            return pipeline(task, model=model_name, device=device, torch_dtype=torch_dtype)
+        else:
+            # 使用任务默认模型
+            print(f"使用默认模型")
+            return pipeline(task, device=device, torch_dtype=torch_dtype)
+    
+    def loader():
+        pipe = _prepare_padding(load())
+        if compile_model:
+            from .compile_utils import compile_pipeline
+            pipe = compile_pipeline(pipe)
+        return pipe
+    
+    if use_cache:
+        key = PipelineCache.make_key(task, model_path or model_name, device, torch_dtype)
+        if compile_model:
+            key += ("compiled",)
+        pipe = get_pipeline_cache().get_or_load(key, loader)
+    else:
+        pipe = loader()
+    
+    if tuned:
+        apply_tuned_config(pipe, tuned)
+    if instrument:
+        # 计时加在浅拷贝上，缓存中共享的pipeline不受影响
+        pipe = instrumented_view(pipe, task=task, model=model_path or model_name)
     return pipe
 
+def _prepare_padding(pipe):
+    """
+    让文本生成pipeline可以批量推理
+
+    gpt2 等仅解码器模型没有 pad token，批量调用时 transformers 会报错；
+    批内补齐还必须在左侧，否则模型会在补齐位置之后继续生成。
+    """
+    tokenizer = getattr(pipe, "tokenizer", None)
+    if pipe.task != "text-generation" or tokenizer is None:
+        return pipe
+    if tokenizer.pad_token_id is None and tokenizer.eos_token_id is not None:
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+        pipe.model.generation_config.pad_token_id = tokenizer.eos_token_id
+    tokenizer.padding_side = "left"
+    return pipe
+
+def _fast_load_pipeline(task, source, device, torch_dtype):
+    """从本地 safetensors 权重快速创建pipeline，本地没有模型时先下载"""
+    from transformers import pipeline
+    from .loading_utils import ensure_safetensors, fast_load_kwargs
+    
+    if not os.path.isdir(source):
+        source = download_model(source)
+    source = ensure_safetensors(source)
+    print(f"快速加载模型: {source}")
+    return pipeline(task, model=source, device=device, torch_dtype=torch_dtype, model_kwargs=fast_load_kwargs())
+
 def list_local_models(base_dir=None):
     """
     列出本地已下载的模型
     
     Args:
-        base_dir (str, optional): 要检查的基础目录，如果为None则检查默认缓存目录
+        base_dir (str, optional): 额外检查的基础目录，默认缓存目录总会被检查
         
     Returns:
         list: 本地模型列表
     """
-    local_models = []
-    
-    # 检查默认缓存目录
-    cache_dir = os.path.expanduser("~/.cache/huggingface/hub")
-    
-    # 如果指定了基础目录，则检查该目录
-    if base_dir and os.path.exists(base_dir):
-        for model_dir in os.listdir(base_dir):
-            if os.path.isdir(os.path.join(base_dir, model_dir)):
-                local_models.append(model_dir)
-    
-    # 检查缓存目录
-    if os.path.exists(cache_dir):
-        for model_dir in os.listdir(cache_dir):
-            if model_dir.startswith("models--") and os.path.isdir(os.path.join(cache_dir, model_dir)):
-                # 从目录名称提取模型名称
-                parts = model_dir.split("--")
-                if len(parts) >= 3:
-                    model_name = f"{parts[1]}/{parts[2]}"
-                    if model_name not in local_models:
-                        local_models.append(model_name)
-    
-    return local_models 
\ No newline at end of file
+    catalog = get_model_catalog(extra_dirs=[base_dir] if base_dir else None)
+    return list(catalog.list_models())
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# 默认内存预算 (GB)，可通过环境变量 PIPELINE_CACHE_MAX_MEMORY_GB 覆盖
+DEFAULT_MAX_MEMORY_GB = float(os.environ.get("PIPELINE_CACHE_MAX_MEMORY_GB", "8"))
+
+
+def estimate_pipeline_memory(pipe):
+    """
+    估算pipeline中模型权重占用的内存
+
+    Args:
+        pipe: transformers pipeline实例
+
+    Returns:
+        int: 参数和缓冲区占用的字节数
+    """
+    model = getattr(pipe, "model", None)
+    if model is None or not hasattr(model, "parameters"):
+        return 0
+
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class PipelineCache:
+    """
+    进程级pipeline缓存
+
+    以 (task, model, device, dtype) 为键保存已加载的pipeline，
+    超出内存预算时按最近最少使用 (LRU) 顺序淘汰模型。
+    """
+
+    def __init__(self, max_memory_gb=DEFAULT_MAX_MEMORY_GB):
+        self.max_memory_bytes = int(max_memory_gb * 1024 ** 3)
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_times = {}
+
+    @staticmethod
+    def make_key(task, model, device, dtype):
+        """生成缓存键"""
+        return (task, model, str(device), str(dtype) if dtype is not None else None)
+
+    def get_or_load(self, key, loader):
+        """
+        获取缓存的pipeline，未命中时调用loader加载
+
+        同一个键的并发请求只会触发一次加载，其余调用等待加载完成。
+
+        Args:
+            key (tuple): 缓存键，见 make_key
+            loader (callable): 无参数函数，返回新建的pipeline
+
+        Returns:
+            pipeline: 缓存中的或新加载的pipeline实例
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]["pipe"]
+
+                event = self._loading.get(key)
+                if event is None:
+                    # 由当前线程负责加载
+                    event = threading.Event()
+                    self._loading[key] = event
+                    self.misses += 1
+                    break
+
+            # 其他线程正在加载同一模型，等待后重新查找
+            event.wait()
+
+        try:
+            start = time.perf_counter()
+            pipe = loader()
+            load_time = time.perf_counter() - start
+            size = estimate_pipeline_memory(pipe)
+
+            with self._lock:
+                self.load_times[key] = load_time
+                self._entries[key] = {"pipe": pipe, "size": size}
+                self._evict(keep=key)
+            return pipe
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            event.set()
+
+    def _evict(self, keep=None):
+        """淘汰最近最少使用的pipeline直到满足内存预算 (调用方需持有锁)"""
+        while self.memory_usage() > self.max_memory_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            del self._entries[oldest]
+            self.evictions += 1
+            print(f"内存预算已超出，释放模型: {oldest[1] or oldest[0]}")
+
+    def memory_usage(self):
+        """返回当前缓存模型占用的字节数"""
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def set_max_memory(self, max_memory_gb):
+        """调整内存预算，必要时立即淘汰"""
+        with self._lock:
+            self.max_memory_bytes = int(max_memory_gb * 1024 ** 3)
+            self._evict()
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        返回缓存统计信息
+
+        Returns:
+            dict: 命中/未命中次数、淘汰次数、内存占用和各模型的加载耗时
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "cached": [key[1] or key[0] for key in self._entries],
+                "memory_gb": self.memory_usage() / 1024 ** 3,
+                "max_memory_gb": self.max_memory_bytes / 1024 ** 3,
+                "load_times": {
+                    f"{key[0]}:{key[1]}": round(seconds, 3)
+                    for key, seconds in self.load_times.items()
+                },
+            }
+
+
+_pipeline_cache = PipelineCache()
+
+
+def get_pipeline_cache():
+    """返回进程级的pipeline缓存实例"""
+    return _pipeline_cache
+
+
+def print_cache_stats():
+    """打印pipeline缓存统计信息"""
+    stats = _pipeline_cache.stats()
+    print(f"Pipeline缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次 "
+          f"(命中率 {stats['hit_rate']:.1%}), 淘汰 {stats['evictions']} 次")
+    print(f"缓存内存: {stats['memory_gb']:.2f} / {stats['max_memory_gb']:.2f} GB")
+    for name, seconds in stats["load_times"].items():
+        print(f"  加载耗时 {name}: {seconds:.2f}s")
@@ -0,0 +1,104 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .model_catalog import get_model_catalog
+from .model_utils import create_pipeline
+from .pipeline_cache import get_pipeline_cache
+
+
+def estimate_model_bytes(model_name):
+    """
+    根据本地快照中的权重文件估算模型加载后占用的内存
+
+    Returns:
+        int: 权重文件的总字节数，本地没有该模型时返回None
+    """
+    path = model_name if os.path.isdir(model_name) else get_model_catalog().resolve(model_name)
+    if path is None:
+        return None
+    sizes = {".safetensors": 0, ".bin": 0}
+    for name in os.listdir(path):
+        for suffix in sizes:
+            if name.endswith(suffix):
+                sizes[suffix] += os.path.getsize(os.path.join(path, name))
+    # 同时有两种格式时只会加载 safetensors
+    return sizes[".safetensors"] or sizes[".bin"] or None
+
+
+class PipelinePrefetcher:
+    """
+    后台预加载即将使用的pipeline
+
+    按已知的任务顺序，在后台线程中提前调用 create_pipeline 加载接下来的模型，
+    加载结果放入进程内的pipeline缓存。前台用相同参数调用 create_pipeline 时直接命中缓存，
+    如果后台仍在加载则等待其完成，不会重复加载。
+
+    预加载前检查内存预算：已缓存的模型、正在预加载的模型和新模型的估算大小之和
+    超过预算时跳过，留给前台按需加载，避免预加载挤出正在使用的模型。
+    """
+
+    def __init__(self, specs, lookahead=1, max_memory_gb=None):
+        """
+        Args:
+            specs (list): 按使用顺序排列的 (任务类型, 模型名称) 列表
+            lookahead (int): 当前任务之后预加载的任务数
+            max_memory_gb (float, optional): 内存预算，默认使用pipeline缓存的预算
+        """
+        self.specs = specs
+        self.lookahead = lookahead
+        self.cache = get_pipeline_cache()
+        self.max_memory_bytes = (
+            int(max_memory_gb * 1024 ** 3) if max_memory_gb else self.cache.max_memory_bytes
+        )
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._pending = {}  # (任务类型, 模型名称) -> 估算字节数
+        self._scheduled = set()
+        self._skipped = set()  # 因超出预算跳过的模型，每个只计数一次
+        self.stats = {"scheduled": 0, "skipped": 0, "loaded": 0, "failed": 0}
+
+    def advance(self, index):
+        """
+        进入第 index 个任务时调用，预加载当前任务和之后 lookahead 个任务的模型
+
+        当前任务如果已经在缓存中或正在加载，则不会重复提交。
+        """
+        for spec in self.specs[index:index + 1 + self.lookahead]:
+            self._schedule(spec)
+
+    def _schedule(self, spec):
+        with self._lock:
+            if spec in self._scheduled:
+                return
+            estimated = estimate_model_bytes(spec[1])
+            in_flight = sum(self._pending.values())
+            if estimated is not None and self.cache.memory_usage() + in_flight + estimated > self.max_memory_bytes:
+                if spec not in self._skipped:
+                    self._skipped.add(spec)
+                    self.stats["skipped"] += 1
+                return
+            self._scheduled.add(spec)
+            self._pending[spec] = estimated or 0
+            self.stats["scheduled"] += 1
+        self._executor.submit(self._load, spec)
+
+    def _load(self, spec):
+        task, model_name = spec
+        try:
+            create_pipeline(task=task, model_name=model_name)
+            with self._lock:
+                self.stats["loaded"] += 1
+        except Exception as e:
+            # 失败时由前台按需加载并报告错误
+            with self._lock:
+                self.stats["failed"] += 1
+                self._scheduled.discard(spec)
+            print(f"\n[预加载] {model_name} 加载失败: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(spec, None)
+
+    def close(self):
+        """停止预加载，未开始的任务被取消"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
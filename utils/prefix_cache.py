@@ -0,0 +1,222 @@
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import torch
+
+# 前缀缓存的默认内存上限
+DEFAULT_MAX_MB = float(os.environ.get("PREFIX_CACHE_MAX_MB", "512"))
+
+
+def _block_hashes(token_ids, block_size):
+    """
+    计算按块链式累积的前缀哈希
+
+    第 i 个哈希覆盖前 (i + 1) * block_size 个token，不足一块的尾部不参与计算。
+    """
+    hashes = []
+    digest = b""
+    for end in range(block_size, len(token_ids) + 1, block_size):
+        block = ",".join(map(str, token_ids[end - block_size:end])).encode("ascii")
+        digest = hashlib.sha1(digest + block).digest()
+        hashes.append(digest)
+    return hashes
+
+
+def kv_bytes_per_token(config, dtype):
+    """按模型配置估算每个token的KV缓存字节数"""
+    layers = getattr(config, "num_hidden_layers", None) or getattr(config, "n_layer")
+    hidden = getattr(config, "hidden_size", None) or getattr(config, "n_embd")
+    heads = getattr(config, "num_attention_heads", None) or getattr(config, "n_head")
+    kv_heads = getattr(config, "num_key_value_heads", None) or heads
+    head_dim = getattr(config, "head_dim", None) or hidden // heads
+    element = torch.empty((), dtype=dtype).element_size()
+    return 2 * layers * kv_heads * head_dim * element
+
+
+class PrefixKVCache:
+    """
+    共享前缀的KV缓存
+
+    把提示按 block_size 个token分块并计算链式哈希，保存已计算前缀的 past_key_values。
+    新请求按块匹配最长的已缓存前缀，只需要对未缓存的后缀运行模型。
+    总内存超过上限时按LRU淘汰。
+    """
+
+    def __init__(self, model, block_size=16, max_mb=DEFAULT_MAX_MB):
+        """
+        Args:
+            model: 解码器模型
+            block_size (int): 前缀匹配的块大小 (token数)
+            max_mb (float): 缓存的内存上限 (MB)
+        """
+        self.model = model
+        self.block_size = block_size
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.bytes_per_token = kv_bytes_per_token(model.config, model.dtype)
+        self._entries = OrderedDict()  # 条目ID -> (past_key_values, 块哈希列表, 字节数)
+        self._index = {}  # 块哈希 -> 条目ID
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "cached_tokens": 0, "computed_tokens": 0, "evictions": 0}
+
+    def lookup(self, token_ids):
+        """
+        查找最长的已缓存前缀
+
+        为了让模型至少为最后一个token计算logits，匹配长度不会覆盖整个输入。
+
+        Args:
+            token_ids (list): 提示的token id 列表
+
+        Returns:
+            tuple: (past_key_values 副本或None, 已缓存的token数)
+        """
+        hashes = _block_hashes(token_ids[:-1], self.block_size)
+        with self._lock:
+            self.stats["lookups"] += 1
+            for i in range(len(hashes) - 1, -1, -1):
+                entry_id = self._index.get(hashes[i])
+                if entry_id is None:
+                    continue
+                self._entries.move_to_end(entry_id)
+                cache = self._entries[entry_id][0]
+                length = (i + 1) * self.block_size
+                self.stats["hits"] += 1
+                break
+            else:
+                return None, 0
+
+        # generate 会在缓存上原地追加，返回副本并裁剪到匹配长度
+        cache = copy.deepcopy(cache)
+        cache.crop(length)
+        return cache, length
+
+    def insert(self, token_ids, past_key_values):
+        """
+        保存提示前缀的KV缓存
+
+        Args:
+            token_ids (list): 提示的token id 列表
+            past_key_values: 至少覆盖该提示的缓存 (如 generate 返回的缓存)
+        """
+        hashes = _block_hashes(token_ids[:-1], self.block_size)
+        if not hashes:
+            return
+        length = len(hashes) * self.block_size
+        size = length * self.bytes_per_token
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            entry_id = self._index.get(hashes[-1])
+            if entry_id is not None:
+                # 已有缓存覆盖该前缀
+                self._entries.move_to_end(entry_id)
+                return
+
+        cache = copy.deepcopy(self._to_cache(past_key_values))
+        cache.crop(length)
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (cache, hashes, size)
+            for digest in hashes:
+                self._index[digest] = entry_id
+            self._evict()
+
+    @staticmethod
+    def _to_cache(past_key_values):
+        from transformers import DynamicCache
+        if isinstance(past_key_values, tuple):
+            return DynamicCache.from_legacy_cache(past_key_values)
+        return past_key_values
+
+    def _evict(self):
+        """按LRU淘汰直到不超过内存上限 (调用方持有锁)"""
+        while self._entries and self.memory_usage() > self.max_bytes:
+            entry_id, (_, hashes, _) = self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+            for digest in hashes:
+                if self._index.get(digest) != entry_id:
+                    continue
+                del self._index[digest]
+                # 其他条目也覆盖该前缀时改为指向最近使用的那个
+                for other_id in reversed(self._entries):
+                    if digest in self._entries[other_id][1]:
+                        self._index[digest] = other_id
+                        break
+
+    def memory_usage(self):
+        """返回缓存占用的字节数"""
+        return sum(size for _, _, size in self._entries.values())
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def print_stats(self):
+        """打印缓存统计"""
+        stats = self.stats
+        total = stats["cached_tokens"] + stats["computed_tokens"]
+        print("\n前缀缓存统计:")
+        print("-" * 50)
+        print(f"查询: {stats['lookups']}  命中: {stats['hits']}  淘汰: {stats['evictions']}")
+        if total:
+            print(f"提示token: {total}  复用: {stats['cached_tokens']} ({stats['cached_tokens'] / total:.1%})  "
+                  f"计算: {stats['computed_tokens']}")
+        print(f"缓存条目: {len(self._entries)}  内存: {self.memory_usage() / 1024 / 1024:.1f}MB / "
+              f"{self.max_bytes / 1024 / 1024:.0f}MB")
+
+
+def generate_with_prefix_cache(pipe, prompt, prefix_cache, num_return_sequences=1, **generate_kwargs):
+    """
+    使用前缀缓存生成文本
+
+    提示的已缓存前缀直接复用KV缓存，模型只需要处理剩余的后缀；
+    生成后把本次提示的前缀存入缓存。
+
+    Args:
+        pipe: text-generation pipeline实例
+        prompt (str): 提示文本
+        prefix_cache (PrefixKVCache): 前缀缓存
+        num_return_sequences (int): 生成结果数量，每个结果单独生成
+        **generate_kwargs: 传给 model.generate 的参数，如 max_length、temperature
+
+    Returns:
+        tuple: (生成文本列表, 统计字典)，统计包括 cached_tokens、computed_tokens 和 seconds
+    """
+    tokenizer = pipe.tokenizer
+    model = pipe.model
+    token_ids = tokenizer.encode(prompt)
+    input_ids = torch.tensor([token_ids], device=model.device)
+    generate_kwargs.setdefault("pad_token_id", tokenizer.eos_token_id)
+
+    texts = []
+    stats = {"cached_tokens": 0, "computed_tokens": 0}
+    start = time.perf_counter()
+    for _ in range(num_return_sequences):
+        past_key_values, cached = prefix_cache.lookup(token_ids)
+        with torch.no_grad():
+            output = model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past_key_values,
+                return_dict_in_generate=True,
+                **generate_kwargs
+            )
+        prefix_cache.insert(token_ids, output.past_key_values)
+        texts.append(tokenizer.decode(output.sequences[0], skip_special_tokens=True))
+        stats["cached_tokens"] += cached
+        stats["computed_tokens"] += len(token_ids) - cached
+
+    prefix_cache.stats["cached_tokens"] += stats["cached_tokens"]
+    prefix_cache.stats["computed_tokens"] += stats["computed_tokens"]
+    stats["seconds"] = time.perf_counter() - start
+    return texts, stats
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from itertools import islice
+
+
+def _context_offset(tokenizer):
+    """
+    返回计算上下文起始位置的函数
+
+    用两个不同的普通token构造 (问题, 上下文) 输入，找到上下文第一个token的位置，
+    适用于 [CLS] 问题 [SEP] 上下文 [SEP]、<s> 问题 </s></s> 上下文 </s> 等模板。
+    """
+    special = set(tokenizer.all_special_ids)
+    normal = list(islice((i for i in range(len(tokenizer)) if i not in special), 2))
+    probe = tokenizer.build_inputs_with_special_tokens([normal[0]], [normal[1]])
+    prefix = probe.index(normal[1]) - 1
+    return lambda question_length: prefix + question_length
+
+
+def _windows(length, window_len, doc_stride):
+    """把长度为 length 的上下文切分为 [start, end) 窗口，相邻窗口重叠 doc_stride 个token"""
+    step = max(window_len - doc_stride, 1)
+    starts = list(range(0, max(length - doc_stride, 1), step)) or [0]
+    windows = []
+    for start in starts:
+        end = min(start + window_len, length)
+        windows.append((start, end))
+        if end == length:
+            break
+    return windows
+
+
+def _score_spans(start_logits, end_logits, span_mask, score_mask, max_answer_len):
+    """
+    批量计算每个特征的最佳答案区间
+
+    与 question-answering pipeline 相同: 在 score_mask 范围内对起止logits做softmax，
+    起止概率相乘，只保留长度不超过 max_answer_len 且落在上下文中的区间。
+
+    Returns:
+        tuple: (起始位置, 结束位置, 得分)，形状均为 (特征数,)
+    """
+    import torch
+
+    neg = torch.finfo(start_logits.dtype).min
+    start = torch.softmax(start_logits.masked_fill(~score_mask, neg), dim=-1)
+    end = torch.softmax(end_logits.masked_fill(~score_mask, neg), dim=-1)
+    start = start * span_mask
+    end = end * span_mask
+
+    length = start.shape[1]
+    ones = torch.ones(length, length, dtype=torch.bool, device=start.device)
+    band = torch.triu(ones) & ~torch.triu(ones, diagonal=max_answer_len)
+    scores = start.unsqueeze(2) * end.unsqueeze(1) * band
+    best = scores.flatten(1).argmax(dim=1)
+    best_scores = scores.flatten(1).gather(1, best.unsqueeze(1)).squeeze(1)
+    return best // length, best % length, best_scores
+
+
+def batch_answer(pipe, items, batch_size=32, max_seq_len=384, doc_stride=128, max_answer_len=15,
+                 max_question_len=64):
+    """
+    批量问答
+
+    按上下文分组，每个上下文只分词和切窗一次，同一上下文的所有问题共用这些窗口。
+    所有 问题×窗口 特征按长度排序后组成大批次送入模型，答案区间的打分在张量上批量完成。
+
+    Args:
+        pipe: question-answering pipeline实例 (需要 fast tokenizer)
+        items (list): [{"question": 问题, "context": 上下文}] 列表
+        batch_size (int): 模型的批大小 (特征数)
+        max_seq_len (int): 单个特征的最大token数
+        doc_stride (int): 相邻上下文窗口的重叠token数
+        max_answer_len (int): 答案的最大token数
+        max_question_len (int): 问题的最大token数，超出部分截断
+
+    Returns:
+        list: 与 items 顺序一致的 {"score", "start", "end", "answer"} 列表
+    """
+    import torch
+
+    tokenizer = pipe.tokenizer
+    model = pipe.model
+    if not tokenizer.is_fast:
+        raise ValueError("批量问答需要 fast tokenizer")
+    if tokenizer.padding_side != "right":
+        raise ValueError("批量问答只支持问题在前的模型")
+
+    context_offset = _context_offset(tokenizer)
+    use_token_types = "token_type_ids" in tokenizer.model_input_names
+    num_special = tokenizer.num_special_tokens_to_add(pair=True)
+
+    # 按上下文分组
+    groups = OrderedDict()
+    for i, item in enumerate(items):
+        groups.setdefault(item["context"], []).append(i)
+
+    question_ids = [
+        tokenizer(item["question"], add_special_tokens=False)["input_ids"][:max_question_len] for item in items
+    ]
+
+    features = []  # (条目下标, 上下文, 特征输入, 上下文起始位置, 窗口起点, 窗口长度)
+    contexts = {}
+    for context, indices in groups.items():
+        encoded = tokenizer(context, add_special_tokens=False, return_offsets_mapping=True)
+        contexts[context] = encoded["offset_mapping"]
+        context_ids = encoded["input_ids"]
+        # 同组问题共用窗口，窗口长度按组内最长的问题计算
+        longest = max(len(question_ids[i]) for i in indices)
+        window_len = max(max_seq_len - longest - num_special, 1)
+        for start, end in _windows(len(context_ids), window_len, doc_stride):
+            window = context_ids[start:end]
+            for i in indices:
+                q_ids = question_ids[i]
+                feature = {"input_ids": tokenizer.build_inputs_with_special_tokens(q_ids, window)}
+                if use_token_types:
+                    feature["token_type_ids"] = tokenizer.create_token_type_ids_from_sequences(q_ids, window)
+                features.append((i, context, feature, context_offset(len(q_ids)), start, end - start))
+
+    # 按长度排序减少填充
+    order = sorted(range(len(features)), key=lambda k: len(features[k][2]["input_ids"]))
+    best = {}
+    model_inputs = tokenizer.model_input_names
+    for batch_start in range(0, len(order), batch_size):
+        batch = [features[k] for k in order[batch_start:batch_start + batch_size]]
+        padded = tokenizer.pad([f[2] for f in batch], return_tensors="pt")
+        inputs = {k: v.to(model.device) for k, v in padded.items() if k in model_inputs}
+        with torch.no_grad():
+            output = model(**inputs)
+
+        length = inputs["input_ids"].shape[1]
+        positions = torch.arange(length, device=model.device).unsqueeze(0)
+        offsets = torch.tensor([f[3] for f in batch], device=model.device).unsqueeze(1)
+        window_lens = torch.tensor([f[5] for f in batch], device=model.device).unsqueeze(1)
+        span_mask = (positions >= offsets) & (positions < offsets + window_lens)
+        # 与pipeline一致，[CLS] 参与归一化但不能作为答案
+        score_mask = span_mask.clone()
+        if tokenizer.cls_token_id is not None:
+            score_mask |= inputs["input_ids"] == tokenizer.cls_token_id
+
+        starts, ends, scores = _score_spans(
+            output.start_logits.float(), output.end_logits.float(), span_mask, score_mask, max_answer_len
+        )
+        for (i, context, _, offset, window_start, _), s, e, score in zip(
+            batch, starts.tolist(), ends.tolist(), scores.tolist()
+        ):
+            if i not in best or score > best[i][0]:
+                best[i] = (score, context, window_start + s - offset, window_start + e - offset)
+
+    results = []
+    for i in range(len(items)):
+        score, context, start_token, end_token = best[i]
+        offset_mapping = contexts[context]
+        start_char = offset_mapping[start_token][0]
+        end_char = offset_mapping[end_token][1]
+        results.append({
+            "score": score,
+            "start": start_char,
+            "end": end_char,
+            "answer": context[start_char:end_char],
+        })
+    return results
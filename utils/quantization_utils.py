@@ -0,0 +1,144 @@
+import hashlib
+import io
+import json
+import os
+
+import torch
+import transformers
+from transformers import pipeline
+from transformers.pytorch_utils import Conv1D
+
+# 量化模型的磁盘缓存目录
+QUANTIZED_CACHE_DIR = os.path.expanduser(
+    os.environ.get("QUANTIZED_MODEL_CACHE", "~/.cache/transformers-pipeline-practice/quantized")
+)
+
+
+def _conv1d_to_linear(model):
+    """
+    把 GPT-2 使用的 Conv1D 层替换为等价的 nn.Linear
+
+    动态量化只处理 nn.Linear，Conv1D 的权重形状为 (in, out)，转置后即为 Linear 权重。
+    """
+    for name, module in list(model.named_children()):
+        if isinstance(module, Conv1D):
+            in_features, out_features = module.weight.shape
+            linear = torch.nn.Linear(in_features, out_features)
+            linear.weight = torch.nn.Parameter(module.weight.detach().t().contiguous())
+            linear.bias = torch.nn.Parameter(module.bias.detach().clone())
+            setattr(model, name, linear)
+        else:
+            _conv1d_to_linear(module)
+    return model
+
+
+def quantize_model(model):
+    """
+    对模型的 Linear 层做动态 int8 量化
+
+    权重离线量化为 int8，激活在推理时动态量化，只支持CPU。
+
+    Args:
+        model: transformers 模型
+
+    Returns:
+        量化后的模型
+    """
+    model = _conv1d_to_linear(model.to("cpu").eval())
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _weights_fingerprint(model_id):
+    """
+    本地模型目录中权重和配置文件的 (文件名, 大小, 修改时间)
+
+    hub 缓存中的文件是指向 blobs 的链接，os.stat 取的是实际文件。模型名称不是本地目录时返回空列表
+    (本地快照路径中已包含版本号)。
+    """
+    if not os.path.isdir(str(model_id)):
+        return []
+    fingerprint = []
+    for name in sorted(os.listdir(model_id)):
+        if name.endswith((".safetensors", ".bin", ".json")):
+            try:
+                stat = os.stat(os.path.join(model_id, name))
+            except OSError:
+                continue
+            fingerprint.append((name, stat.st_size, int(stat.st_mtime)))
+    return fingerprint
+
+
+def quantized_cache_path(task, model_id):
+    """
+    返回量化模型的缓存文件路径
+
+    路径中包含 torch 和 transformers 的版本，以及本地模型权重文件的大小和修改时间，
+    版本变化或权重被修改后会重新量化。
+    """
+    fingerprint = json.dumps(_weights_fingerprint(model_id))
+    key = f"{task}|{model_id}|{torch.__version__}|{transformers.__version__}|{fingerprint}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    safe_name = str(model_id).strip("/").replace("/", "--")
+    return os.path.join(QUANTIZED_CACHE_DIR, f"{safe_name}-{digest}.pt")
+
+
+def _is_trusted(path):
+    """
+    缓存文件是否可以安全地反序列化
+
+    量化模型以完整对象保存，torch.load(weights_only=False) 会执行文件中的任意代码，
+    只加载当前用户拥有且其他用户不可写的文件。
+    """
+    if not hasattr(os, "getuid"):
+        return True
+    stat = os.stat(path)
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+
+def create_quantized_pipeline(task, model_id):
+    """
+    创建使用动态int8量化模型的CPU pipeline
+
+    第一次使用时加载fp32模型并量化，量化后的模型保存到磁盘缓存，
+    之后直接加载缓存，不再重复转换。
+
+    Args:
+        task (str): 任务类型
+        model_id (str): 模型名称或本地路径
+
+    Returns:
+        pipeline: 运行在CPU上的量化pipeline
+    """
+    if not model_id:
+        raise ValueError("量化模式需要指定模型名称或路径")
+
+    cache_path = quantized_cache_path(task, model_id)
+    if os.path.exists(cache_path) and not _is_trusted(cache_path):
+        print(f"量化缓存文件不属于当前用户或可被其他用户写入，重新量化: {cache_path}")
+        os.remove(cache_path)
+    if os.path.exists(cache_path):
+        print(f"加载已量化模型: {cache_path}")
+        model = torch.load(cache_path, weights_only=False)
+        # tokenizer 和特征提取器从原模型加载
+        feature_extractor = model_id if task == "automatic-speech-recognition" else None
+        return pipeline(task, model=model, tokenizer=model_id, feature_extractor=feature_extractor,
+                        device="cpu")
+
+    print(f"量化模型 (int8): {model_id}")
+    pipe = pipeline(task, model=model_id, device="cpu")
+    pipe.model = quantize_model(pipe.model)
+
+    # 缓存目录只允许当前用户访问
+    os.makedirs(QUANTIZED_CACHE_DIR, mode=0o700, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    torch.save(pipe.model, tmp_path)
+    os.replace(tmp_path, cache_path)
+    print(f"量化模型已缓存: {cache_path}")
+    return pipe
+
+
+def serialized_size(model):
+    """返回模型 state_dict 序列化后的字节数 (包括量化后打包的权重)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
@@ -0,0 +1,240 @@
+import json
+import math
+import os
+import pickle
+import re
+from array import array
+from collections import Counter
+
+
+# 英文按单词切分，中日韩文字按单字切分
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+# 建立索引时读取的文件类型
+TEXT_EXTENSIONS = (".txt", ".md")
+
+
+def tokenize(text):
+    """把文本切分为检索用的词项"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def iter_passages(file_path, passage_chars=1000):
+    """
+    按行流式读取文本文件并切分为段落
+
+    以空行为自然边界，累计长度超过 passage_chars 时输出一个段落，
+    单个大文件也不会整体读入内存。
+
+    Args:
+        file_path (str): 文本文件路径
+        passage_chars (int): 每个段落的目标字符数
+
+    Yields:
+        str: 段落文本
+    """
+    buffer = []
+    size = 0
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                # 空行处如果已经足够长就切分
+                if size >= passage_chars // 2:
+                    yield "\n".join(buffer)
+                    buffer, size = [], 0
+                continue
+            # 超长的单行按固定长度切开
+            while len(line) > passage_chars:
+                if buffer:
+                    yield "\n".join(buffer)
+                    buffer, size = [], 0
+                yield line[:passage_chars]
+                line = line[passage_chars:]
+            buffer.append(line)
+            size += len(line)
+            if size >= passage_chars:
+                yield "\n".join(buffer)
+                buffer, size = [], 0
+    if buffer:
+        yield "\n".join(buffer)
+
+
+class BM25Index:
+    """
+    基于BM25的段落倒排索引
+
+    段落文本保存在 passages.jsonl 中，只在检索命中时按偏移读取；
+    倒排表、段落长度和偏移保存在 index.pkl 中。
+    """
+
+    INDEX_FILE = "index.pkl"
+    PASSAGES_FILE = "passages.jsonl"
+
+    def __init__(self, index_dir, k1=1.5, b=0.75):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = array("I")
+        self.offsets = array("Q")
+        self.avg_length = 0.0
+
+    @classmethod
+    def build(cls, docs_dir, index_dir, passage_chars=1000):
+        """
+        扫描目录下的文本文件，切分段落并建立索引
+
+        Args:
+            docs_dir (str): 文档目录
+            index_dir (str): 索引保存目录
+            passage_chars (int): 每个段落的目标字符数
+
+        Returns:
+            BM25Index: 建立好的索引
+        """
+        index = cls(index_dir)
+        os.makedirs(index_dir, exist_ok=True)
+        skip_dir = os.path.abspath(index_dir)
+        postings = {}
+
+        with open(os.path.join(index_dir, cls.PASSAGES_FILE), "wb") as out:
+            for root, dirs, files in os.walk(docs_dir):
+                # 跳过索引目录自身
+                dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != skip_dir]
+                for name in sorted(files):
+                    if not name.lower().endswith(TEXT_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, name)
+                    for text in iter_passages(path, passage_chars):
+                        pid = len(index.offsets)
+                        index.offsets.append(out.tell())
+                        row = {"source": os.path.relpath(path, docs_dir), "text": text}
+                        out.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+
+                        terms = Counter(tokenize(text))
+                        index.doc_lengths.append(sum(terms.values()))
+                        for term, tf in terms.items():
+                            entry = postings.get(term)
+                            if entry is None:
+                                entry = postings[term] = (array("I"), array("I"))
+                            entry[0].append(pid)
+                            entry[1].append(tf)
+
+        index.postings = postings
+        if index.doc_lengths:
+            # 所有段落都没有词项时 (如纯标点) 平均长度为0，保持至少为1
+            index.avg_length = max(sum(index.doc_lengths) / len(index.doc_lengths), 1.0)
+        index.save()
+        print(f"索引已建立: {len(index.offsets)} 个段落, {len(postings)} 个词项")
+        return index
+
+    def save(self):
+        """保存索引到 index_dir"""
+        state = {
+            "k1": self.k1,
+            "b": self.b,
+            "postings": self.postings,
+            "doc_lengths": self.doc_lengths,
+            "offsets": self.offsets,
+            "avg_length": self.avg_length,
+        }
+        with open(os.path.join(self.index_dir, self.INDEX_FILE), "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, index_dir):
+        """从 index_dir 加载已保存的索引"""
+        with open(os.path.join(index_dir, cls.INDEX_FILE), "rb") as f:
+            state = pickle.load(f)
+        index = cls(index_dir, k1=state["k1"], b=state["b"])
+        index.postings = state["postings"]
+        index.doc_lengths = state["doc_lengths"]
+        index.offsets = state["offsets"]
+        index.avg_length = state["avg_length"]
+        return index
+
+    @classmethod
+    def exists(cls, index_dir):
+        """判断 index_dir 中是否已有索引"""
+        return os.path.exists(os.path.join(index_dir, cls.INDEX_FILE))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def search(self, query, top_k=5):
+        """
+        检索与查询最相关的段落
+
+        Args:
+            query (str): 查询文本
+            top_k (int): 返回的段落数
+
+        Returns:
+            list: [(段落编号, BM25分数)]，按分数从高到低排列
+        """
+        import numpy as np
+
+        n = len(self.doc_lengths)
+        if n == 0 or top_k <= 0:
+            return []
+        # array 与 numpy 共享内存，不复制倒排表
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        avg_length = max(self.avg_length, 1.0)
+        scores = np.zeros(n, dtype=np.float64)
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            pids = np.frombuffer(entry[0], dtype=np.uint32)
+            tfs = np.frombuffer(entry[1], dtype=np.uint32).astype(np.float64)
+            idf = math.log(1 + (n - len(pids) + 0.5) / (len(pids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[pids] / avg_length)
+            # 同一词项的倒排表中段落编号不重复，可以直接按下标累加
+            scores[pids] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(pid), float(scores[pid])) for pid in candidates]
+
+    def get_passage(self, pid):
+        """按编号读取段落，返回 {"source": ..., "text": ...}"""
+        with open(os.path.join(self.index_dir, self.PASSAGES_FILE), "rb") as f:
+            f.seek(self.offsets[pid])
+            return json.loads(f.readline().decode("utf-8"))
+
+
+def answer_from_index(pipe, index, question, top_k=5, batch_size=8):
+    """
+    检索相关段落后用问答模型抽取答案
+
+    只有 top_k 个段落会送入问答模型，阅读器的计算量与语料规模无关。
+
+    Args:
+        pipe: question-answering pipeline实例
+        index (BM25Index): 段落索引
+        question (str): 问题文本
+        top_k (int): 送入问答模型的段落数
+        batch_size (int): 问答模型每批的特征数
+
+    Returns:
+        dict: 得分最高的答案，包含 answer、score、source 和 passage_id，
+            没有检索到段落时返回None
+    """
+    from .qa_utils import batch_answer
+
+    hits = index.search(question, top_k)
+    if not hits:
+        return None
+
+    passages = [index.get_passage(pid) for pid, _ in hits]
+    inputs = [{"question": question, "context": p["text"]} for p in passages]
+    results = batch_answer(pipe, inputs, batch_size=batch_size)
+
+    best = None
+    for (pid, bm25_score), passage, result in zip(hits, passages, results):
+        if best is None or result["score"] > best["score"]:
+            best = dict(result, source=passage["source"], passage_id=pid, bm25_score=bm25_score)
+    return best
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """请求队列已满"""
+
+
+class DeadlineExceededError(Exception):
+    """请求在推理前已超过截止时间"""
+
+
+class MicroBatcher:
+    """
+    异步微批处理器
+
+    并发提交的请求在 max_wait_ms 时间窗口内被合并为一个批次，
+    在专用推理线程上执行，事件循环不会被模型计算阻塞。
+    队列有上限，队列已满时立即拒绝新请求；已超过截止时间的请求在推理前被丢弃。
+    整批推理出错时逐个重试批内请求，只有出错的请求会失败。
+    """
+
+    def __init__(self, process_fn, max_batch_size=8, max_wait_ms=10, max_queue_size=256, executor=None):
+        """
+        Args:
+            process_fn (callable): 批处理函数，接收输入列表，返回等长的结果列表
+            max_batch_size (int): 每批最大请求数
+            max_wait_ms (float): 收集一个批次的最长等待时间 (毫秒)
+            max_queue_size (int): 等待队列的最大长度
+            executor (Executor, optional): 执行推理的线程池，默认新建单线程池
+        """
+        self.process_fn = process_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self._worker = None
+        self.stats = {"requests": 0, "batches": 0, "rejected": 0, "expired": 0, "batch_items": 0,
+                      "split_batches": 0}
+
+    def start(self):
+        """在当前事件循环中启动批处理任务"""
+        if self._worker is None:
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """停止批处理任务"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, item, deadline=None):
+        """
+        提交一个请求并等待结果
+
+        Args:
+            item: 传给 process_fn 的单个输入
+            deadline (float, optional): 截止时间 (time.monotonic() 时间戳)
+
+        Returns:
+            该输入对应的结果
+
+        Raises:
+            QueueFullError: 队列已满
+            DeadlineExceededError: 推理开始前已超过截止时间
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((item, deadline, future))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise QueueFullError("请求队列已满")
+        self.stats["requests"] += 1
+        return await future
+
+    async def _collect(self):
+        """收集一个批次：等待第一个请求，再在时间窗口内尽量凑满"""
+        batch = [await self.queue.get()]
+        window_end = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = window_end - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+
+            # 丢弃已取消或已超时的请求
+            now = time.monotonic()
+            live = []
+            for item, deadline, future in batch:
+                if future.done():
+                    continue
+                if deadline is not None and deadline < now:
+                    self.stats["expired"] += 1
+                    future.set_exception(DeadlineExceededError("请求已超过截止时间"))
+                    continue
+                live.append((item, future))
+            if not live:
+                continue
+
+            inputs = [item for item, _ in live]
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_fn, inputs)
+            except Exception as e:
+                if len(live) == 1:
+                    if not live[0][1].done():
+                        live[0][1].set_exception(e)
+                    continue
+                # 整批失败时逐个重试，避免一个错误请求拖累同批的其他请求
+                self.stats["split_batches"] += 1
+                for item, future in live:
+                    if future.done():
+                        continue
+                    try:
+                        result = (await loop.run_in_executor(self.executor, self.process_fn, [item]))[0]
+                    except Exception as item_error:
+                        if not future.done():
+                            future.set_exception(item_error)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["batch_items"] += len(live)
+            for (_, future), result in zip(live, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# 翻译缓存的默认位置和大小上限
+DEFAULT_CACHE_PATH = os.path.expanduser(
+    os.environ.get("TRANSLATION_CACHE_PATH", "~/.cache/transformers-pipeline-practice/translation_cache.sqlite")
+)
+DEFAULT_MAX_MB = float(os.environ.get("TRANSLATION_CACHE_MAX_MB", "256"))
+
+# sqlite 单条语句的参数个数有上限，批量查询按此分段
+_SQL_CHUNK = 500
+
+
+def normalize_segment(text):
+    """规范化源文本: Unicode NFC 并合并空白，使只有空白差异的句子命中同一条缓存"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_key(model, text, params=None):
+    """
+    计算缓存键
+
+    Args:
+        model (str): 模型标识，模型或量化方式不同的结果不会互相命中
+        text (str): 源文本 (会先规范化)
+        params (dict, optional): 影响输出的生成参数
+
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    payload = json.dumps([model, normalize_segment(text), params or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    基于 sqlite 的持久化翻译结果缓存
+
+    以 (模型, 规范化后的源文本, 生成参数) 的哈希为键，按最近使用时间做LRU淘汰，
+    总大小超过上限时删除最久未使用的条目。每条记录保存当初翻译耗费的时间，
+    用于统计命中节省的计算时间。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_mb=DEFAULT_MAX_MB):
+        """
+        Args:
+            path (str): sqlite 数据库文件路径
+            max_mb (float): 缓存大小上限 (MB)，按源文本和译文的字节数计算
+        """
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "saved_seconds": 0.0, "compute_seconds": 0.0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " translation TEXT NOT NULL,"
+            " compute_seconds REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON translations (last_used)")
+        # 总大小保存在 meta 表中，由触发器随写入和删除维护，淘汰时不需要扫描全表
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta SELECT 'total_size', COALESCE(SUM(size), 0) FROM translations"
+        )
+        self._conn.executescript(
+            "CREATE TRIGGER IF NOT EXISTS translations_insert AFTER INSERT ON translations BEGIN"
+            " UPDATE meta SET value = value + new.size WHERE name = 'total_size'; END;"
+            "CREATE TRIGGER IF NOT EXISTS translations_delete AFTER DELETE ON translations BEGIN"
+            " UPDATE meta SET value = value - old.size WHERE name = 'total_size'; END;"
+            "CREATE TRIGGER IF NOT EXISTS translations_update AFTER UPDATE OF size ON translations BEGIN"
+            " UPDATE meta SET value = value + new.size - old.size WHERE name = 'total_size'; END;"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """
+        批量查询缓存
+
+        Args:
+            keys (list): 缓存键列表
+
+        Returns:
+            dict: {键: (译文, 当初翻译耗时)}，只包含命中的键
+        """
+        found = {}
+        keys = list(set(keys))
+        with self._lock:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[i:i + _SQL_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, translation, compute_seconds FROM translations WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, translation, seconds in rows:
+                    found[key] = (translation, seconds)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE translations SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """
+        批量写入缓存
+
+        Args:
+            items (list): (键, 源文本, 译文, 翻译耗时) 元组列表
+        """
+        now = time.time()
+        rows = [
+            (key, translation, seconds, len(text.encode("utf-8")) + len(translation.encode("utf-8")), now)
+            for key, text, translation, seconds in items
+        ]
+        with self._lock:
+            # 使用 UPSERT 而不是 INSERT OR REPLACE: REPLACE 删除旧行时不会触发删除触发器
+            self._conn.executemany(
+                "INSERT INTO translations VALUES (?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET"
+                " translation = excluded.translation, compute_seconds = excluded.compute_seconds,"
+                " size = excluded.size, last_used = excluded.last_used",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """删除最久未使用的条目，直到总大小不超过上限 (调用方持有锁)"""
+        total = self._conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        removed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM translations ORDER BY last_used"):
+            doomed.append((key,))
+            removed += size
+            if removed >= excess:
+                break
+        self._conn.executemany("DELETE FROM translations WHERE key = ?", doomed)
+
+    def translate(self, pipe, texts, model, batch_size=8, **generate_kwargs):
+        """
+        带缓存的批量翻译
+
+        先批量查询缓存，只有未命中的文本送入模型；同一批中重复的文本只翻译一次。
+
+        Args:
+            pipe: translation pipeline
+            texts (list): 源文本列表
+            model (str): 模型标识，参与缓存键计算
+            batch_size (int): 未命中文本的推理批大小
+            **generate_kwargs: 传给pipeline的生成参数，同时参与缓存键计算
+
+        Returns:
+            list: 与 texts 顺序一致的译文列表
+        """
+        keys = [make_key(model, text, generate_kwargs) for text in texts]
+        cached = self.get_many(keys)
+
+        # 未命中的文本去重后送入模型
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in pending:
+                pending[key] = normalize_segment(text)
+
+        computed = {}
+        if pending:
+            pending_keys = list(pending)
+            start = time.perf_counter()
+            outputs = pipe([pending[key] for key in pending_keys], batch_size=batch_size, **generate_kwargs)
+            elapsed = time.perf_counter() - start
+            # 批量推理无法区分单条耗时，按条数平均分摊
+            per_item = elapsed / len(pending_keys)
+            for key, output in zip(pending_keys, outputs):
+                if isinstance(output, list):
+                    output = output[0]
+                computed[key] = output["translation_text"]
+            self.put_many([(key, pending[key], computed[key], per_item) for key in pending_keys])
+            self.stats["compute_seconds"] += elapsed
+
+        results = []
+        for key in keys:
+            if key in cached:
+                translation, seconds = cached[key]
+                self.stats["hits"] += 1
+                self.stats["saved_seconds"] += seconds
+            else:
+                translation = computed[key]
+                self.stats["misses"] += 1
+            results.append(translation)
+        self.stats["lookups"] += len(keys)
+        return results
+
+    def hit_rate(self):
+        """返回本进程内的缓存命中率"""
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+    def size(self):
+        """返回 (条目数, 总字节数)"""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            total = self._conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+            return count, total
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM translations")
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def print_stats(self):
+        """打印缓存统计"""
+        count, total = self.size()
+        print("\n翻译缓存统计:")
+        print("-" * 50)
+        print(f"查询: {self.stats['lookups']}  命中: {self.stats['hits']}  未命中: {self.stats['misses']}")
+        print(f"命中率: {self.hit_rate():.1%}")
+        print(f"节省计算时间: {self.stats['saved_seconds']:.2f}s  (实际翻译耗时: {self.stats['compute_seconds']:.2f}s)")
+        print(f"缓存条目: {count}  大小: {total / 1024 / 1024:.2f}MB / {self.max_bytes / 1024 / 1024:.0f}MB")
@@ -0,0 +1,204 @@
+import re
+
+from .batch_utils import sort_by_length
+
+# 不使用空格分词的语言，句子之间直接拼接
+_NO_SPACE_LANGS = {"zh", "ja", "jap"}
+
+# 中日文句末标点，后面可以跟引号或括号
+_CJK_SENTENCE_END = re.compile("([。！？!?；…]+[”’」』）)\"']*)")
+
+# 西文句末: 句号/问号/叹号 (可跟引号或括号)，后面是空白
+_LATIN_SENTENCE_END = re.compile(r"([.!?]+[\"')\]”’]*)(\s+)")
+
+# 句号前是这些缩写时不断句
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "fig",
+    "mt", "inc", "ltd", "co", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept",
+    "oct", "nov", "dec", "mme", "mlle", "hr", "fr", "z.b", "bzw", "usw",
+}
+
+# 段首不需要翻译的格式标记: 缩进、标题、列表符号、编号、引用
+_PREFIX_PATTERN = re.compile(r"^(\s*(?:#{1,6}\s+|[-*+>]\s+|\d+[.)]\s+)?)")
+
+# 单个片段的最大字符数，超过时在逗号或空白处继续切分，避免超出模型的最大长度
+DEFAULT_MAX_CHARS = 400
+
+
+def _lang_code(lang):
+    return (lang or "").split("-")[0].lower()
+
+
+def _split_long(segment, max_chars):
+    """把过长的片段在逗号、分号或空白处切开"""
+    pieces = []
+    while len(segment) > max_chars:
+        window = segment[:max_chars]
+        cut = max(window.rfind(p) for p in (",", ";", "，", "、", "；"))
+        if cut <= 0:
+            cut = window.rfind(" ")
+        if cut <= 0:
+            cut = max_chars - 1
+        pieces.append(segment[:cut + 1].strip())
+        segment = segment[cut + 1:].strip()
+    if segment:
+        pieces.append(segment)
+    return pieces
+
+
+def split_sentences(text, lang, max_chars=DEFAULT_MAX_CHARS):
+    """
+    按语言把文本切分为句子
+
+    Args:
+        text (str): 一个段落的文本
+        lang (str): 源语言代码，如 "zh"、"en"
+        max_chars (int): 单个片段的最大字符数
+
+    Returns:
+        list: 句子列表
+    """
+    text = text.strip()
+    if not text:
+        return []
+
+    if _lang_code(lang) in _NO_SPACE_LANGS:
+        parts = _CJK_SENTENCE_END.split(text)
+        # split 的结果交替为 正文、句末标点
+        sentences = ["".join(parts[i:i + 2]).strip() for i in range(0, len(parts), 2)]
+    else:
+        sentences = []
+        start = 0
+        for match in _LATIN_SENTENCE_END.finditer(text):
+            before = text[start:match.start()].split()
+            last_word = before[-1].lower() if before else ""
+            # 缩写和单个大写字母 (如姓名首字母) 后的句号不是句末
+            if match.group(1) == "." and (last_word.rstrip(".") in _ABBREVIATIONS or len(last_word) == 1):
+                continue
+            sentences.append(text[start:match.end(1)].strip())
+            start = match.end()
+        sentences.append(text[start:].strip())
+
+    segments = []
+    for sentence in sentences:
+        if sentence:
+            segments.extend(_split_long(sentence, max_chars))
+    return segments
+
+
+def join_sentences(sentences, lang):
+    """按目标语言把译文句子拼回段落"""
+    separator = "" if _lang_code(lang) in _NO_SPACE_LANGS else " "
+    return separator.join(s.strip() for s in sentences if s.strip())
+
+
+def iter_paragraphs(lines, source_lang):
+    """
+    从文本行流中读取段落
+
+    连续的非空行组成一个段落，段落内的换行视为软换行；标题和列表项单独成段。
+
+    Args:
+        lines (iterable): 文本行 (如打开的文件对象)
+        source_lang (str): 源语言代码，决定段落内换行的拼接方式
+
+    Yields:
+        tuple: (前导空行数, 段首格式标记, 段落正文)
+    """
+    joiner = "" if _lang_code(source_lang) in _NO_SPACE_LANGS else " "
+    blank_lines = 0
+    current = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.strip():
+            # 标题和列表项即使没有空行分隔也单独成段
+            if current and _PREFIX_PATTERN.match(line).group(1).strip():
+                yield _make_paragraph(blank_lines, current, joiner)
+                current = []
+                blank_lines = 0
+            current.append(line)
+            continue
+        if current:
+            yield _make_paragraph(blank_lines, current, joiner)
+            current = []
+            blank_lines = 0
+        blank_lines += 1
+    if current:
+        yield _make_paragraph(blank_lines, current, joiner)
+
+
+def _make_paragraph(blank_lines, lines, joiner):
+    prefix = _PREFIX_PATTERN.match(lines[0]).group(1)
+    body = joiner.join([lines[0][len(prefix):].strip()] + [line.strip() for line in lines[1:]])
+    return blank_lines, prefix, body
+
+
+def translate_document(lines, translate_fn, source_lang, target_lang, window_segments=256,
+                       max_chars=DEFAULT_MAX_CHARS):
+    """
+    流式翻译长文档
+
+    按段落读取输入，把段落切分为句子。累计满 window_segments 个句子后，
+    按长度排序整批翻译以减少填充，再按原顺序拼回段落输出。
+    空行、缩进和列表/标题标记保持不变。
+
+    Args:
+        lines (iterable): 文本行 (如打开的文件对象)
+        translate_fn (callable): 接收句子列表、返回等长译文列表的函数
+        source_lang (str): 源语言代码
+        target_lang (str): 目标语言代码
+        window_segments (int): 每次送去翻译的句子数
+        max_chars (int): 单个句子的最大字符数
+
+    Yields:
+        str: 翻译后的文本块 (含换行)，按输入顺序输出
+    """
+    pending = []
+    segments = []
+
+    def flush():
+        if segments:
+            order = sort_by_length(list(enumerate(segments)), len)
+            translated = translate_fn([text for _, text in order])
+            results = [None] * len(segments)
+            for (index, _), text in zip(order, translated):
+                results[index] = text
+        else:
+            results = []
+
+        for blank_lines, prefix, start, end in pending:
+            body = join_sentences(results[start:end], target_lang)
+            yield "\n" * blank_lines + prefix + body + "\n"
+        pending.clear()
+        segments.clear()
+
+    for blank_lines, prefix, body in iter_paragraphs(lines, source_lang):
+        sentences = split_sentences(body, source_lang, max_chars)
+        pending.append((blank_lines, prefix, len(segments), len(segments) + len(sentences)))
+        segments.extend(sentences)
+        if len(segments) >= window_segments:
+            yield from flush()
+    yield from flush()
+
+
+def make_translate_fn(pipe, batch_size=8, cache=None, model_id=None, **generate_kwargs):
+    """
+    创建供 translate_document 使用的批量翻译函数
+
+    Args:
+        pipe: translation pipeline
+        batch_size (int): 推理批大小
+        cache (TranslationCache, optional): 翻译缓存，提供时只翻译未命中的句子
+        model_id (str, optional): 缓存键中的模型标识
+        **generate_kwargs: 传给pipeline的生成参数
+
+    Returns:
+        callable: 接收句子列表、返回译文列表的函数
+    """
+    def translate(texts):
+        if cache is not None:
+            return cache.translate(pipe, texts, model=model_id, batch_size=batch_size, **generate_kwargs)
+        outputs = pipe(texts, batch_size=batch_size, **generate_kwargs)
+        return [(out[0] if isinstance(out, list) else out)["translation_text"] for out in outputs]
+
+    return translate
@@ -0,0 +1,149 @@
+import json
+import os
+import socket
+import time
+
+# 每台主机一个调优配置文件
+TUNING_DIR = os.path.expanduser(
+    os.environ.get("TUNING_PROFILE_DIR", "~/.cache/transformers-pipeline-practice/tuning")
+)
+
+# 设置 PIPELINE_TUNING=0 可以禁止自动应用调优配置 (调优过程本身需要这样做)
+TUNING_ENABLED = os.environ.get("PIPELINE_TUNING", "1") != "0"
+
+_applied = {}
+
+# 已读取的调优配置: {路径: (修改时间, 配置)}
+_profile_cache = {}
+
+
+def profile_path(host=None):
+    """返回主机调优配置文件的路径"""
+    return os.path.join(TUNING_DIR, f"{host or socket.gethostname()}.json")
+
+
+def _empty_profile(host=None):
+    return {"host": host or socket.gethostname(), "cpu_count": os.cpu_count(), "pipelines": {}}
+
+
+def load_profile(host=None):
+    """读取主机的调优配置，不存在时返回空配置 (文件未修改时复用上次读取的结果)"""
+    path = profile_path(host)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return _empty_profile(host)
+    cached = _profile_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return _empty_profile(host)
+    _profile_cache[path] = (mtime, profile)
+    return profile
+
+
+def save_profile(profile, host=None):
+    """保存主机的调优配置"""
+    path = profile_path(host)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _profile_key(task, model):
+    return f"{task}|{model}"
+
+
+def record_tuned_config(task, model, config, metrics=None):
+    """
+    把调优结果写入本机配置
+
+    Args:
+        task (str): 任务类型
+        model (str): 模型名称或路径 (与调用 create_pipeline 时相同)
+        config (dict): intra_op_threads、inter_op_threads、batch_size
+        metrics (dict, optional): 调优时测得的性能，一并保存供查看
+    """
+    profile = load_profile()
+    profile["cpu_count"] = os.cpu_count()
+    profile["pipelines"][_profile_key(task, model)] = {
+        "config": config,
+        "metrics": metrics or {},
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    save_profile(profile)
+
+
+def get_tuned_config(task, model):
+    """
+    返回本机为该任务和模型保存的调优配置
+
+    配置文件是在CPU核数不同的机器上生成时不使用。
+
+    Returns:
+        dict: 调优配置，没有时返回None
+    """
+    if not TUNING_ENABLED or not model:
+        return None
+    profile = load_profile()
+    if profile.get("cpu_count") != os.cpu_count():
+        return None
+    entry = profile["pipelines"].get(_profile_key(task, model))
+    return entry["config"] if entry else None
+
+
+def apply_thread_config(config):
+    """
+    应用线程设置
+
+    inter-op 线程数只能在进程开始并行计算之前设置一次，之后的设置会被忽略。
+    """
+    import torch
+
+    intra = config.get("intra_op_threads")
+    if intra and _applied.get("intra_op_threads") != intra:
+        torch.set_num_threads(intra)
+        _applied["intra_op_threads"] = intra
+
+    inter = config.get("inter_op_threads")
+    if inter and "inter_op_threads" not in _applied:
+        try:
+            torch.set_num_interop_threads(inter)
+            _applied["inter_op_threads"] = inter
+        except RuntimeError:
+            print(f"inter-op 线程数已固定为 {torch.get_num_interop_threads()}，忽略调优配置 {inter}")
+            _applied["inter_op_threads"] = torch.get_num_interop_threads()
+
+
+def can_batch(pipe):
+    """pipeline的分词器能否正确地批量补齐"""
+    tokenizer = getattr(pipe, "tokenizer", None)
+    if tokenizer is None:
+        return True
+    if tokenizer.pad_token_id is None:
+        return False
+    return pipe.task != "text-generation" or tokenizer.padding_side == "left"
+
+
+def apply_tuned_config(pipe, config):
+    """
+    把调优得到的批大小设为pipeline的默认批大小 (调用时未指定 batch_size 时使用)
+
+    分词器不能正确批量补齐时 (没有 pad token，或文本生成不是左侧补齐) 只记录配置，
+    不改变pipeline的默认行为。
+    """
+    if config.get("batch_size") and can_batch(pipe):
+        pipe._batch_size = config["batch_size"]
+    pipe._tuned_config = config
+    return pipe
+
+
+def tuned_batch_size(pipe, default):
+    """返回pipeline的调优批大小，没有调优配置时返回 default"""
+    config = getattr(pipe, "_tuned_config", None) or {}
+    return config.get("batch_size") or default
@@ -0,0 +1,267 @@
+import math
+
+import numpy as np
+
+from .audio_utils import TARGET_SAMPLING_RATE, get_audio_duration, iter_audio_windows, load_audio
+
+# 拼接语音片段时插入的静音长度 (秒)，让模型能区分相邻片段
+JOIN_GAP_S = 0.3
+
+
+def _frame_features(samples, frame_len):
+    """
+    计算每帧的对数能量 (dB) 和谱平坦度
+
+    音频按 frame_len 切成不重叠的帧，全部帧一次性做FFT。谱平坦度为功率谱几何平均
+    与算术平均之比，噪声接近1，语音等有谐波结构的声音明显更小。
+    """
+    num_frames = len(samples) // frame_len
+    frames = samples[:num_frames * frame_len].reshape(num_frames, frame_len).astype(np.float64)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame_len), axis=1)) ** 2 + 1e-10
+    flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+    return energy_db, flatness
+
+
+def _runs(mask):
+    """返回布尔序列中连续 True 区间的 (起点, 终点) 数组，终点不含"""
+    padded = np.concatenate([[False], mask, [False]]).astype(np.int8)
+    edges = np.diff(padded)
+    return np.stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)], axis=1)
+
+
+def detect_speech(samples, sr=TARGET_SAMPLING_RATE, frame_ms=30, margin_db=10.0, min_energy_db=-55.0,
+                  max_flatness=0.6, min_speech_s=0.25, min_silence_s=0.5, pad_s=0.2):
+    """
+    基于能量和谱平坦度的语音活动检测
+
+    能量阈值随录音自适应: 以能量的第10百分位作为底噪，高出 margin_db 的帧才可能是语音，
+    同时要求谱平坦度低于 max_flatness 以排除宽带噪声。短于 min_silence_s 的停顿并入
+    语音，短于 min_speech_s 的语音丢弃，每段两侧各保留 pad_s 秒。
+
+    Args:
+        samples (np.ndarray): 单声道音频
+        sr (int): 采样率
+        frame_ms (int): 帧长 (毫秒)
+        margin_db (float): 语音帧能量需高于底噪的分贝数
+        min_energy_db (float): 语音帧的最低能量 (dBFS)
+        max_flatness (float): 语音帧的最大谱平坦度
+        min_speech_s (float): 最短语音段 (秒)
+        min_silence_s (float): 最短静音段 (秒)，更短的停顿视为语音
+        pad_s (float): 语音段两侧保留的长度 (秒)
+
+    Returns:
+        list: 语音段 [(起始样本, 结束样本)]
+    """
+    frame_len = int(sr * frame_ms / 1000)
+    if len(samples) < frame_len:
+        return []
+    energy_db, flatness = _frame_features(samples, frame_len)
+    threshold = max(np.percentile(energy_db, 10) + margin_db, min_energy_db)
+    speech = (energy_db > threshold) & (flatness < max_flatness)
+
+    # 填补短停顿
+    frame_s = frame_len / sr
+    for start, end in _runs(~speech):
+        if start > 0 and end < len(speech) and (end - start) * frame_s < min_silence_s:
+            speech[start:end] = True
+
+    regions = []
+    pad = int(pad_s * sr)
+    for start, end in _runs(speech):
+        if (end - start) * frame_s < min_speech_s:
+            continue
+        start_sample = max(start * frame_len - pad, 0)
+        end_sample = min(end * frame_len + pad, len(samples))
+        # 补边后与前一段重叠时合并
+        if regions and start_sample <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end_sample)
+        else:
+            regions.append((start_sample, end_sample))
+    return regions
+
+
+def _quiet_cut(samples, start, limit, sr=TARGET_SAMPLING_RATE, search_s=5.0, frame_ms=30):
+    """在 limit 之前 search_s 秒内找能量最低的帧，返回该帧中点作为切分位置"""
+    frame_len = int(sr * frame_ms / 1000)
+    search_start = max(limit - int(search_s * sr), start + 1)
+    num_frames = (limit - search_start) // frame_len
+    if num_frames < 1:
+        return limit
+    frames = samples[search_start:search_start + num_frames * frame_len].reshape(num_frames, frame_len)
+    energy = np.mean(frames.astype(np.float64) ** 2, axis=1)
+    return search_start + int(np.argmin(energy)) * frame_len + frame_len // 2
+
+
+def pack_regions(samples, regions, sr=TARGET_SAMPLING_RATE, max_segment_s=30.0, gap_s=JOIN_GAP_S):
+    """
+    把语音段拼接成不超过 max_segment_s 的模型输入
+
+    whisper 每个输入都按30秒计算，把多个短语音段拼进同一个输入才能真正节省计算。
+    段之间插入 gap_s 秒静音。超过 max_segment_s 的语音段先在接近上限处能量最低的帧切开，
+    尽量落在词间停顿上，不把词切断。
+
+    Returns:
+        list: [{"samples": 拼接后的音频, "pieces": [(拼接音频中的起点秒, 原始起点秒, 长度秒)]}]
+    """
+    max_len = int(max_segment_s * sr)
+    gap = np.zeros(int(gap_s * sr), dtype=np.float32)
+
+    pieces = []
+    for start, end in regions:
+        while end - start > max_len:
+            cut = _quiet_cut(samples, start, start + max_len, sr)
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+
+    segments = []
+    current, layout, length = [], [], 0
+    for start, end in pieces:
+        extra = (len(gap) if current else 0) + end - start
+        if current and length + extra > max_len:
+            segments.append({"samples": np.concatenate(current), "pieces": layout})
+            current, layout, length = [], [], 0
+        if current:
+            current.append(gap)
+            length += len(gap)
+        layout.append((length / sr, start / sr, (end - start) / sr))
+        current.append(samples[start:end])
+        length += end - start
+    if current:
+        segments.append({"samples": np.concatenate(current), "pieces": layout})
+    return segments
+
+
+def _to_original(pieces, t):
+    """把拼接音频中的时间换算回原始时间线"""
+    offsets = np.array([p[0] for p in pieces])
+    i = max(int(np.searchsorted(offsets, t, side="right")) - 1, 0)
+    packed_start, orig_start, length = pieces[i]
+    return orig_start + min(max(t - packed_start, 0.0), length)
+
+
+def _speech_blocks(audio_path, block_s):
+    """按 block_s 秒的块惰性读取音频；soundfile 不支持的格式整体解码为一块"""
+    try:
+        get_audio_duration(audio_path)
+    except RuntimeError:
+        yield {"start": 0.0, "samples": load_audio(audio_path), "is_last": True}
+        return
+    yield from iter_audio_windows(audio_path, window_s=block_s, overlap_s=0.0)
+
+
+def _vad_segments(audio_path, max_segment_s, block_s, stats, vad_kwargs):
+    """
+    逐块检测语音并拼接成模型输入，依次产生拼接好的输入
+
+    块末尾仍在进行的语音段 (以及尚不能判断的最后一小段) 留到下一块一起检测，语音段不会被块边界切断。
+    连续语音超过一个块时不再等待，在缓冲末尾附近能量最低处截断。
+    """
+    sr = TARGET_SAMPLING_RATE
+    # 块末尾这段时间内结束的语音段可能还会继续
+    tail = int((vad_kwargs.get("min_silence_s", 0.5) + vad_kwargs.get("pad_s", 0.2)) * sr)
+    block_len = int(block_s * sr)
+    carry = np.zeros(0, dtype=np.float32)
+    offset = 0  # carry 起点在原始时间线上的样本位置
+
+    for block in _speech_blocks(audio_path, block_s):
+        buffer = np.concatenate([carry, block["samples"]])
+        stats["duration"] += len(block["samples"]) / sr
+        regions = detect_speech(buffer, **vad_kwargs)
+
+        if block["is_last"]:
+            final, cut = regions, len(buffer)
+        else:
+            final = [r for r in regions if r[1] < len(buffer) - tail]
+            open_start = regions[len(final)][0] if len(final) < len(regions) else len(buffer) - tail
+            cut = max(open_start, final[-1][1] if final else 0)
+            if len(final) < len(regions) and len(buffer) - cut > block_len:
+                # 连续语音超过一个块: 在缓冲末尾附近最安静处截断，截断点之前的部分先识别
+                split = _quiet_cut(buffer, cut, len(buffer), sr)
+                final = final + [(cut, split)]
+                cut = split
+
+        stats["speech_seconds"] += sum(end - start for start, end in final) / sr
+        stats["regions"] += len(final)
+        for segment in pack_regions(buffer, final, max_segment_s=max_segment_s):
+            segment["pieces"] = [(packed, orig + offset / sr, length) for packed, orig, length in segment["pieces"]]
+            yield segment
+
+        carry = buffer[cut:]
+        offset += cut
+
+
+def transcribe_with_vad(pipe, audio_path, batch_size=8, max_segment_s=30.0, window_s=30.0, overlap_s=5.0,
+                        block_s=300.0, stats=None, **vad_kwargs):
+    """
+    先检测语音段，只把语音送入whisper模型识别
+
+    音频按 block_s 秒的块惰性读取，内存占用与音频总长度无关。语音段拼接成不超过 max_segment_s 的输入，
+    每凑满 batch_size 个输入识别一批并输出分段，时间戳换算回原始时间线。
+
+    Args:
+        pipe: automatic-speech-recognition pipeline实例
+        audio_path (str): 音频文件路径
+        batch_size (int): 每批送入模型的输入数
+        max_segment_s (float): 每个模型输入的最大长度 (秒)
+        window_s (float): 不使用VAD时的分窗长度，用于估算节省的计算量
+        overlap_s (float): 不使用VAD时的分窗重叠长度
+        block_s (float): 每次读取并检测的音频长度 (秒)
+        stats (dict, optional): 传入时在识别结束后写入统计信息，见 print_vad_stats
+        **vad_kwargs: 传给 detect_speech 的参数
+
+    Yields:
+        dict: {"start": 开始时间, "end": 结束时间, "text": 文本}
+    """
+    stats = stats if stats is not None else {}
+    stats.update({"duration": 0.0, "speech_seconds": 0.0, "regions": 0, "model_inputs": 0})
+
+    def run(segments):
+        inputs = [{"raw": s["samples"], "sampling_rate": TARGET_SAMPLING_RATE} for s in segments]
+        outputs = pipe(inputs, batch_size=batch_size, return_timestamps=True)
+        for segment, output in zip(segments, outputs):
+            seg_duration = len(segment["samples"]) / TARGET_SAMPLING_RATE
+            for chunk in output.get("chunks", []):
+                text = chunk["text"].strip()
+                if not text:
+                    continue
+                chunk_start, chunk_end = chunk["timestamp"]
+                chunk_start = chunk_start or 0.0
+                chunk_end = min(chunk_end if chunk_end is not None else seg_duration, seg_duration)
+                yield {
+                    "start": _to_original(segment["pieces"], chunk_start),
+                    "end": _to_original(segment["pieces"], chunk_end),
+                    "text": text,
+                }
+
+    batch = []
+    for segment in _vad_segments(audio_path, max_segment_s, block_s, stats, vad_kwargs):
+        stats["model_inputs"] += 1
+        batch.append(segment)
+        if len(batch) >= batch_size:
+            yield from run(batch)
+            batch = []
+    if batch:
+        yield from run(batch)
+
+    duration = stats["duration"]
+    # 不使用VAD时的模型输入数 (短音频整段识别，长音频按重叠窗口识别)
+    if duration <= window_s:
+        baseline_inputs = 1
+    else:
+        baseline_inputs = math.ceil((duration - overlap_s) / (window_s - overlap_s))
+    stats.update({
+        "speech_ratio": stats["speech_seconds"] / duration if duration else 0.0,
+        "baseline_inputs": baseline_inputs,
+        "compute_saved": 1 - stats["model_inputs"] / baseline_inputs,
+    })
+
+
+def print_vad_stats(stats):
+    """显示语音活动检测统计"""
+    print(f"语音占比: {stats['speech_ratio']:.1%} ({stats['speech_seconds']:.1f}/{stats['duration']:.1f} 秒, "
+          f"{stats['regions']} 段)")
+    print(f"模型输入: {stats['model_inputs']} 个 (不使用VAD: {stats['baseline_inputs']} 个), "
+          f"节省计算量 {stats['compute_saved']:.1%}")
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+
+import torch
+
+from .batch_utils import iter_batches, run_pipeline_batch
+
+# 子进程通过 fork 继承的pipeline，权重与父进程共享
+_worker_pipe = None
+
+
+def _init_worker(num_threads):
+    """子进程初始化：为每个进程分配独立的计算线程数"""
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # 父进程已经启动过并行计算时不能再修改
+        pass
+
+
+def _run_shard(args):
+    inputs, batch_size, kwargs = args
+    return run_pipeline_batch(_worker_pipe, inputs, batch_size, **kwargs)
+
+
+class CPUWorkerPool:
+    """
+    多进程CPU推理池
+
+    模型只在父进程中加载一次，权重移入共享内存后通过 fork 被所有子进程只读共享，
+    不会随进程数成倍占用内存。CPU核心平均分配给各个进程，
+    输入按批次分发到各进程，结果保持输入顺序。
+
+    应在父进程执行任何推理之前创建，避免 fork 已启动的 OpenMP 线程池。
+    """
+
+    def __init__(self, pipe, num_workers=None, threads_per_worker=None):
+        """
+        Args:
+            pipe: 已在CPU上创建的pipeline实例
+            num_workers (int, optional): 进程数，默认每4个核心一个进程
+            threads_per_worker (int, optional): 每个进程的计算线程数，默认平均分配核心
+        """
+        if pipe.device.type != "cpu":
+            raise ValueError(f"多进程模式只支持CPU，当前设备: {pipe.device}")
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("当前平台不支持 fork，无法共享模型权重")
+
+        global _worker_pipe
+        cores = os.cpu_count() or 1
+        self.num_workers = num_workers or max(1, cores // 4)
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.num_workers)
+
+        # 权重放入共享内存，子进程只读访问
+        pipe.model.share_memory()
+        pipe.model.eval()
+        _worker_pipe = pipe
+
+        context = multiprocessing.get_context("fork")
+        self._pool = context.Pool(
+            self.num_workers,
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker,)
+        )
+        print(f"已启动 {self.num_workers} 个推理进程，每个进程 {self.threads_per_worker} 个线程")
+
+    def map(self, inputs, batch_size, **kwargs):
+        """
+        将输入按批次分发到各进程执行
+
+        Args:
+            inputs (list): pipeline输入列表
+            batch_size (int): 每个进程单次处理的批次大小
+            **kwargs: 传给pipeline的其他参数
+
+        Returns:
+            list: 与inputs顺序一致的结果列表
+        """
+        shards = [(shard, batch_size, kwargs) for shard in iter_batches(inputs, batch_size)]
+        results = []
+        for shard_results in self._pool.imap(_run_shard, shards):
+            results.extend(shard_results)
+        return results
+
+    def close(self):
+        """关闭进程池"""
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()